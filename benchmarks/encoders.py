@@ -0,0 +1,79 @@
+"""Encoding time and output size of each --output format on a large inventory.
+
+Builds a MySQL-style result with 100k tables in memory and encodes it with
+every format, compared against the plain `json.dumps(indent=2)` the CLI used
+before, then reports the gzip size of each. Run with `make bench-encode`.
+"""
+
+import gzip
+import json
+import statistics
+import sys
+import time
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from db_enum import encoders
+
+
+def inventory(tables: int):
+    now = datetime(2024, 1, 1)
+    return {
+        "type": "MySQL",
+        "kind": "sql",
+        "version": "8.0.36",
+        "databases": [f"schema_{i:04d}" for i in range(100)],
+        "tables": [
+            {
+                "schema": f"schema_{i % 100:04d}",
+                "name": f"table_{i:06d}",
+                "approx_rows": i * 37,
+                "size_bytes": Decimal(i * 16384),
+                "updated": now - timedelta(minutes=i),
+            }
+            for i in range(tables)
+        ],
+    }
+
+
+def baseline(obj) -> bytes:
+    return json.dumps(obj, indent=2, default=str).encode()
+
+
+def measure(encode, obj, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        data = encode(obj)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), data
+
+
+def main(tables=100_000, runs=3):
+    obj = inventory(tables)
+    cases = [("json.dumps indent=2 (old)", baseline)]
+    for name in encoders.ENCODERS:
+        if name == "ndjson":
+            continue
+        try:
+            encoder = encoders.ENCODERS[name]()
+        except RuntimeError as e:
+            print(f"skipping {name}: {e}")
+            continue
+        cases.append((name, encoder.document))
+
+    print(f"orjson: {'yes' if encoders.orjson is not None else 'no'}")
+    print(f"{'format':<26} {'ms':>8} {'speedup':>8} {'MB':>8} {'gzip MB':>8}")
+    base_seconds = None
+    for name, encode in cases:
+        seconds, data = measure(encode, obj, runs)
+        base_seconds = base_seconds or seconds
+        print(
+            f"{name:<26} {seconds * 1000:>8.1f} {base_seconds / seconds:>7.1f}x"
+            f" {len(data) / 2**20:>8.2f} {len(gzip.compress(data, 6)) / 2**20:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
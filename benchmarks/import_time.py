@@ -0,0 +1,76 @@
+"""Cold-start import cost of the CLI and of each single-database subcommand.
+
+Every measurement runs in a fresh interpreter so nothing is served from an
+already-populated sys.modules. Run with `make bench-import`.
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+
+from db_enum.registry import DB_TYPES
+
+DRIVERS = {
+    "cassandra": "cassandra",
+    "couchdb": "couchdb",
+    "elasticsearch": "elasticsearch",
+    "influxdb": "influxdb",
+    "mongodb": "pymongo",
+    "mssql": "pymssql",
+    "mysql": "pymysql",
+    "neo4j": "neo4j",
+    "postgres": "psycopg2",
+    "redis": "redis",
+}
+
+SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import db_enum.cli
+cli_done = time.perf_counter()
+if {db_type!r}:
+    from db_enum.registry import load
+    load({db_type!r})
+end = time.perf_counter()
+drivers = {drivers!r}
+print(json.dumps({{
+    "cli_ms": (cli_done - start) * 1000,
+    "total_ms": (end - start) * 1000,
+    "drivers": sorted(k for k, mod in drivers.items() if mod in sys.modules),
+}}))
+"""
+
+
+def measure(db_type, runs):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", SNIPPET.format(db_type=db_type, drivers=DRIVERS)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        samples.append(json.loads(out))
+    return {
+        "cli_ms": statistics.median(s["cli_ms"] for s in samples),
+        "total_ms": statistics.median(s["total_ms"] for s in samples),
+        "drivers": samples[-1]["drivers"],
+    }
+
+
+def main(runs=5):
+    print(f"{'command':<15} {'cli ms':>8} {'total ms':>9}  drivers loaded")
+    for db_type in [None] + DB_TYPES:
+        r = measure(db_type, runs)
+        name = db_type or "(cli only)"
+        print(
+            f"{name:<15} {r['cli_ms']:>8.1f} {r['total_ms']:>9.1f}  {', '.join(r['drivers']) or '-'}"
+        )
+        unexpected = set(r["drivers"]) - {db_type}
+        if unexpected:
+            print(f"  unexpected drivers imported: {', '.join(sorted(unexpected))}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
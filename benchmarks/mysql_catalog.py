@@ -0,0 +1,125 @@
+"""Default vs fast (-o fast=true) MySQL table enumeration on a large catalog.
+
+Generates --tables empty InnoDB tables spread over --schemas schemas (named
+db_enum_bench_*) on the server from docker-compose.yml, then times both modes.
+Generation takes a while, so the schemas are kept between runs until
+--teardown. Run with `make bench-mysql`.
+"""
+
+import argparse
+import time
+
+import pymysql
+
+from db_enum.db import mysql
+from db_enum.logger import VerboseLogger
+
+PREFIX = "db_enum_bench_"
+
+
+def connect(args, **kwargs):
+    return pymysql.connect(
+        host=args.host,
+        port=args.port,
+        user=args.user,
+        password=args.password,
+        **kwargs,
+    )
+
+
+def existing_tables(conn):
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_SCHEMA LIKE %s",
+            (PREFIX + "%",),
+        )
+        return cursor.fetchone()[0]
+
+
+def generate(args):
+    conn = connect(args, client_flag=pymysql.constants.CLIENT.MULTI_STATEMENTS)
+    try:
+        if existing_tables(conn) == args.tables:
+            print(f"reusing {args.tables} generated tables")
+            return
+        teardown(args)
+        per_schema = -(-args.tables // args.schemas)
+        start = time.perf_counter()
+        with conn.cursor() as cursor:
+            for s in range(args.schemas):
+                schema = f"{PREFIX}{s}"
+                cursor.execute(f"CREATE DATABASE {schema}")
+                count = min(per_schema, args.tables - s * per_schema)
+                for first in range(0, count, 500):
+                    cursor.execute(
+                        "".join(
+                            f"CREATE TABLE {schema}.t{i} (id INT PRIMARY KEY, v VARCHAR(32));"
+                            for i in range(first, min(first + 500, count))
+                        )
+                    )
+                    while cursor.nextset():
+                        pass
+                print(f"  {schema}: {count} tables", flush=True)
+        print(f"generated {args.tables} tables in {time.perf_counter() - start:.0f}s")
+    finally:
+        conn.close()
+
+
+def teardown(args):
+    conn = connect(args)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SHOW DATABASES LIKE %s", (PREFIX + "%",))
+            for (schema,) in cursor.fetchall():
+                cursor.execute(f"DROP DATABASE {schema}")
+    finally:
+        conn.close()
+
+
+def run(args, options):
+    logger = VerboseLogger(False)
+    session = mysql.connect(
+        args.host, args.port, args.user, args.password, None, logger
+    )
+    if session is None:
+        raise SystemExit(f"cannot connect to MySQL at {args.host}:{args.port}")
+    session.options = options
+    try:
+        start = time.perf_counter()
+        result = mysql.enumerate_session(session, logger)
+        return time.perf_counter() - start, len(result["tables"])
+    finally:
+        mysql.close(session)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="rootpassword")
+    parser.add_argument("--tables", type=int, default=100_000)
+    parser.add_argument("--schemas", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--teardown", action="store_true")
+    args = parser.parse_args()
+
+    if args.teardown:
+        teardown(args)
+        return
+    generate(args)
+
+    modes = {
+        "information_schema": {},
+        "fast": {"fast": True},
+        "per_schema": {"per_schema": True},
+    }
+    print(f"{'mode':<20} {'median s':>9} {'tables':>8}")
+    for name, options in modes.items():
+        samples = [run(args, options) for _ in range(args.runs)]
+        seconds = sorted(s for s, _ in samples)[len(samples) // 2]
+        print(f"{name:<20} {seconds:>9.2f} {samples[-1][1]:>8}")
+
+
+if __name__ == "__main__":
+    main()
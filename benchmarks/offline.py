@@ -0,0 +1,270 @@
+"""Detection latency and per-adapter enumeration cost, with no network or containers.
+
+Every adapter runs against a stand-in from benchmarks/standins.py, with a
+simulated round-trip latency and a large generated catalog. For each case the
+suite reports the median enumeration time, records per second, requests seen
+by the stand-in, round trips counted by the adapter's own trace spans and the
+peak Python memory (tracemalloc) of one enumeration. It also times `magic`
+style detection against each network stand-in, with and without
+fingerprinting. Run with `make bench`, `--json` for machine-readable output.
+
+MongoDB counts its round trips through pymongo command monitoring, which the
+fake client does not emit, so read the requests column for that case.
+"""
+
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+
+import standins
+
+from db_enum import trace
+from db_enum.db_interface import Session
+from db_enum.detect import detect
+from db_enum.history import PortHistory
+from db_enum.logger import VerboseLogger
+from db_enum.registry import load
+
+LOGGER = VerboseLogger(False)
+
+
+class Case:
+    """One adapter and option set against one stand-in."""
+
+    def __init__(self, name, db_type, standin, options=None, handle=None, patch=None):
+        self.name = name
+        self.db_type = db_type
+        self.standin = standin
+        self.options = options or {}
+        # Fake driver handle, or None to connect to standin.port with the real driver
+        self.handle = handle
+        # Replaces the driver's connect() for adapters that open extra connections
+        self.patch = patch
+
+    def session(self, module) -> Session:
+        if self.handle is None:
+            session = module.connect(
+                "127.0.0.1", self.standin.port, "", "", None, LOGGER
+            )
+            if session is None:
+                raise SystemExit(f"{self.name}: cannot connect to the stand-in")
+        else:
+            session = Session("127.0.0.1", 0, "", "", None, self.handle())
+        session.options = self.options
+        return session
+
+
+def build_cases(args):
+    latency = args.latency_ms / 1000
+    redis = standins.RedisStandIn(latency)
+    elasticsearch = standins.ElasticsearchStandIn(latency, args.indices)
+    couchdb = standins.CouchDBStandIn(latency, args.databases)
+    influxdb = standins.InfluxDBStandIn(latency, args.databases // 10)
+    mysql = standins.SQLCatalog(latency, args.schemas, args.tables)
+    postgres = standins.SQLCatalog(latency, args.schemas, args.tables)
+    mssql = standins.SQLCatalog(latency, args.schemas, args.tables)
+    mongodb = standins.FakeMongoClient(latency, args.schemas)
+    neo4j = standins.FakeNeo4jDriver(latency)
+    cassandra = standins.FakeCassandraSession(latency)
+
+    def mysql_patch(module):
+        module.pymysql.connect = lambda **kwargs: mysql.connect(mysql.mysql_rows)
+
+    def mssql_patch(module):
+        module.pymssql.connect = lambda **kwargs: mssql.connect(mssql.mssql_rows)
+
+    return [
+        Case("redis", "redis", redis),
+        Case("elasticsearch", "elasticsearch", elasticsearch),
+        Case(
+            "elasticsearch chunked",
+            "elasticsearch",
+            elasticsearch,
+            {"chunk_size": 1000},
+        ),
+        Case("couchdb", "couchdb", couchdb),
+        Case("influxdb", "influxdb", influxdb),
+        Case(
+            "mysql",
+            "mysql",
+            mysql,
+            handle=lambda: mysql.connect(mysql.mysql_rows),
+        ),
+        Case(
+            "mysql fast",
+            "mysql",
+            mysql,
+            {"fast": True},
+            handle=lambda: mysql.connect(mysql.mysql_rows),
+        ),
+        Case(
+            "mysql per_schema",
+            "mysql",
+            mysql,
+            {"per_schema": True},
+            handle=lambda: mysql.connect(mysql.mysql_rows),
+            patch=mysql_patch,
+        ),
+        Case(
+            "postgres",
+            "postgres",
+            postgres,
+            handle=lambda: postgres.connect(postgres.postgres_rows, "postgres"),
+        ),
+        Case(
+            "mssql",
+            "mssql",
+            mssql,
+            handle=lambda: mssql.connect(mssql.mssql_rows, "master"),
+            patch=mssql_patch,
+        ),
+        Case("mongodb", "mongodb", mongodb, handle=lambda: mongodb),
+        Case(
+            "mongodb collstats",
+            "mongodb",
+            mongodb,
+            {"collection_stats": True},
+            handle=lambda: mongodb,
+        ),
+        Case("neo4j", "neo4j", neo4j, handle=lambda: neo4j),
+        Case("cassandra", "cassandra", cassandra, handle=lambda: cassandra),
+    ]
+
+
+def enumerate_once(module, case: Case):
+    session = case.session(module)
+    try:
+        start = time.perf_counter()
+        result = module.enumerate_session(session, LOGGER)
+        seconds = time.perf_counter() - start
+    finally:
+        if case.handle is None:
+            module.close(session)
+    if "error" in result:
+        raise SystemExit(f"{case.name}: {result['error']}")
+    records = sum(len(v) for v in result.values() if isinstance(v, list))
+    return seconds, records
+
+
+def measure(case: Case, runs: int):
+    module = load(case.db_type)
+    if case.patch is not None:
+        case.patch(module)
+
+    requests_before = case.standin.counter.requests
+    samples = [enumerate_once(module, case) for _ in range(runs)]
+    requests = (case.standin.counter.requests - requests_before) / runs
+
+    # One more run with tracing and tracemalloc on, kept out of the timings
+    tracer = trace.Tracer()
+    trace.install(tracer)
+    tracemalloc.start()
+    try:
+        enumerate_once(module, case)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        trace.install(trace.NULL_TRACER)
+
+    seconds = statistics.median(s for s, _ in samples)
+    records = samples[-1][1]
+    return {
+        "case": case.name,
+        "seconds": seconds,
+        "records": records,
+        "records_per_s": records / seconds if seconds else None,
+        "requests": requests,
+        "round_trips": sum(span.round_trips for span in tracer.spans),
+        "peak_mb": peak / 2**20,
+    }
+
+
+def detection(case: Case, fingerprint: bool, timeout: int):
+    start = time.perf_counter()
+    winner = detect(
+        "127.0.0.1",
+        case.standin.port,
+        "",
+        "",
+        None,
+        LOGGER,
+        timeout,
+        fingerprint,
+        PortHistory(persist=False),
+    )
+    seconds = time.perf_counter() - start
+    if winner is not None:
+        load(winner[0]).close(winner[1])
+    return {
+        "target": case.db_type,
+        "fingerprint": fingerprint,
+        "detected": winner[0] if winner else None,
+        "seconds": seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=1.0)
+    parser.add_argument("--tables", type=int, default=100_000)
+    parser.add_argument("--schemas", type=int, default=100)
+    parser.add_argument("--indices", type=int, default=10_000)
+    parser.add_argument("--databases", type=int, default=10_000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=int, default=5)
+    parser.add_argument(
+        "--only", nargs="+", metavar="CASE", help="Case names to run, e.g. mysql redis"
+    )
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    cases = build_cases(args)
+    if args.only:
+        cases = [case for case in cases if case.name.split()[0] in args.only]
+
+    network = [case for case in cases if case.handle is None and case.options == {}]
+    detections = [
+        detection(case, fingerprint, args.timeout)
+        for case in network
+        for fingerprint in (True, False)
+    ]
+    results = [measure(case, args.runs) for case in cases]
+
+    mismatches = [row for row in detections if row["detected"] != row["target"]]
+    if args.json:
+        print(json.dumps({"detection": detections, "enumerate": results}, indent=2))
+    else:
+        report(detections, results)
+    if mismatches:
+        raise SystemExit(
+            "misdetected: "
+            + ", ".join(f"{row['target']} as {row['detected']}" for row in mismatches)
+        )
+
+
+def report(detections, results):
+
+    print(f"{'detect':<24} {'fingerprint':>11} {'detected':>14} {'seconds':>9}")
+    for row in detections:
+        flag = "" if row["detected"] == row["target"] else "  MISMATCH"
+        print(
+            f"{row['target']:<24} {str(row['fingerprint']):>11}"
+            f" {str(row['detected']):>14} {row['seconds']:>9.3f}{flag}"
+        )
+    print()
+    print(
+        f"{'enumerate':<24} {'seconds':>9} {'records':>9} {'records/s':>11}"
+        f" {'requests':>9} {'trips':>7} {'peak MB':>8}"
+    )
+    for row in results:
+        print(
+            f"{row['case']:<24} {row['seconds']:>9.3f} {row['records']:>9}"
+            f" {row['records_per_s']:>11.0f} {row['requests']:>9.0f}"
+            f" {row['round_trips']:>7} {row['peak_mb']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,643 @@
+"""Local stand-ins for the databases, used by benchmarks/offline.py.
+
+Redis, Elasticsearch, CouchDB and InfluxDB are served over loopback sockets
+so their real drivers run unchanged. The SQL adapters get fake DB-API
+connections, MongoDB, Neo4j and Cassandra fake driver handles. Every stand-in
+sleeps `latency` seconds per request to model the network round trip, counts
+the requests it served, and generates its catalog on the fly so 100k tables
+cost no setup time.
+"""
+
+import fnmatch
+import json
+import socketserver
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, unquote, urlparse
+
+
+class Counter:
+    def __init__(self):
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def hit(self, count: int = 1):
+        with self._lock:
+            self.requests += count
+
+
+# Network stand-ins
+
+
+class _Server:
+    """Runs a socketserver on an ephemeral loopback port in a daemon thread."""
+
+    def __init__(self, server):
+        self.server = server
+        self.port = server.server_address[1]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _resp(value) -> bytes:
+    if value is None:
+        return b"_\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        data = value.encode()
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+    if isinstance(value, dict):
+        return b"%%%d\r\n" % len(value) + b"".join(
+            _resp(k) + _resp(v) for k, v in value.items()
+        )
+    return b"*%d\r\n" % len(value) + b"".join(_resp(v) for v in value)
+
+
+def _parse_commands(buffer: bytearray):
+    """Pop every complete RESP command array off the front of buffer."""
+    commands = []
+    while True:
+        pos, args = 0, []
+        try:
+            end = buffer.index(b"\r\n", pos)
+            count = int(buffer[pos + 1 : end])
+            pos = end + 2
+            for _ in range(count):
+                end = buffer.index(b"\r\n", pos)
+                size = int(buffer[pos + 1 : end])
+                pos = end + 2
+                if len(buffer) < pos + size + 2:
+                    raise ValueError
+                args.append(bytes(buffer[pos : pos + size]).decode())
+                pos += size + 2
+        except ValueError:
+            return commands
+        del buffer[:pos]
+        commands.append(args)
+
+
+class RedisStandIn:
+    """RESP3 server with `databases` keyspaces in INFO.
+
+    Latency is charged once per batch of commands that arrived together, like a
+    round trip to a real server, so pipelining shows up in the numbers.
+    """
+
+    def __init__(self, latency: float = 0.0, databases: int = 16):
+        self.latency = latency
+        self.counter = Counter()
+        keyspace = "".join(
+            f"db{i}:keys={1000 + i},expires={i},avg_ttl=0\r\n" for i in range(databases)
+        )
+        self.info = (
+            "# Server\r\nredis_version:7.2.4\r\n"
+            "# Memory\r\nused_memory:1048576\r\nused_memory_human:1.00M\r\n"
+            f"# Keyspace\r\n{keyspace}"
+        )
+        self.databases = databases
+        standin = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                buffer = bytearray()
+                while data := self.request.recv(65536):
+                    buffer += data
+                    commands = _parse_commands(buffer)
+                    if commands:
+                        standin.counter.hit()
+                        time.sleep(standin.latency)
+                        self.request.sendall(
+                            b"".join(standin.reply(args) for args in commands)
+                        )
+
+        server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        server.daemon_threads = True
+        self._server = _Server(server)
+        self.port = self._server.port
+
+    def reply(self, args) -> bytes:
+        command = args[0].upper()
+        if command == "PING":
+            return b"+PONG\r\n"
+        if command == "HELLO":
+            return _resp({"server": "redis", "version": "7.2.4", "proto": 3})
+        if command == "INFO":
+            return _resp(self.info)
+        if command == "CONFIG":
+            return _resp({"databases": str(max(self.databases, 16))})
+        return b"+OK\r\n"
+
+    def close(self):
+        self._server.close()
+
+
+class _HTTPHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    standin = None
+
+    def _dispatch(self, method: str):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        self.standin.counter.hit()
+        time.sleep(self.standin.latency)
+        status, headers, payload = self.standin.route(method, url.path, query, body)
+        data = json.dumps(payload).encode() if payload is not None else b""
+        self.send_response(status)
+        for key, value in {**self.standin.headers, **headers}.items():
+            self.send_header(key, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if method != "HEAD":
+            self.wfile.write(data)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_HEAD(self):
+        self._dispatch("HEAD")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def log_message(self, *args):
+        pass
+
+
+class HTTPStandIn:
+    headers: dict = {}
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.counter = Counter()
+        handler = type("Handler", (_HTTPHandler,), {"standin": self})
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        server.daemon_threads = True
+        self._server = _Server(server)
+        self.port = self._server.port
+
+    def route(self, method, path, query, body):
+        raise NotImplementedError
+
+    def close(self):
+        self._server.close()
+
+
+class ElasticsearchStandIn(HTTPStandIn):
+    headers = {"X-Elastic-Product": "Elasticsearch"}
+
+    def __init__(self, latency: float = 0.0, indices: int = 10_000):
+        self.names = [f"index-{i:06d}" for i in range(indices)]
+        super().__init__(latency)
+
+    def route(self, method, path, query, body):
+        if path == "/":
+            info = {
+                "name": "standin",
+                "cluster_name": "standin",
+                "version": {"number": "8.13.0"},
+                "tagline": "You Know, for Search",
+            }
+            return 200, {}, info
+        if path.startswith("/_cat/indices"):
+            pattern = unquote(path[len("/_cat/indices/") :]) or "*"
+            names = self.resolve(pattern.split(","))
+            if query.get("s") == "store.size:desc":
+                names.sort(key=self.size, reverse=True)
+            if query.get("h") == "index":
+                return 200, {}, [{"index": name} for name in names]
+            return 200, {}, [self.index(name) for name in names]
+        return 404, {}, {"error": "not found"}
+
+    def resolve(self, patterns):
+        # Wildcards and -exclusions, applied left to right like the server does
+        names = []
+        for pattern in patterns:
+            if pattern.startswith("-"):
+                names = [n for n in names if not fnmatch.fnmatchcase(n, pattern[1:])]
+            else:
+                names += [n for n in self.names if fnmatch.fnmatchcase(n, pattern)]
+        return names
+
+    @staticmethod
+    def size(name: str) -> int:
+        return (int(name.rsplit("-", 1)[1]) % 997 + 1) * 4096
+
+    @staticmethod
+    def index(name: str):
+        size = ElasticsearchStandIn.size(name)
+        return {
+            "index": name,
+            "health": "green",
+            "status": "open",
+            "docs.count": "1000",
+            "store.size": str(size),
+            "pri.store.size": str(size // 2),
+            "pri": "1",
+            "rep": "1",
+        }
+
+
+class CouchDBStandIn(HTTPStandIn):
+    headers = {"Server": "CouchDB/3.3.3 (Erlang OTP/25)"}
+
+    def __init__(self, latency: float = 0.0, databases: int = 10_000):
+        self.names = sorted(f"db-{i:06d}" for i in range(databases))
+        super().__init__(latency)
+
+    def route(self, method, path, query, body):
+        if path == "/":
+            return 200, {}, {"couchdb": "Welcome", "version": "3.3.3"}
+        if path == "/_all_dbs":
+            names = self.names
+            if "startkey" in query:
+                start = json.loads(query["startkey"])
+                names = [name for name in names if name >= start]
+            names = names[int(query.get("skip", 0)) :]
+            return 200, {}, names[: int(query.get("limit", len(names)))]
+        if path == "/_dbs_info" and method == "POST":
+            return (
+                200,
+                {},
+                [{"key": key, "info": self.info(key)} for key in body["keys"]],
+            )
+        return 200, {}, self.info(unquote(path.strip("/")))
+
+    @staticmethod
+    def info(name: str):
+        return {
+            "db_name": name,
+            "doc_count": 100,
+            "doc_del_count": 0,
+            "sizes": {"file": 409600, "active": 204800, "external": 102400},
+            "update_seq": "100-x",
+        }
+
+
+class InfluxDBStandIn(HTTPStandIn):
+    headers = {"X-Influxdb-Version": "1.8.10"}
+
+    def __init__(
+        self, latency: float = 0.0, databases: int = 1_000, measurements: int = 10
+    ):
+        self.databases = [f"db{i:05d}" for i in range(databases)]
+        self.measurements = [[f"m{i}"] for i in range(measurements)]
+        super().__init__(latency)
+
+    def route(self, method, path, query, body):
+        if path == "/ping":
+            return 204, {}, None
+        if path != "/query":
+            return 404, {}, None
+        results = []
+        for i, statement in enumerate(query["q"].split("; ")):
+            if statement == "SHOW DATABASES":
+                values = [[name] for name in self.databases]
+                series = [{"name": "databases", "columns": ["name"], "values": values}]
+            elif statement.startswith("SHOW MEASUREMENTS"):
+                series = [
+                    {
+                        "name": "measurements",
+                        "columns": ["name"],
+                        "values": self.measurements,
+                    }
+                ]
+            else:
+                count = 5000 if "SERIES" in statement else len(self.measurements)
+                series = [{"columns": ["count"], "values": [[count]]}]
+            results.append({"statement_id": i, "series": series})
+        return 200, {}, {"results": results}
+
+
+# Fake drivers
+
+
+class FakeCursor:
+    """DB-API cursor whose result set is produced by the connection's `rows`."""
+
+    itersize = 2000
+
+    def __init__(self, conn, as_dict: bool = False):
+        self.conn = conn
+        self.as_dict = as_dict
+        self.rows = iter(())
+
+    def execute(self, query, args=None):
+        self.conn.counter.hit()
+        time.sleep(self.conn.latency)
+        self.rows = self.conn.rows(self.conn, query, args)
+
+    def fetchone(self):
+        return next(self.rows, None)
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def __iter__(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, rows, latency: float, counter: Counter, dbname: str = ""):
+        self.rows = rows
+        self.latency = latency
+        self.counter = counter
+        self.database = dbname
+        self.info = SimpleNamespace(dbname=dbname)
+
+    def cursor(self, *args, **kwargs):
+        return FakeCursor(self, as_dict=kwargs.get("as_dict", False))
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class SQLCatalog:
+    """Schemas and tables shared by the fake MySQL, Postgres and MSSQL backends."""
+
+    def __init__(self, latency: float = 0.0, schemas: int = 100, tables: int = 100_000):
+        self.latency = latency
+        self.counter = Counter()
+        self.schemas = [f"schema_{i:04d}" for i in range(schemas)]
+        self.per_schema = -(-tables // schemas)
+        self.tables = tables
+
+    def table_names(self, schemas=None):
+        produced = 0
+        for s, schema in enumerate(self.schemas):
+            count = min(self.per_schema, self.tables - s * self.per_schema)
+            if schemas is None or schema in schemas:
+                for t in range(max(count, 0)):
+                    yield schema, f"table_{t:05d}", produced + t
+            produced += max(count, 0)
+
+    def connect(self, rows, dbname: str = ""):
+        return FakeConnection(rows, self.latency, self.counter, dbname)
+
+    def mysql_rows(self, conn, query, args):
+        if "VERSION()" in query:
+            return iter([("8.0.36",)])
+        if query == "SHOW DATABASES":
+            return iter([(schema,) for schema in self.schemas])
+        schemas = {args[0]} if "TABLE_SCHEMA = %s" in query else None
+        return (
+            (schema, name, i, i * 16384)
+            for schema, name, i in self.table_names(schemas)
+        )
+
+    def postgres_rows(self, conn, query, args):
+        if "version()" in query:
+            return iter([("PostgreSQL 16.2",)])
+        if "pg_database" in query:
+            return iter([("postgres", True)])
+        return (
+            {
+                "schemaname": schema,
+                "tablename": name,
+                "approx_rows": i,
+                "size_bytes": i * 8192,
+            }
+            for schema, name, i in self.table_names()
+        )
+
+    def mssql_rows(self, conn, query, args):
+        if "@@VERSION" in query:
+            return iter(
+                [{"version": "Microsoft SQL Server 2022", "current_db": "master"}]
+            )
+        if "sys.databases" in query:
+            return iter(
+                [
+                    {"name": schema, "has_access": 1, "state_desc": "ONLINE"}
+                    for schema in self.schemas
+                ]
+            )
+        if query.startswith("USE"):
+            conn.database = query[5:-1]
+            return iter(())
+        return (
+            {
+                "schema_name": "dbo",
+                "table_name": name,
+                "row_count": i,
+                "total_space_bytes": i * 8192,
+            }
+            for schema, name, i in self.table_names({conn.database})
+        )
+
+
+class FakeMongoClient:
+    """pymongo MongoClient look-alike: `databases` databases of `collections` each."""
+
+    def __init__(
+        self, latency: float = 0.0, databases: int = 100, collections: int = 100
+    ):
+        self.latency = latency
+        self.counter = Counter()
+        self.names = [f"db{i:04d}" for i in range(databases)]
+        self.collections = collections
+
+    def _call(self):
+        self.counter.hit()
+        time.sleep(self.latency)
+
+    def server_info(self):
+        self._call()
+        return {"version": "7.0.6"}
+
+    def list_database_names(self):
+        self._call()
+        return list(self.names)
+
+    def __getitem__(self, name):
+        return _FakeMongoDatabase(self, name)
+
+    def close(self):
+        pass
+
+
+class _FakeMongoDatabase:
+    def __init__(self, client: FakeMongoClient, name: str):
+        self.client = client
+        self.name = name
+
+    def command(self, command):
+        self.client._call()
+        return {
+            "collections": self.client.collections,
+            "objects": 1000,
+            "dataSize": 1 << 20,
+            "storageSize": 1 << 21,
+            "indexes": self.client.collections,
+            "indexSize": 1 << 18,
+        }
+
+    def list_collections(self, nameOnly: bool = False):
+        self.client._call()
+        specs = [
+            {"name": f"c{i:04d}", "type": "collection", "options": {}}
+            for i in range(self.client.collections)
+        ]
+        if nameOnly:
+            return [{"name": s["name"], "type": s["type"]} for s in specs]
+        return specs
+
+    def __getitem__(self, name):
+        return _FakeMongoCollection(self.client, name)
+
+
+class _FakeMongoCollection:
+    def __init__(self, client: FakeMongoClient, name: str):
+        self.client = client
+        self.name = name
+
+    def aggregate(self, pipeline):
+        self.client._call()
+        storage = {
+            "count": 10,
+            "size": 1 << 14,
+            "nindexes": 1,
+            "totalIndexSize": 1 << 12,
+        }
+        return [{"ns": self.name, "storageStats": storage}]
+
+
+class FakeNeo4jDriver:
+    """neo4j Driver look-alike with `databases` graphs of `labels` labels each."""
+
+    def __init__(self, latency: float = 0.0, databases: int = 20, labels: int = 500):
+        self.latency = latency
+        self.counter = Counter()
+        self.databases = [f"graph{i:03d}" for i in range(databases)]
+        self.labels = labels
+
+    def session(self, database=None):
+        return _FakeNeo4jSession(self)
+
+    def close(self):
+        pass
+
+
+class _FakeNeo4jResult(list):
+    def single(self):
+        return self[0]
+
+    def data(self):
+        return list(self)
+
+
+class _FakeNeo4jSession:
+    def __init__(self, driver: FakeNeo4jDriver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def run(self, query, **params):
+        self.driver.counter.hit()
+        time.sleep(self.driver.latency)
+        if "dbms.components" in query:
+            return _FakeNeo4jResult([{"version": "5.18.0"}])
+        if query == "SHOW DATABASES":
+            names = ["system", *self.driver.databases]
+            return _FakeNeo4jResult(
+                {"name": name, "currentStatus": "online", "default": name == "graph000"}
+                for name in names
+            )
+        if "db.labels" in query:
+            return _FakeNeo4jResult(
+                [{"kind": "label", "name": f"L{i}"} for i in range(self.driver.labels)]
+                + [
+                    {"kind": "type", "name": f"T{i}"}
+                    for i in range(self.driver.labels // 5)
+                ]
+            )
+        rows = [
+            {
+                "kind": "label" if name.startswith("L") else "type",
+                "name": name,
+                "count": 10,
+            }
+            for name in params.get("names", [])
+        ]
+        if "'nodes' AS kind" in query:
+            rows += [
+                {"kind": "nodes", "name": None, "count": 1000},
+                {"kind": "relationships", "name": None, "count": 500},
+            ]
+        return _FakeNeo4jResult(rows)
+
+
+class FakeCassandraSession:
+    """cassandra-driver Session look-alike: cluster metadata plus size_estimates."""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        keyspaces: int = 50,
+        tables: int = 200,
+        hosts: int = 3,
+    ):
+        self.latency = latency
+        self.counter = Counter()
+        keyspace_meta = {
+            f"ks{k:03d}": SimpleNamespace(
+                tables={f"t{t:04d}": None for t in range(tables)}
+            )
+            for k in range(keyspaces)
+        }
+        host_list = [
+            SimpleNamespace(is_up=True, address=f"10.0.0.{i}") for i in range(hosts)
+        ]
+        self.cluster = SimpleNamespace(
+            metadata=SimpleNamespace(
+                keyspaces=keyspace_meta, all_hosts=lambda: host_list
+            ),
+            shutdown=lambda: None,
+        )
+
+    def execute(self, query, *args, **kwargs):
+        self.counter.hit()
+        time.sleep(self.latency)
+        return _FakeCassandraResult([SimpleNamespace(release_version="4.1.4")])
+
+    def execute_async(self, statement, host=None):
+        self.counter.hit()
+        time.sleep(self.latency)
+        rows = [
+            SimpleNamespace(
+                keyspace_name=keyspace,
+                table_name=table,
+                mean_partition_size=1024,
+                partitions_count=100,
+            )
+            for keyspace, meta in self.cluster.metadata.keyspaces.items()
+            for table in meta.tables
+        ]
+        return SimpleNamespace(result=lambda: rows)
+
+    def shutdown(self):
+        pass
+
+
+class _FakeCassandraResult(list):
+    def one(self):
+        return self[0] if self else None
@@ -0,0 +1,327 @@
+import asyncio
+import threading
+import time
+
+from abc import ABC, abstractmethod
+from collections import deque
+from types import ModuleType
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from .db_interface import Session
+from .deadline import Deadline
+from .detect import candidate_groups
+from .filters import apply_async as apply_filter_async
+from .history import PortHistory
+from .logger import VerboseLogger
+from .registry import load
+from .trace import current as current_tracer
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def to_daemon_thread(
+    func: Callable, *args, abandoned: Optional[Callable[[Any], None]] = None
+) -> asyncio.Future:
+    """Run a blocking call on a fresh daemon thread and await its result.
+
+    Unlike run_in_executor the thread is never joined, so a driver call that
+    hangs cannot hold up loop shutdown or interpreter exit. If the awaiting task
+    was cancelled by the time the call returns, its result is handed to
+    `abandoned` (on the worker thread) so it can be cleaned up.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(result, error):
+        if future.done():
+            if error is None and abandoned is not None:
+                threading.Thread(target=abandoned, args=(result,), daemon=True).start()
+        elif error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def target():
+        result, error = None, None
+        try:
+            result = func(*args)
+        except Exception as e:
+            error = e
+        try:
+            loop.call_soon_threadsafe(resolve, result, error)
+        except RuntimeError:
+            # Loop already closed, nobody is waiting for this any more
+            if error is None and abandoned is not None:
+                abandoned(result)
+
+    threading.Thread(target=target, daemon=True).start()
+    return future
+
+
+async def map_window_async(
+    func: Callable[[T], Awaitable[R]], items: Iterable[T], concurrency: int
+) -> AsyncIterator[R]:
+    """Event-loop counterpart of db_interface.map_window.
+
+    At most `concurrency` calls run at a time and 2 * concurrency are started
+    ahead of the consumer, results come back in order, and the calls not
+    finished are cancelled when the generator is closed.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    limit = 2 * concurrency
+    window = deque()
+
+    async def call(item):
+        async with semaphore:
+            return await func(item)
+
+    try:
+        for item in items:
+            if len(window) == limit:
+                yield await window.popleft()
+            window.append(asyncio.create_task(call(item)))
+        while window:
+            yield await window.popleft()
+    finally:
+        for task in window:
+            task.cancel()
+
+
+class AsyncDBInterface(ABC):
+    @staticmethod
+    @abstractmethod
+    def get_info() -> Dict[str, Any]:
+        pass
+
+    @staticmethod
+    @abstractmethod
+    async def open_session(session: Session, logger: VerboseLogger) -> None:
+        pass
+
+    @staticmethod
+    @abstractmethod
+    def stream_session(
+        session: Session, logger: VerboseLogger
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        pass
+
+    @staticmethod
+    @abstractmethod
+    async def close_session(session: Session) -> None:
+        pass
+
+    @classmethod
+    async def connect(
+        cls,
+        host: str,
+        port: int,
+        user: str,
+        password: str,
+        database: str,
+        logger: VerboseLogger,
+        deadline: Optional[Deadline] = None,
+    ) -> Optional[Session]:
+        name = cls.get_info()["name"]
+        session = Session(
+            host, port, user, password, database, deadline=deadline or Deadline()
+        )
+        try:
+            with session.tracer.span("connect", adapter=name, host=host, port=port):
+                await cls.open_session(session, logger)
+        except asyncio.CancelledError:
+            await cls.close(session)
+            raise
+        except Exception as e:
+            logger.error(f"Failed to connect to {name}: {str(e)}")
+            await cls.close(session)
+            return None
+        logger.info(f"Successfully connected to {name} at {host}:{port}")
+        return session
+
+    @classmethod
+    async def close(cls, session: Session) -> None:
+        if session.handle is None:
+            return
+        try:
+            await cls.close_session(session)
+        except Exception:
+            pass
+        session.handle = None
+
+    @classmethod
+    async def enumerate_session(
+        cls, session: Session, logger: VerboseLogger
+    ) -> Dict[str, Any]:
+        info = cls.get_info()
+        result = {"type": info["name"], "kind": info["kind"], "version": None}
+        for section in info["sections"]:
+            result[section] = []
+        records = apply_filter_async(
+            session.options, info["sections"], cls.stream_session(session, logger)
+        )
+        with session.tracer.span("enumerate", adapter=info["name"]):
+            async for section, value in records:
+                session.deadline.check()
+                if section in info["sections"]:
+                    result[section].append(value)
+                else:
+                    result[section] = value
+        return result
+
+
+class ThreadedAdapter:
+    """Async front for a synchronous adapter module, driver calls run on threads."""
+
+    def __init__(self, module: ModuleType):
+        self.module = module
+
+    def get_info(self) -> Dict[str, Any]:
+        return self.module.get_info()
+
+    async def connect(
+        self,
+        host: str,
+        port: int,
+        user: str,
+        password: str,
+        database: str,
+        logger: VerboseLogger,
+        deadline: Optional[Deadline] = None,
+    ) -> Optional[Session]:
+        return await to_daemon_thread(
+            self.module.connect,
+            host,
+            port,
+            user,
+            password,
+            database,
+            logger,
+            deadline,
+            abandoned=lambda session: session and self.module.close(session),
+        )
+
+    async def close(self, session: Session) -> None:
+        await to_daemon_thread(self.module.close, session)
+
+    async def enumerate_session(
+        self, session: Session, logger: VerboseLogger
+    ) -> Dict[str, Any]:
+        return await to_daemon_thread(self.module.enumerate_session, session, logger)
+
+
+def load_async(db_type: str):
+    """Return the native async adapter for a db type, or a threaded wrapper.
+
+    Only drivers without an async API (pymssql, cassandra-driver) or whose
+    async driver is not installed (the `async` extra) run on threads.
+    """
+    module = load(db_type)
+    return getattr(module, "async_adapter", None) or ThreadedAdapter(module)
+
+
+async def probe_concurrently_async(
+    adapters: Dict[str, Any],
+    host: str,
+    port: int,
+    user: str,
+    password: str,
+    database: str,
+    logger: VerboseLogger,
+    timeout_seconds: float = 5,
+    deadline: Optional[Deadline] = None,
+) -> Optional[Tuple[str, Session]]:
+    """Race connect() for every adapter, cancel the losers once one answers."""
+    deadline = (deadline or Deadline()).for_connect(timeout_seconds)
+
+    async def probe(db_type):
+        with current_tracer().span("probe", adapter=db_type):
+            return db_type, await adapters[db_type].connect(
+                host, port, user, password, database, logger, deadline
+            )
+
+    tasks = [asyncio.create_task(probe(db_type)) for db_type in adapters]
+    winner = None
+    try:
+        for next_done in asyncio.as_completed(
+            tasks, timeout=deadline.connect_timeout()
+        ):
+            try:
+                db_type, session = await next_done
+            except asyncio.TimeoutError:
+                break
+            if session is not None:
+                winner = (db_type, session)
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Probes that finished after the winner still hold open sessions
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, tuple) and result[1] is not None:
+                if winner is None or result[1] is not winner[1]:
+                    await adapters[result[0]].close(result[1])
+
+    if winner is None:
+        logger.error(
+            f"No probe succeeded against {host}:{port} within {timeout_seconds:.3g} seconds"
+        )
+    return winner
+
+
+async def detect_async(
+    host: str,
+    port: int,
+    user: str,
+    password: str,
+    database: str,
+    logger: VerboseLogger,
+    timeout_seconds: int = 5,
+    use_fingerprint: bool = True,
+    history: Optional[PortHistory] = None,
+    deadline: Optional[Deadline] = None,
+) -> Optional[Tuple[str, Session]]:
+    """Async counterpart of detect.detect()."""
+    groups = await to_daemon_thread(
+        candidate_groups,
+        host,
+        port,
+        logger,
+        min(timeout_seconds, 2),
+        use_fingerprint,
+        history,
+    )
+    # One connect window for all groups: a probe that only answers after
+    # --timeout is a timeout, whichever group it is in
+    window_ends = time.monotonic() + timeout_seconds
+    for candidates in groups:
+        remaining = window_ends - time.monotonic()
+        if remaining <= 0:
+            break
+        adapters = {db_type: load_async(db_type) for db_type in candidates}
+        winner = await probe_concurrently_async(
+            adapters,
+            host,
+            port,
+            user,
+            password,
+            database,
+            logger,
+            remaining,
+            deadline,
+        )
+        if winner is not None:
+            if history is not None:
+                history.record(port, winner[0])
+            return winner
+    return None
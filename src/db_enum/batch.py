@@ -0,0 +1,212 @@
+import asyncio
+import queue
+import shlex
+import threading
+import time
+
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from .aio import detect_async, load_async
+from .deadline import Deadline
+from .detect import detect
+from .history import PortHistory
+from .logger import VerboseLogger
+from .registry import DB_TYPES, load
+
+
+@dataclass
+class Target:
+    host: str
+    port: int
+    db_type: Optional[str] = None
+    user: Optional[str] = None
+    password: Optional[str] = None
+    database: Optional[str] = None
+
+    def __str__(self) -> str:
+        host = f"[{self.host}]" if ":" in self.host else self.host
+        return f"{host}:{self.port}"
+
+
+def parse_scope(lines: Iterable[str]) -> List[Target]:
+    """Parse a scope file, one `host:port [type [user [password [database]]]]` per line.
+
+    Fields are shell-quoted so passwords may contain spaces, `-` leaves a field
+    unset (and `auto` or `-` as the type means detect it), `#` starts a comment.
+    """
+    targets = []
+    for lineno, line in enumerate(lines, 1):
+        fields = shlex.split(line, comments=True)
+        if not fields:
+            continue
+        host, sep, port = fields[0].rpartition(":")
+        if not sep or not host or not port.isdigit():
+            raise ValueError(f"line {lineno}: expected host:port, got {fields[0]!r}")
+        fields = [None if f == "-" else f for f in fields[1:]] + [None] * 4
+        db_type, user, password, database = fields[:4]
+        if db_type == "auto":
+            db_type = None
+        if db_type is not None and db_type not in DB_TYPES:
+            raise ValueError(f"line {lineno}: unknown database type {db_type!r}")
+        targets.append(
+            Target(host.strip("[]"), int(port), db_type, user, password, database)
+        )
+    return targets
+
+
+def run_target(
+    target: Target,
+    logger: VerboseLogger,
+    timeout_seconds: int,
+    use_fingerprint: bool,
+    history: PortHistory,
+    options: Dict[str, Any],
+    deadline: Optional[Deadline] = None,
+) -> Dict[str, Any]:
+    deadline = deadline or Deadline()
+    args = (target.host, target.port, target.user, target.password, target.database)
+    if target.db_type is not None:
+        db_type = target.db_type
+        module = load(db_type)
+        session = module.connect(*args, logger, deadline.for_connect(timeout_seconds))
+        if session is None:
+            return {"status": "error", "error": f"Failed to connect to {db_type}"}
+    else:
+        winner = detect(
+            *args, logger, timeout_seconds, use_fingerprint, history, deadline
+        )
+        if winner is None:
+            return {"status": "undetected"}
+        db_type, session = winner
+        module = load(db_type)
+
+    session.options = options
+    try:
+        result = module.enumerate_session(session, logger)
+    finally:
+        module.close(session)
+    return {"status": "ok", "type": db_type, "result": result}
+
+
+def run_batch(
+    targets: List[Target],
+    run: Callable[[Target], Dict[str, Any]],
+    emit: Callable[[Dict[str, Any]], None],
+    concurrency: int = 16,
+    target_timeout: int = 120,
+):
+    """Run targets on at most `concurrency` threads, emitting records as they finish.
+
+    Each target runs on its own daemon thread. A target that exceeds
+    `target_timeout` gets a timeout record and its slot is handed to the next
+    target, the stuck thread is abandoned instead of stalling the batch. `run`
+    should hand the same limit to the drivers as a Deadline, so abandoned
+    threads also stop soon after.
+    """
+    results: queue.Queue = queue.Queue()
+    running: Dict[int, float] = {}
+    pending = list(enumerate(targets))
+    pending.reverse()
+
+    def worker(index: int, target: Target):
+        try:
+            record = run(target)
+        except Exception as e:
+            record = {"status": "error", "error": str(e)}
+        results.put((index, record))
+
+    while pending or running:
+        while pending and len(running) < concurrency:
+            index, target = pending.pop()
+            running[index] = time.monotonic() + target_timeout
+            threading.Thread(
+                target=worker,
+                args=(index, target),
+                name=f"target-{target}",
+                daemon=True,
+            ).start()
+
+        try:
+            timeout = max(0, min(running.values()) - time.monotonic())
+            index, record = results.get(timeout=timeout)
+            if running.pop(index, None) is not None:
+                emit({"target": str(targets[index]), **record})
+        except queue.Empty:
+            now = time.monotonic()
+            for index, deadline in list(running.items()):
+                if deadline <= now:
+                    del running[index]
+                    emit(
+                        {
+                            "target": str(targets[index]),
+                            "status": "timeout",
+                            "error": f"Timed out after {target_timeout} seconds",
+                        }
+                    )
+
+
+async def run_target_async(
+    target: Target,
+    logger: VerboseLogger,
+    timeout_seconds: int,
+    use_fingerprint: bool,
+    history: PortHistory,
+    options: Dict[str, Any],
+    deadline: Optional[Deadline] = None,
+) -> Dict[str, Any]:
+    deadline = deadline or Deadline()
+    args = (target.host, target.port, target.user, target.password, target.database)
+    if target.db_type is not None:
+        db_type = target.db_type
+        adapter = load_async(db_type)
+        session = await adapter.connect(
+            *args, logger, deadline.for_connect(timeout_seconds)
+        )
+        if session is None:
+            return {"status": "error", "error": f"Failed to connect to {db_type}"}
+    else:
+        winner = await detect_async(
+            *args, logger, timeout_seconds, use_fingerprint, history, deadline
+        )
+        if winner is None:
+            return {"status": "undetected"}
+        db_type, session = winner
+        adapter = load_async(db_type)
+
+    session.options = options
+    try:
+        result = await adapter.enumerate_session(session, logger)
+    finally:
+        await adapter.close(session)
+    return {"status": "ok", "type": db_type, "result": result}
+
+
+async def run_batch_async(
+    targets: List[Target],
+    run: Callable[[Target], Awaitable[Dict[str, Any]]],
+    emit: Callable[[Dict[str, Any]], None],
+    concurrency: int = 16,
+    target_timeout: int = 120,
+):
+    """Event-loop counterpart of run_batch.
+
+    Adapters with a native async driver run on the loop itself and are cancelled
+    outright when a target times out, the rest run on daemon threads.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(target: Target):
+        async with semaphore:
+            try:
+                record = await asyncio.wait_for(run(target), target_timeout)
+            except asyncio.TimeoutError:
+                record = {
+                    "status": "timeout",
+                    "error": f"Timed out after {target_timeout} seconds",
+                }
+            except Exception as e:
+                record = {"status": "error", "error": str(e)}
+        emit({"target": str(target), **record})
+
+    await asyncio.gather(*(run_one(target) for target in targets))
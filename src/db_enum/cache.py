@@ -0,0 +1,151 @@
+import functools
+import hashlib
+import hmac
+import json
+import os
+import time
+
+from typing import Any, Dict, Optional
+
+from .encoders import custom_json_serializer
+from .history import cache_dir
+
+
+@functools.lru_cache(maxsize=None)
+def _secret() -> bytes:
+    """Per-install HMAC key for target hashes, created on first use.
+
+    Falls back to a per-process key when the cache directory is not writable,
+    which only means cached entries are not found again by later runs.
+    """
+    path = os.path.join(cache_dir(), "secret")
+    try:
+        with open(path, "rb") as f:
+            secret = f.read()
+        if len(secret) >= 32:
+            return secret
+    except OSError:
+        pass
+    secret = os.urandom(32)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(cache_dir(), exist_ok=True)
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(secret)
+        try:
+            # Unlike os.replace, fails if another run created one meanwhile
+            os.link(tmp_path, path)
+        finally:
+            os.remove(tmp_path)
+    except FileExistsError:
+        with open(path, "rb") as f:
+            secret = f.read()
+    except OSError:
+        pass
+    return secret
+
+
+class ResultCache:
+    """Detected db type, version and optionally the last result, per target.
+
+    Each target is one JSON file named after an HMAC of its host, port and
+    credentials, keyed with a random secret kept in cache_dir() (readable by
+    the owner only), so neither the password nor an offline-guessable hash of
+    it is written to disk. Entries expire after `ttl`
+    seconds, and once the directory grows past `max_bytes` the least recently
+    used entries are evicted.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: int = 86400,
+        max_bytes: int = 64 * 1024 * 1024,
+        persist: bool = True,
+    ):
+        self.path = path or os.path.join(cache_dir(), "targets")
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.persist = persist
+
+    @staticmethod
+    def key(
+        host: str,
+        port: int,
+        user: Optional[str],
+        password: Optional[str],
+        database: Optional[str],
+    ) -> str:
+        fields = json.dumps([host.lower(), port, user, password, database])
+        return hmac.new(_secret(), fields.encode(), hashlib.sha256).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.persist:
+            return None
+        path = self._entry_path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get("stored_at", 0) > self.ttl:
+            self.invalidate(key)
+            return None
+        try:
+            # mtime is the last use, for eviction
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def put(
+        self,
+        key: str,
+        db_type: str,
+        version: Any,
+        result: Optional[Dict[str, Any]] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ):
+        if not self.persist:
+            return
+        entry = {
+            "db_type": db_type,
+            "version": version,
+            "stored_at": time.time(),
+            "result": result,
+            "options": options or {},
+        }
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f, default=custom_json_serializer)
+            os.replace(tmp_path, path)
+            self._evict()
+        except OSError:
+            pass
+
+    def invalidate(self, key: str):
+        try:
+            os.remove(self._entry_path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.path):
+            if not name.endswith(".json"):
+                continue
+            stat = os.stat(os.path.join(self.path, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.path, name))
+            total -= size
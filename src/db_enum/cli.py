@@ -1,51 +1,32 @@
-import importlib
-import os
-import json
-import signal
+import asyncio
 
+from contextlib import closing
 from datetime import datetime
-from typing import Any
-from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
 
 import click
 
+from .batch import (
+    parse_scope,
+    run_batch,
+    run_batch_async,
+    run_target,
+    run_target_async,
+)
+from .cache import ResultCache
+from .db_interface import Session
+from .deadline import Deadline, DeadlineExceeded, run_until, within
+from .detect import candidate_groups, detect
+from .encoders import ENCODERS, Output, compression_for
+from .filters import apply as apply_filter, parse_size
+from .history import PortHistory
 from .logger import VerboseLogger
+from .registry import ADAPTERS, DB_TYPES, load
+from .snapshot import SnapshotStore, diff
+from .trace import Tracer, install
 
 
-def custom_json_serializer(obj: Any) -> str:
-    if isinstance(obj, datetime):
-        return obj.isoformat()
-    # raise TypeError(f"Type {type(obj)} not serializable")
-    return str(obj)
-
-
-# Automatically discover DB_TYPES
-DB_TYPES = [
-    f.split(".")[0]
-    for f in os.listdir(os.path.join(os.path.dirname(__file__), "db"))
-    if f.endswith(".py") and not f.startswith("__")
-]
-
-
-class TimeoutError(Exception):
-    pass
-
-
-@contextmanager
-def fail_on_timeout(seconds):
-    def signal_handler(signum, frame):
-        raise TimeoutError("Timed out!")
-
-    signal.signal(signal.SIGALRM, signal_handler)
-    signal.alarm(seconds)
-    try:
-        yield
-    finally:
-        signal.alarm(0)
-        signal.signal(signal.SIGALRM, signal.SIG_DFL)
-
-
-def check_connection_with_timeout(
+def connect_with_timeout(
     module,
     host: str,
     port: int,
@@ -54,20 +35,181 @@ def check_connection_with_timeout(
     database: str,
     logger: VerboseLogger,
     timeout_seconds: int = 5,
-) -> bool:
+    deadline: Optional[Deadline] = None,
+) -> Optional[Session]:
+    deadline = (deadline or Deadline()).for_connect(timeout_seconds)
     try:
-        with fail_on_timeout(timeout_seconds):
-            return module.check_connection(host, port, user, password, database, logger)
-    except TimeoutError:
-        logger.error(
-            f"Connection to {module.get_info()['name']} at {host}:{port} timed out after {timeout_seconds} seconds"
+        return run_until(
+            deadline,
+            module.connect,
+            host,
+            port,
+            user,
+            password,
+            database,
+            logger,
+            deadline,
+            abandoned=lambda session: session and module.close(session),
         )
-        return False
     except Exception as e:
         logger.error(
             f"Error connecting to {module.get_info()['name']} at {host}:{port}: {str(e)}"
         )
-        return False
+        return None
+
+
+def run_with_global_timeout(ctx, func: Callable[[], None]):
+    """Run a command body against the global deadline.
+
+    Drivers enforce the deadline themselves and fail with their own timeout
+    errors, so any error once the deadline has passed is reported as the
+    global timeout.
+    """
+    deadline = ctx.obj["deadline"]
+    try:
+        run_until(deadline, func)
+    except Exception as e:
+        if not isinstance(e, DeadlineExceeded) and not deadline.expired():
+            raise
+        ctx.obj["logger"].error(
+            f"Global timeout of {ctx.obj['global_timeout']} seconds reached. Operation aborted."
+        )
+        exit(1)
+
+
+def parse_options(values) -> Dict[str, Any]:
+    options = {}
+    for value in values:
+        key, sep, raw = value.partition("=")
+        if not sep or not key:
+            raise click.BadParameter(f"expected KEY=VALUE, got {value!r}")
+        if raw.lower() in ("true", "yes", "on"):
+            options[key] = True
+        elif raw.lower() in ("false", "no", "off"):
+            options[key] = False
+        elif raw.isdigit():
+            options[key] = int(raw)
+        else:
+            options[key] = raw
+    return options
+
+
+def parse_min_size(ctx, param, value) -> Optional[int]:
+    if value is None:
+        return None
+    try:
+        return parse_size(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+def write_result(
+    module,
+    session: Session,
+    logger: VerboseLogger,
+    output: Output,
+    options: Dict[str, Any],
+    diff_threshold: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Enumerate on an open session, print the result and close the session.
+
+    With a streaming output (ndjson) every record is written as soon as the
+    adapter yields it instead of being collected into one document first, so
+    only the version is returned. Otherwise the returned value is the printed
+    document.
+
+    With a diff_threshold only the changes since the target's previous
+    snapshot are printed, and the new snapshot replaces it.
+    """
+    session.options = options
+    try:
+        if diff_threshold is not None:
+            return write_diff(module, session, logger, output, diff_threshold)
+        if output.streaming:
+            info = module.get_info()
+            name = info["name"]
+            result = {"version": None}
+            records = apply_filter(
+                options, info["sections"], module.stream_session(session, logger)
+            )
+            with session.tracer.span("enumerate", adapter=name):
+                for section, value in within(session.deadline, records):
+                    if section == "version":
+                        result["version"] = value
+                    output.record({"type": name, "section": section, "data": value})
+        else:
+            result = module.enumerate_session(session, logger)
+            output.document(result)
+    finally:
+        module.close(session)
+    return result
+
+
+def write_diff(
+    module,
+    session: Session,
+    logger: VerboseLogger,
+    output: Output,
+    threshold: float,
+) -> Dict[str, Any]:
+    info = module.get_info()
+    name = info["name"]
+    store = SnapshotStore()
+    key = SnapshotStore.key(
+        module.__name__.rsplit(".", 1)[-1],
+        ResultCache.key(
+            session.host,
+            session.port,
+            session.user,
+            session.password,
+            session.database,
+        ),
+        session.options,
+    )
+    taken_at, previous = store.load_index(key)
+    if taken_at is None:
+        logger.info("No previous snapshot for this target, everything is new")
+    else:
+        logger.info(
+            f"Comparing against the snapshot from {datetime.fromtimestamp(taken_at)}"
+        )
+
+    result = {"version": None}
+
+    def records():
+        for section, value in within(
+            session.deadline,
+            apply_filter(
+                session.options,
+                info["sections"],
+                module.stream_session(session, logger),
+            ),
+        ):
+            if section == "version":
+                result["version"] = value
+            yield section, value
+
+    with (
+        session.tracer.span("enumerate", adapter=name),
+        closing(previous),
+        store.writer(key) as save,
+    ):
+        changes = []
+        for change in diff(records(), previous, threshold, save):
+            if output.streaming:
+                output.record({"type": name, **change})
+            else:
+                changes.append(change)
+    if not output.streaming:
+        document = {
+            "type": name,
+            "previous_snapshot": (
+                datetime.fromtimestamp(taken_at) if taken_at is not None else None
+            ),
+            "changes": changes,
+        }
+        output.document(document)
+    return result
 
 
 @click.group()
@@ -77,12 +219,138 @@ def check_connection_with_timeout(
     default=60,
     help="Global timeout for the entire command execution in seconds",
 )
+@click.option(
+    "--output",
+    type=click.Choice(list(ENCODERS)),
+    default="json",
+    help="Indented JSON, one JSON line per record as it is retrieved (ndjson), "
+    "single-line JSON (compact), JSON with one row array per record (columnar) "
+    "or MessagePack",
+)
+@click.option(
+    "--output-file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write the output to this file instead of stdout",
+)
+@click.option(
+    "--compress",
+    type=click.Choice(["gzip", "zstd"]),
+    help="Compress --output-file, by default chosen from its .gz or .zst suffix",
+)
+@click.option(
+    "--option",
+    "-o",
+    "options",
+    multiple=True,
+    help="Adapter setting as KEY=VALUE, e.g. -o concurrency=8 (repeatable)",
+)
+@click.option(
+    "--top",
+    type=click.IntRange(min=1),
+    help="Only report the N largest objects (tables, indices, ...) of each kind",
+)
+@click.option(
+    "--min-size",
+    callback=parse_min_size,
+    help="Only report objects at least this large, e.g. 500M or 10G",
+)
+@click.option(
+    "--include",
+    multiple=True,
+    help="Only report objects in schemas/databases matching this glob (repeatable)",
+)
+@click.option(
+    "--exclude",
+    multiple=True,
+    help="Skip objects in schemas/databases matching this glob (repeatable)",
+)
+@click.option(
+    "--diff",
+    "diff_mode",
+    is_flag=True,
+    help="Print only what changed since the previous --diff run against the same target",
+)
+@click.option(
+    "--diff-threshold",
+    default=10.0,
+    help="Percentage a size or row count has to move by to count as changed",
+)
+@click.option(
+    "--trace",
+    "trace_path",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write per-phase timing spans to this file when the command ends",
+)
+@click.option(
+    "--trace-format",
+    type=click.Choice(["chrome", "otlp"]),
+    default="chrome",
+    help="Chrome trace-event JSON (chrome://tracing, Perfetto) or OTLP/JSON",
+)
+@click.option(
+    "--timings",
+    is_flag=True,
+    help="Print time and round trips per phase to stderr when the command ends",
+)
 @click.pass_context
-def cli(ctx, verbose, global_timeout):
+def cli(
+    ctx,
+    verbose,
+    global_timeout,
+    output,
+    output_file,
+    compress,
+    options,
+    top,
+    min_size,
+    include,
+    exclude,
+    diff_mode,
+    diff_threshold,
+    trace_path,
+    trace_format,
+    timings,
+):
     """Database enumeration tool for security testing."""
     ctx.ensure_object(dict)
     ctx.obj["logger"] = VerboseLogger(verbose)
     ctx.obj["global_timeout"] = global_timeout
+    ctx.obj["deadline"] = Deadline(global_timeout)
+    if compress and not output_file:
+        raise click.UsageError("--compress needs --output-file")
+    try:
+        ctx.obj["output"] = Output(
+            output,
+            output_file,
+            compress or output_file and compression_for(output_file),
+        )
+    except RuntimeError as e:
+        raise click.UsageError(str(e))
+    ctx.call_on_close(ctx.obj["output"].close)
+    ctx.obj["options"] = parse_options(options)
+    # Filters travel with the adapter options, so batch targets and the
+    # result cache see them too
+    for key, value in (
+        ("top", top),
+        ("min_size", min_size),
+        ("include", list(include)),
+        ("exclude", list(exclude)),
+    ):
+        if value:
+            ctx.obj["options"][key] = value
+    ctx.obj["diff_threshold"] = diff_threshold / 100 if diff_mode else None
+
+    if trace_path or timings:
+        tracer = Tracer()
+        install(tracer)
+
+        def report():
+            if trace_path:
+                tracer.write(trace_path, trace_format)
+            if timings:
+                click.echo(tracer.format_summary(), err=True)
+
+        ctx.call_on_close(report)
 
 
 @cli.command()
@@ -92,46 +360,272 @@ def cli(ctx, verbose, global_timeout):
 @click.option("--password", required=False, help="Database password")
 @click.option("--database", help="Database name")
 @click.option("--timeout", default=15, help="Connection timeout in seconds")
+@click.option(
+    "--concurrent/--sequential",
+    default=True,
+    help="Probe all database types in parallel, or one at a time",
+)
+@click.option(
+    "--fingerprint/--no-fingerprint",
+    "use_fingerprint",
+    default=True,
+    help="Identify the protocol over a raw socket before loading any driver",
+)
+@click.option(
+    "--history/--no-history",
+    "use_history",
+    default=True,
+    help="Order probes by which types were detected on this port before",
+)
+@click.option(
+    "--cache/--no-cache",
+    "use_cache",
+    default=True,
+    help="Remember the detected type per host, port and credentials and go straight to it next time",
+)
+@click.option(
+    "--cache-results",
+    is_flag=True,
+    help="Also cache the enumeration result and print it instead of re-enumerating while it is fresh",
+)
+@click.option(
+    "--cache-ttl",
+    default=86400,
+    help="Seconds a cache entry stays valid",
+)
+@click.option(
+    "--refresh",
+    is_flag=True,
+    help="Ignore the cache for this run, detect and enumerate again and update it",
+)
 @click.pass_context
 def magic(
-    ctx, host: str, port: int, user: str, password: str, database: str, timeout: int
+    ctx,
+    host: str,
+    port: int,
+    user: str,
+    password: str,
+    database: str,
+    timeout: int,
+    concurrent: bool,
+    use_fingerprint: bool,
+    use_history: bool,
+    use_cache: bool,
+    cache_results: bool,
+    cache_ttl: int,
+    refresh: bool,
 ):
     """Automatically detect and enumerate the database type."""
     logger = ctx.obj["logger"]
-    global_timeout = ctx.obj["global_timeout"]
-    logger.info(
-        f"Auto-detecting database type, {timeout}s limit per detection. This can take a while..."
-    )
+    deadline = ctx.obj["deadline"]
+    output = ctx.obj["output"]
+    options = ctx.obj["options"]
+    cache = ResultCache(ttl=cache_ttl, persist=use_cache)
+    cache_key = cache.key(host, port, user, password, database)
 
-    try:
-        with fail_on_timeout(global_timeout):
-            for db_type in DB_TYPES:
-                logger.info(f"Trying to connect with {db_type} client...")
-                module = importlib.import_module(f"db_enum.db.{db_type}")
-                if check_connection_with_timeout(
-                    module, host, port, user, password, database, logger, timeout
-                ):
-                    logger.info(f"Detected {db_type} database. Enumerating...")
-                    result = module.enumerate(
-                        host, port, user, password, database, logger
-                    )
-                    click.echo(
-                        json.dumps(result, indent=2, default=custom_json_serializer)
-                    )
-                    return
-            logger.error("Failed to detect any supported database type.")
-            exit(1)
-    except TimeoutError:
-        logger.error(
-            f"Global timeout of {global_timeout} seconds reached. Operation aborted."
+    def finish(db_type: str, session: Session):
+        result = write_result(
+            load(db_type), session, logger, output, options, ctx.obj["diff_threshold"]
+        )
+        diffing = ctx.obj["diff_threshold"] is not None
+        stored = (
+            result if cache_results and not output.streaming and not diffing else None
+        )
+        cache.put(cache_key, db_type, result.get("version"), stored, options)
+
+    def run():
+        entry = None if refresh else cache.get(cache_key)
+        if entry is not None:
+            db_type = entry["db_type"]
+            if (
+                cache_results
+                and not output.streaming
+                and ctx.obj["diff_threshold"] is None
+                and entry.get("result") is not None
+                and entry.get("options") == options
+            ):
+                logger.info(f"Using cached {db_type} result, pass --refresh to re-run")
+                output.document(entry["result"])
+                return
+            logger.info(f"Cached as {db_type}, connecting directly...")
+            session = connect_with_timeout(
+                load(db_type),
+                host,
+                port,
+                user,
+                password,
+                database,
+                logger,
+                timeout,
+                deadline,
+            )
+            if session is not None:
+                finish(db_type, session)
+                return
+            logger.info(f"Cached type {db_type} did not answer, detecting again...")
+            cache.invalidate(cache_key)
+
+        history = PortHistory(persist=use_history)
+
+        if concurrent:
+            logger.info(
+                f"Auto-detecting database type, probing in parallel with a {timeout}s limit..."
+            )
+            winner = detect(
+                host,
+                port,
+                user,
+                password,
+                database,
+                logger,
+                timeout,
+                use_fingerprint,
+                history,
+                deadline,
+            )
+            if winner is None:
+                logger.error("Failed to detect any supported database type.")
+                exit(1)
+            db_type, session = winner
+            logger.info(f"Detected {db_type} database. Enumerating...")
+            finish(db_type, session)
+            return
+
+        groups = candidate_groups(
+            host, port, logger, min(timeout, 2), use_fingerprint, history
         )
+        logger.info(
+            f"Auto-detecting database type, {timeout}s limit per detection. This can take a while..."
+        )
+        for db_type in [db_type for group in groups for db_type in group]:
+            logger.info(f"Trying to connect with {db_type} client...")
+            module = load(db_type)
+            session = connect_with_timeout(
+                module, host, port, user, password, database, logger, timeout, deadline
+            )
+            if session is not None:
+                logger.info(f"Detected {db_type} database. Enumerating...")
+                history.record(port, db_type)
+                finish(db_type, session)
+                return
+        logger.error("Failed to detect any supported database type.")
         exit(1)
 
+    run_with_global_timeout(ctx, run)
+
+
+@cli.command()
+@click.option(
+    "--scope",
+    required=True,
+    type=click.File(),
+    help="File with one `host:port [type [user [password [database]]]]` per line",
+)
+@click.option("--user", required=False, help="Default database user")
+@click.option("--password", required=False, help="Default database password")
+@click.option("--database", help="Default database name")
+@click.option("--timeout", default=15, help="Connection timeout in seconds")
+@click.option(
+    "--concurrency",
+    default=16,
+    type=click.IntRange(min=1),
+    help="Number of targets run at once",
+)
+@click.option(
+    "--target-timeout",
+    default=120,
+    type=click.IntRange(min=1),
+    help="Time limit for detecting and enumerating a single target in seconds",
+)
+@click.option(
+    "--fingerprint/--no-fingerprint",
+    "use_fingerprint",
+    default=True,
+    help="Identify the protocol over a raw socket before loading any driver",
+)
+@click.option(
+    "--engine",
+    type=click.Choice(["threads", "asyncio"]),
+    default="threads",
+    help="Run targets on worker threads, or on one event loop using async drivers where available",
+)
+@click.pass_context
+def batch(
+    ctx,
+    scope,
+    user: str,
+    password: str,
+    database: str,
+    timeout: int,
+    concurrency: int,
+    target_timeout: int,
+    use_fingerprint: bool,
+    engine: str,
+):
+    """Detect and enumerate every target in a scope file, one record per target.
+
+    The global timeout does not apply here, each target is bounded by
+    --target-timeout instead.
+    """
+    logger = ctx.obj["logger"]
+    try:
+        targets = parse_scope(scope)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--scope")
+
+    for target in targets:
+        target.user = target.user if target.user is not None else user
+        target.password = target.password if target.password is not None else password
+        target.database = target.database if target.database is not None else database
+
+    history = PortHistory()
+
+    emit = ctx.obj["output"].record
+
+    logger.info(f"Running {len(targets)} targets, {concurrency} at a time...")
+    if engine == "asyncio":
+        asyncio.run(
+            run_batch_async(
+                targets,
+                lambda target: run_target_async(
+                    target,
+                    logger,
+                    timeout,
+                    use_fingerprint,
+                    history,
+                    ctx.obj["options"],
+                    Deadline(target_timeout),
+                ),
+                emit,
+                concurrency,
+                target_timeout,
+            )
+        )
+    else:
+        run_batch(
+            targets,
+            lambda target: run_target(
+                target,
+                logger,
+                timeout,
+                use_fingerprint,
+                history,
+                ctx.obj["options"],
+                Deadline(target_timeout),
+            ),
+            emit,
+            concurrency,
+            target_timeout,
+        )
+
 
 # Modify the individual database commands as well
 for db_type in DB_TYPES:
 
-    @cli.command(name=db_type)
+    @cli.command(
+        name=db_type,
+        short_help=f"Enumerate {ADAPTERS[db_type].name} ({ADAPTERS[db_type].kind})",
+    )
     @click.option("--host", required=True, help="Database host")
     @click.option("--port", required=True, type=int, help="Database port")
     @click.option("--user", required=False, help="Database user")
@@ -150,28 +644,27 @@ for db_type in DB_TYPES:
         db_type: str = db_type,
     ):
         logger = ctx.obj["logger"]
-        global_timeout = ctx.obj["global_timeout"]
-
-        try:
-            with fail_on_timeout(global_timeout):
-                module = importlib.import_module(f"db_enum.db.{db_type}")
-                if check_connection_with_timeout(
-                    module, host, port, user, password, database, logger, timeout
-                ):
-                    result = module.enumerate(
-                        host, port, user, password, database, logger
-                    )
-                    click.echo(
-                        json.dumps(result, indent=2, default=custom_json_serializer)
-                    )
-                else:
-                    logger.error(f"Failed to connect to {db_type} database.")
-                    exit(1)
-        except TimeoutError:
-            logger.error(
-                f"Global timeout of {global_timeout} seconds reached. Operation aborted."
+        deadline = ctx.obj["deadline"]
+
+        def run():
+            module = load(db_type)
+            session = connect_with_timeout(
+                module, host, port, user, password, database, logger, timeout, deadline
             )
-            exit(1)
+            if session is not None:
+                write_result(
+                    module,
+                    session,
+                    logger,
+                    ctx.obj["output"],
+                    ctx.obj["options"],
+                    ctx.obj["diff_threshold"],
+                )
+            else:
+                logger.error(f"Failed to connect to {db_type} database.")
+                exit(1)
+
+        run_with_global_timeout(ctx, run)
 
 
 if __name__ == "__main__":
@@ -1,82 +1,121 @@
 from cassandra.cluster import Cluster
 from cassandra.auth import PlainTextAuthProvider
-from typing import Dict, Any
-from ..db_interface import DBInterface
+from cassandra.query import SimpleStatement
+from typing import Dict, Any, Iterator, Tuple
+from ..db_interface import DBInterface, Session
 from ..logger import VerboseLogger
+from ..registry import adapter_info
+
+SIZE_ESTIMATES_QUERY = (
+    "SELECT keyspace_name, table_name, mean_partition_size, partitions_count "
+    "FROM system.size_estimates"
+)
+
+
+def _size_estimates(
+    session: Session, logger: VerboseLogger, fetch_size: int
+) -> Dict[Tuple, Dict]:
+    """Sum system.size_estimates over every live node.
+
+    The table is node-local and only covers the node's own primary token
+    ranges, so each host is asked directly and the results add up to the
+    cluster-wide estimate. All hosts are queried at once, later pages are
+    fetched while iterating.
+    """
+    cql = session.handle
+    hosts = [host for host in cql.cluster.metadata.all_hosts() if host.is_up]
+    statement = SimpleStatement(SIZE_ESTIMATES_QUERY, fetch_size=fetch_size)
+    futures = [(host, cql.execute_async(statement, host=host)) for host in hosts]
+    session.tracer.round_trip(len(futures))
+
+    estimates: Dict[Tuple, Dict] = {}
+    for host, future in futures:
+        try:
+            for row in future.result():
+                estimate = estimates.setdefault(
+                    (row.keyspace_name, row.table_name),
+                    {"estimated_partitions": 0, "estimated_size_bytes": 0},
+                )
+                estimate["estimated_partitions"] += row.partitions_count
+                estimate["estimated_size_bytes"] += (
+                    row.mean_partition_size * row.partitions_count
+                )
+        except Exception as e:
+            logger.info(f"Could not read size estimates from {host}: {str(e)}")
+    return estimates
 
 
 class CassandraEnum(DBInterface):
     @staticmethod
     def get_info() -> Dict[str, Any]:
-        return {
-            "name": "Cassandra",
-            "kind": "wide-column",
-        }
+        return adapter_info("cassandra", ["keyspaces", "tables"])
 
     @staticmethod
-    def check_connection(
-        host: str,
-        port: int,
-        user: str,
-        password: str,
-        database: str,
-        logger: VerboseLogger,
-    ) -> bool:
+    def open_session(session: Session, logger: VerboseLogger) -> None:
+        auth_provider = PlainTextAuthProvider(
+            username=session.user, password=session.password
+        )
+        connect_timeout = session.deadline.connect_timeout(5)
+        cluster = Cluster(
+            [session.host],
+            port=session.port,
+            auth_provider=auth_provider,
+            connect_timeout=connect_timeout,
+            control_connection_timeout=connect_timeout,
+        )
         try:
-            auth_provider = PlainTextAuthProvider(username=user, password=password)
-            cluster = Cluster([host], port=port, auth_provider=auth_provider)
-            session = cluster.connect()
-            session.shutdown()
+            session.handle = cluster.connect()
+            # Applies to every request, including the per-host size estimates
+            session.handle.default_timeout = session.deadline.timeout(10)
+        except Exception:
             cluster.shutdown()
-            logger.info(f"Successfully connected to Cassandra at {host}:{port}")
-            return True
-        except Exception as e:
-            logger.info(f"Failed to connect to Cassandra: {str(e)}")
-            return False
+            raise
 
     @staticmethod
-    def enumerate(
-        host: str,
-        port: int,
-        user: str,
-        password: str,
-        database: str,
-        logger: VerboseLogger,
-    ) -> Dict[str, Any]:
-        auth_provider = PlainTextAuthProvider(username=user, password=password)
-        cluster = Cluster([host], port=port, auth_provider=auth_provider)
-        session = cluster.connect()
-
-        result = {
-            "type": "Cassandra",
-            "kind": "wide-column",
-            "version": None,
-            "keyspaces": [],
-            "tables": [],
-        }
+    def close_session(session: Session) -> None:
+        session.handle.shutdown()
+        session.handle.cluster.shutdown()
+
+    @staticmethod
+    def stream_session(
+        session: Session, logger: VerboseLogger
+    ) -> Iterator[Tuple[str, Any]]:
+        cql = session.handle
 
         logger.info("Retrieving Cassandra version...")
-        row = session.execute("SELECT release_version FROM system.local").one()
-        result["version"] = row.release_version if row else "Unknown"
+        session.tracer.phase("version")
+        session.tracer.round_trip()
+        row = cql.execute("SELECT release_version FROM system.local").one()
+        yield "version", row.release_version if row else "Unknown"
+
+        logger.info("Retrieving size estimates...")
+        session.tracer.phase("size_estimates")
+        estimates = _size_estimates(
+            session, logger, session.options.get("fetch_size", 5000)
+        )
 
+        # The driver already fetched the whole schema when it connected
         logger.info("Retrieving keyspace and table information...")
-        keyspaces = session.execute("SELECT keyspace_name FROM system_schema.keyspaces")
-        for keyspace in keyspaces:
-            result["keyspaces"].append(keyspace.keyspace_name)
-            tables = session.execute(
-                f"SELECT table_name FROM system_schema.tables WHERE keyspace_name = '{keyspace.keyspace_name}'"
-            )
-            for table in tables:
-                result["tables"].append(
-                    {"keyspace": keyspace.keyspace_name, "name": table.table_name}
-                )
+        session.tracer.phase("tables")
+        keyspaces = cql.cluster.metadata.keyspaces
+        for keyspace_name in sorted(keyspaces):
+            yield "keyspaces", keyspace_name
+            for table_name in sorted(keyspaces[keyspace_name].tables):
+                estimate = estimates.get((keyspace_name, table_name), {})
+                yield "tables", {
+                    "keyspace": keyspace_name,
+                    "name": table_name,
+                    "estimated_partitions": estimate.get("estimated_partitions"),
+                    "estimated_size_bytes": estimate.get("estimated_size_bytes"),
+                }
 
-        session.shutdown()
-        cluster.shutdown()
         logger.info("Cassandra enumeration completed successfully")
-        return result
 
 
 check_connection = CassandraEnum.check_connection
-enumerate = CassandraEnum.enumerate
+enumerate_database = CassandraEnum.enumerate
 get_info = CassandraEnum.get_info
+connect = CassandraEnum.connect
+enumerate_session = CassandraEnum.enumerate_session
+stream_session = CassandraEnum.stream_session
+close = CassandraEnum.close
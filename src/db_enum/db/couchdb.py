@@ -1,75 +1,259 @@
 import couchdb
-from typing import Dict, Any
-from ..db_interface import DBInterface
+import json
+from couchdb.http import ResourceNotFound, ServerError
+from urllib.parse import quote
+
+try:
+    import aiohttp
+except ImportError:  # optional, only used by the asyncio engine
+    aiohttp = None
+
+from typing import Dict, Any, AsyncIterator, Callable, Iterator, List, Optional, Tuple
+from ..aio import AsyncDBInterface
+from ..db_interface import DBInterface, Session
+from ..filters import Filter
 from ..logger import VerboseLogger
+from ..registry import adapter_info
+
+# Servers reject _dbs_info requests with more keys than this by default
+# (max_db_number_for_dbs_info_req)
+DBS_INFO_BATCH = 100
+
+# Errors couchdb-python does not raise as ServerError, which the async client
+# does not take as "_dbs_info unsupported" either
+CLIENT_ERRORS = (401, 403, 409, 412)
+
+
+def _database_record(db_name: str, db_info: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "name": db_name,
+        "doc_count": db_info.get("doc_count"),
+        "disk_size": db_info.get("disk_size", db_info.get("sizes", {}).get("file")),
+        "update_seq": db_info.get("update_seq"),
+    }
+
+
+def _dbs_info(server: couchdb.Server, names: List[str]) -> Optional[List[Dict]]:
+    """Fetch info for a batch of databases in one request, None if unsupported."""
+    try:
+        _, _, rows = server.resource.post_json("_dbs_info", {"keys": names})
+    except (ResourceNotFound, ServerError):
+        # Before CouchDB 2.2 this is treated as a (bad) database name
+        return None
+    return rows
+
+
+def _retime(pool: couchdb.http.ConnectionPool, timeout: Optional[float]) -> None:
+    """Apply `timeout` to the pooled connections and those opened later."""
+    with pool.lock:
+        pool.timeout = timeout
+        for conns in pool.conns.values():
+            for conn in conns:
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+
+
+def _chunks(
+    names: List[str], wanted: Callable[[str], bool], size: int
+) -> Iterator[List[str]]:
+    """Consecutive runs of names, each with at most `size` wanted ones."""
+    chunk: List[str] = []
+    count = 0
+    for name in names:
+        if wanted(name):
+            if count == size:
+                yield chunk
+                chunk, count = [], 0
+            count += 1
+        chunk.append(name)
+    if chunk:
+        yield chunk
 
 
 class CouchDBEnum(DBInterface):
     @staticmethod
     def get_info() -> Dict[str, Any]:
-        return {
-            "name": "CouchDB",
-            "kind": "document",
-        }
+        return adapter_info("couchdb", ["databases", "database_info"])
+
+    @staticmethod
+    def open_session(session: Session, logger: VerboseLogger) -> None:
+        connect = session.deadline.connect_timeout()
+        session.handle = couchdb.Server(
+            f"http://{session.user}:{session.password}@{session.host}:{session.port}/",
+            session=couchdb.http.Session(timeout=connect),
+        )
+        # Any HTTP server with a "version" in its root JSON passes version(),
+        # Elasticsearch included; only CouchDB's welcome has a "couchdb" field
+        _, _, welcome = session.handle.resource.get_json()
+        if not isinstance(welcome, dict) or "couchdb" not in welcome:
+            raise ConnectionError(
+                f"{session.host}:{session.port} is an HTTP server, but not CouchDB"
+            )
+        # Enumeration reuses the verified connection, with the time left
+        remaining = session.deadline.timeout()
+        if remaining != connect:
+            _retime(session.handle.resource.session.connection_pool, remaining)
+
+    @staticmethod
+    def close_session(session: Session) -> None:
+        # couchdb-python has no close(), its pooled connections are closed when
+        # the Server is garbage collected
+        pass
+
+    @staticmethod
+    def stream_session(
+        session: Session, logger: VerboseLogger
+    ) -> Iterator[Tuple[str, Any]]:
+        server = session.handle
+
+        logger.info("Retrieving CouchDB version...")
+        session.tracer.phase("version")
+        session.tracer.round_trip()
+        yield "version", server.version()
+
+        logger.info("Retrieving database list and information...")
+        session.tracer.phase("databases")
+        page_size = session.options.get("page_size", 1000)
+        db_filter = Filter.from_options(session.options)
+        bulk_info = True
+        params: Dict[str, Any] = {}
+        while True:
+            _, _, names = server.resource.get_json(
+                "_all_dbs", limit=page_size, **params
+            )
+            session.tracer.round_trip()
+            # Info is only fetched for the databases the patterns let through,
+            # names are yielded in server order either way
+            for chunk in _chunks(names, db_filter.allows, DBS_INFO_BATCH):
+                wanted = [name for name in chunk if db_filter.allows(name)]
+                rows = None
+                if not wanted:
+                    rows = []
+                elif bulk_info:
+                    session.tracer.round_trip()
+                    rows = _dbs_info(server, wanted)
+                if rows is None:
+                    bulk_info = False
+                    # Plain GET /{db}, server[name] would add a HEAD per database
+                    session.tracer.round_trip(len(wanted))
+                    rows = [
+                        {"key": name, "info": server.resource(name).get_json()[2]}
+                        for name in wanted
+                    ]
+                infos = {row["key"]: row["info"] for row in rows if "info" in row}
+                for name in chunk:
+                    yield "databases", name
+                    if name in infos:
+                        yield "database_info", _database_record(name, infos[name])
+            if len(names) < page_size:
+                break
+            params = {"startkey": json.dumps(names[-1]), "skip": 1}
+
+        logger.info("CouchDB enumeration completed successfully")
+
+
+async def _get_json(http, path: str, **kwargs) -> Any:
+    async with http.get(path, **kwargs) as response:
+        response.raise_for_status()
+        return await response.json(content_type=None)
+
+
+async def _dbs_info_async(http, names: List[str]) -> Optional[List[Dict]]:
+    async with http.post("/_dbs_info", json={"keys": names}) as response:
+        if response.status >= 400 and response.status not in CLIENT_ERRORS:
+            return None
+        response.raise_for_status()
+        return await response.json(content_type=None)
+
+
+class CouchDBAsyncEnum(AsyncDBInterface):
+    get_info = staticmethod(CouchDBEnum.get_info)
+
+    @staticmethod
+    async def open_session(session: Session, logger: VerboseLogger) -> None:
+        session.handle = aiohttp.ClientSession(
+            base_url=f"http://{session.host}:{session.port}",
+            auth=(
+                aiohttp.BasicAuth(session.user, session.password or "")
+                if session.user
+                else None
+            ),
+            # Enumeration requests get the time left, over the connection the
+            # welcome was fetched on
+            timeout=aiohttp.ClientTimeout(total=session.deadline.timeout()),
+        )
+        welcome = await _get_json(
+            session.handle,
+            "/",
+            timeout=aiohttp.ClientTimeout(total=session.deadline.connect_timeout()),
+        )
+        if not isinstance(welcome, dict) or "couchdb" not in welcome:
+            raise ConnectionError(
+                f"{session.host}:{session.port} is an HTTP server, but not CouchDB"
+            )
 
     @staticmethod
-    def check_connection(
-        host: str,
-        port: int,
-        user: str,
-        password: str,
-        database: str,
-        logger: VerboseLogger,
-    ) -> bool:
-        try:
-            server = couchdb.Server(f"http://{user}:{password}@{host}:{port}/")
-            server.version()
-            logger.info(f"Successfully connected to CouchDB at {host}:{port}")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to connect to CouchDB: {str(e)}")
-            return False
+    async def close_session(session: Session) -> None:
+        await session.handle.close()
 
     @staticmethod
-    def enumerate(
-        host: str,
-        port: int,
-        user: str,
-        password: str,
-        database: str,
-        logger: VerboseLogger,
-    ) -> Dict[str, Any]:
-        server = couchdb.Server(f"http://{user}:{password}@{host}:{port}/")
-
-        result = {
-            "type": "CouchDB",
-            "kind": "document",
-            "version": None,
-            "databases": [],
-            "database_info": [],
-        }
+    async def stream_session(
+        session: Session, logger: VerboseLogger
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        http = session.handle
 
         logger.info("Retrieving CouchDB version...")
-        result["version"] = server.version()
+        session.tracer.phase("version")
+        session.tracer.round_trip()
+        yield "version", (await _get_json(http, "/")).get("version")
 
         logger.info("Retrieving database list and information...")
-        for db_name in server:
-            result["databases"].append(db_name)
-            db = server[db_name]
-            db_info = db.info()
-            result["database_info"].append(
-                {
-                    "name": db_name,
-                    "doc_count": db_info.get("doc_count"),
-                    "disk_size": db_info.get("disk_size"),
-                    "update_seq": db_info.get("update_seq"),
-                }
+        session.tracer.phase("databases")
+        page_size = session.options.get("page_size", 1000)
+        db_filter = Filter.from_options(session.options)
+        bulk_info = True
+        params: Dict[str, Any] = {}
+        while True:
+            names = await _get_json(
+                http, "/_all_dbs", params={"limit": page_size, **params}
             )
+            session.tracer.round_trip()
+            for chunk in _chunks(names, db_filter.allows, DBS_INFO_BATCH):
+                wanted = [name for name in chunk if db_filter.allows(name)]
+                rows = None
+                if not wanted:
+                    rows = []
+                elif bulk_info:
+                    session.tracer.round_trip()
+                    rows = await _dbs_info_async(http, wanted)
+                if rows is None:
+                    bulk_info = False
+                    session.tracer.round_trip(len(wanted))
+                    rows = [
+                        {
+                            "key": name,
+                            "info": await _get_json(http, "/" + quote(name, safe="")),
+                        }
+                        for name in wanted
+                    ]
+                infos = {row["key"]: row["info"] for row in rows if "info" in row}
+                for name in chunk:
+                    yield "databases", name
+                    if name in infos:
+                        yield "database_info", _database_record(name, infos[name])
+            if len(names) < page_size:
+                break
+            params = {"startkey": json.dumps(names[-1]), "skip": 1}
 
         logger.info("CouchDB enumeration completed successfully")
-        return result
 
 
 check_connection = CouchDBEnum.check_connection
-enumerate = CouchDBEnum.enumerate
+enumerate_database = CouchDBEnum.enumerate
 get_info = CouchDBEnum.get_info
+connect = CouchDBEnum.connect
+enumerate_session = CouchDBEnum.enumerate_session
+stream_session = CouchDBEnum.stream_session
+close = CouchDBEnum.close
+async_adapter = CouchDBAsyncEnum if aiohttp is not None else None
@@ -1,77 +1,237 @@
-from elasticsearch import Elasticsearch
-from typing import Dict, Any
-from ..db_interface import DBInterface
+import elasticsearch
+
+from elasticsearch import AsyncElasticsearch, Elasticsearch
+
+try:
+    import aiohttp
+except ImportError:  # AsyncElasticsearch's default transport, optional
+    aiohttp = None
+
+from typing import Dict, Any, AsyncIterator, Iterator, List, Tuple, Union
+from ..aio import AsyncDBInterface
+from ..db_interface import DBInterface, Session
+from ..filters import Filter
 from ..logger import VerboseLogger
+from ..registry import adapter_info
+
+CAT_INDICES_COLUMNS = [
+    "index",
+    "health",
+    "status",
+    "pri",
+    "rep",
+    "docs.count",
+    "store.size",
+    "pri.store.size",
+]
+
+
+def _int(value: Any) -> Any:
+    # _cat returns numbers as strings, and null for closed indices
+    return int(value) if value not in (None, "") else None
+
+
+def _cat_target(pattern: str, index_filter: Filter) -> Tuple[str, bool]:
+    """index_pattern with --include/--exclude folded in, and whether all of them were.
+
+    _cat only knows `*` wildcards and `-` exclusions, and cannot intersect
+    index_pattern with a second list of patterns; whatever is left over is
+    filtered client-side.
+    """
+    if not index_filter.globs_only:
+        return pattern, False
+    targets, complete = [pattern], True
+    if index_filter.include:
+        if pattern == "*":
+            targets = index_filter.include
+        else:
+            complete = False
+    targets += [f"-{p}" for p in index_filter.exclude]
+    return ",".join(targets), complete
+
+
+def _chunks(
+    names: List[str], index_filter: Filter, complete: bool, chunk_size: int
+) -> List[List[str]]:
+    """Listed index names, split into the chunks to fetch stats for."""
+    if index_filter.top is not None and complete:
+        # Listed largest first, only the N largest can make the cut, skip
+        # the others' stats
+        names = names[: index_filter.top]
+    else:
+        names = sorted(names)
+    return [names[i : i + chunk_size] for i in range(0, len(names), chunk_size)]
+
+
+def _index_record(index: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "name": index["index"],
+        "health": index["health"],
+        "status": index["status"],
+        "doc_count": _int(index["docs.count"]),
+        "size_bytes": _int(index["store.size"]),
+        "primary_size_bytes": _int(index["pri.store.size"]),
+        "primary_shards": _int(index["pri"]),
+        "replica_shards": _int(index["rep"]),
+    }
+
+
+def _check_info(session: Session, info: Any) -> None:
+    # ping() is true for any HTTP answer with some client versions; only
+    # Elasticsearch (and OpenSearch) answer / with a cluster_name
+    if "cluster_name" not in info:
+        raise ConnectionError(
+            f"{session.host}:{session.port} is an HTTP server, but not Elasticsearch"
+        )
+
+
+def _client_args(session: Session) -> Dict[str, Any]:
+    return {
+        "hosts": [f"http://{session.host}:{session.port}"],
+        "http_auth": (session.user, session.password),
+        "request_timeout": session.deadline.connect_timeout(10),
+    }
 
 
 class ElasticsearchEnum(DBInterface):
     @staticmethod
     def get_info() -> Dict[str, Any]:
-        return {
-            "name": "Elasticsearch",
-            "kind": "document",
-        }
+        return adapter_info("elasticsearch", ["indices"])
 
     @staticmethod
-    def check_connection(
-        host: str,
-        port: int,
-        user: str,
-        password: str,
-        database: str,
-        logger: VerboseLogger,
-    ) -> bool:
+    def open_session(session: Session, logger: VerboseLogger) -> None:
+        session.handle = Elasticsearch(**_client_args(session))
         try:
-            es = Elasticsearch([f"http://{host}:{port}"], http_auth=(user, password))
-            if es.ping():
-                logger.info(f"Successfully connected to Elasticsearch at {host}:{port}")
-                return True
-            return False
-        except Exception as e:
-            logger.error(f"Failed to connect to Elasticsearch: {str(e)}")
-            return False
+            info = session.handle.info()
+        except elasticsearch.ApiError as e:
+            raise ConnectionError(
+                f"{session.host}:{session.port} is not Elasticsearch: {e}"
+            )
+        _check_info(session, info)
+        # Same connections, enumeration requests get the time left
+        session.handle = session.handle.options(
+            request_timeout=session.deadline.timeout(10)
+        )
 
     @staticmethod
-    def enumerate(
-        host: str,
-        port: int,
-        user: str,
-        password: str,
-        database: str,
-        logger: VerboseLogger,
-    ) -> Dict[str, Any]:
-        es = Elasticsearch([f"http://{host}:{port}"], http_auth=(user, password))
-
-        result = {
-            "type": "Elasticsearch",
-            "kind": "document",
-            "version": None,
-            "indices": [],
-        }
+    def close_session(session: Session) -> None:
+        session.handle.close()
+
+    @staticmethod
+    def stream_session(
+        session: Session, logger: VerboseLogger
+    ) -> Iterator[Tuple[str, Any]]:
+        es = session.handle
 
         logger.info("Retrieving Elasticsearch version...")
+        session.tracer.phase("version")
         info = es.info()
-        result["version"] = info.get("version", {}).get("number")
+        session.tracer.round_trip()
+        yield "version", info.get("version", {}).get("number")
+
+        logger.info("Retrieving indices information...")
+        session.tracer.phase("indices")
+        index_filter = Filter.from_options(session.options)
+        pattern, complete = _cat_target(
+            session.options.get("index_pattern", "*"), index_filter
+        )
+        # Largest first, so with --top the server already returns them in order
+        order = "store.size:desc" if index_filter.top is not None else None
+        chunk_size = session.options.get("chunk_size")
+        if chunk_size:
+            # Listing names only is cheap, stats are then fetched a chunk at a time
+            names = [
+                row["index"]
+                for row in es.cat.indices(
+                    index=pattern, h="index", s=order, format="json"
+                )
+            ]
+            session.tracer.round_trip()
+            chunks: List[Union[str, List[str]]] = _chunks(
+                names, index_filter, complete, chunk_size
+            )
+        else:
+            chunks = [pattern]
+
+        for chunk in chunks:
+            indices = es.cat.indices(
+                index=chunk, format="json", bytes="b", h=CAT_INDICES_COLUMNS, s=order
+            )
+            session.tracer.round_trip()
+            for index in indices:
+                yield "indices", _index_record(index)
+
+        logger.info("Elasticsearch enumeration completed successfully")
+
+
+class ElasticsearchAsyncEnum(AsyncDBInterface):
+    get_info = staticmethod(ElasticsearchEnum.get_info)
+
+    @staticmethod
+    async def open_session(session: Session, logger: VerboseLogger) -> None:
+        session.handle = AsyncElasticsearch(**_client_args(session))
+        try:
+            info = await session.handle.info()
+        except elasticsearch.ApiError as e:
+            raise ConnectionError(
+                f"{session.host}:{session.port} is not Elasticsearch: {e}"
+            )
+        _check_info(session, info)
+        session.handle = session.handle.options(
+            request_timeout=session.deadline.timeout(10)
+        )
+
+    @staticmethod
+    async def close_session(session: Session) -> None:
+        await session.handle.close()
+
+    @staticmethod
+    async def stream_session(
+        session: Session, logger: VerboseLogger
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        es = session.handle
+
+        logger.info("Retrieving Elasticsearch version...")
+        session.tracer.phase("version")
+        info = await es.info()
+        session.tracer.round_trip()
+        yield "version", info.get("version", {}).get("number")
 
         logger.info("Retrieving indices information...")
-        indices = es.cat.indices(format="json")
-        for index in indices:
-            index_stats = es.indices.stats(index=index["index"])
-            result["indices"].append(
-                {
-                    "name": index["index"],
-                    "doc_count": index["docs.count"],
-                    "size_bytes": index["store.size"],
-                    "primary_shards": index_stats["_all"]["primaries"]["docs"]["count"],
-                    "replica_shards": index_stats["_all"]["total"]["docs"]["count"]
-                    - index_stats["_all"]["primaries"]["docs"]["count"],
-                }
+        session.tracer.phase("indices")
+        index_filter = Filter.from_options(session.options)
+        pattern, complete = _cat_target(
+            session.options.get("index_pattern", "*"), index_filter
+        )
+        order = "store.size:desc" if index_filter.top is not None else None
+        chunk_size = session.options.get("chunk_size")
+        if chunk_size:
+            rows = await es.cat.indices(
+                index=pattern, h="index", s=order, format="json"
+            )
+            session.tracer.round_trip()
+            chunks: List[Union[str, List[str]]] = _chunks(
+                [row["index"] for row in rows], index_filter, complete, chunk_size
+            )
+        else:
+            chunks = [pattern]
+
+        for chunk in chunks:
+            indices = await es.cat.indices(
+                index=chunk, format="json", bytes="b", h=CAT_INDICES_COLUMNS, s=order
             )
+            session.tracer.round_trip()
+            for index in indices:
+                yield "indices", _index_record(index)
 
         logger.info("Elasticsearch enumeration completed successfully")
-        return result
 
 
 check_connection = ElasticsearchEnum.check_connection
-enumerate = ElasticsearchEnum.enumerate
+enumerate_database = ElasticsearchEnum.enumerate
 get_info = ElasticsearchEnum.get_info
+connect = ElasticsearchEnum.connect
+enumerate_session = ElasticsearchEnum.enumerate_session
+stream_session = ElasticsearchEnum.stream_session
+close = ElasticsearchEnum.close
+async_adapter = ElasticsearchAsyncEnum if aiohttp is not None else None
@@ -1,88 +1,302 @@
+import requests
+
+try:
+    import aiohttp
+except ImportError:  # optional, only used by the asyncio engine
+    aiohttp = None
+
 from influxdb import InfluxDBClient
-from typing import Dict, Any
-from ..db_interface import DBInterface
+from influxdb.exceptions import InfluxDBClientError
+from influxdb.resultset import ResultSet
+from typing import Dict, Any, AsyncIterator, Iterator, List, Optional, Tuple
+from ..aio import AsyncDBInterface, map_window_async
+from ..db_interface import DBInterface, Session, map_window
+from ..filters import Filter
 from ..logger import VerboseLogger
+from ..registry import adapter_info
+
+# Estimates (HyperLogLog sketches), unlike the EXACT variants they do not
+# scan the index
+CARDINALITY_STATEMENTS = [
+    "SHOW SERIES CARDINALITY ON {}",
+    "SHOW MEASUREMENT CARDINALITY ON {}",
+]
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _count(result: Optional[ResultSet]) -> Any:
+    if result is None or result.error is not None:
+        return None
+    for point in result.get_points():
+        return next(iter(point.values()))
+    return 0
+
+
+def _statements(names: List[str]) -> Tuple[List[str], List[str]]:
+    """The SHOW MEASUREMENTS statements for a batch, and those followed by the
+    cardinality statements."""
+    listing_statements = [f"SHOW MEASUREMENTS ON {_quote(name)}" for name in names]
+    return listing_statements, listing_statements + [
+        statement.format(_quote(name))
+        for name in names
+        for statement in CARDINALITY_STATEMENTS
+    ]
+
+
+def _inventory_records(
+    names: List[str], results: List[Optional[ResultSet]], logger: VerboseLogger
+) -> List[Tuple[str, Any]]:
+    # Statements after the first failing one get no result at all
+    results = results + [None] * (
+        len(names) * (1 + len(CARDINALITY_STATEMENTS)) - len(results)
+    )
+    listings = results[: len(names)]
+    series = results[len(names) :: 2]
+    measurements = results[len(names) + 1 :: 2]
+    records: List[Tuple[str, Any]] = []
+    for name, listing, series_count, measurement_count in zip(
+        names, listings, series, measurements
+    ):
+        records.append(
+            (
+                "database_stats",
+                {
+                    "name": name,
+                    "series_cardinality": _count(series_count),
+                    "measurement_cardinality": _count(measurement_count),
+                },
+            )
+        )
+        if listing is None:
+            continue
+        if listing.error is not None:
+            logger.info(f"Could not list measurements on {name}: {listing.error}")
+            continue
+        for measurement in listing.get_points():
+            records.append(
+                ("measurements", {"database": name, "name": measurement["name"]})
+            )
+    return records
+
+
+class _TimeoutSession(requests.Session):
+    """HTTP session whose timeout can change after the client is built.
+
+    InfluxDBClient sends its constructor timeout with every request, this
+    session replaces it with its own `timeout` attribute instead.
+    """
+
+    def __init__(self, timeout: Optional[float]):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs["timeout"] = self.timeout
+        return super().request(method, url, **kwargs)
 
 
 class InfluxDBEnum(DBInterface):
     @staticmethod
     def get_info() -> Dict[str, Any]:
-        return {
-            "name": "InfluxDB",
-            "kind": "time-series",
-        }
+        return adapter_info("influxdb", ["databases", "database_stats", "measurements"])
 
     @staticmethod
-    def check_connection(
-        host: str,
-        port: int,
-        user: str,
-        password: str,
-        database: str,
-        logger: VerboseLogger,
-    ) -> bool:
-        try:
-            client = InfluxDBClient(
-                host=host,
-                port=port,
-                username=user,
-                password=password,
-                database=database,
-            )
-            client.ping()
-            logger.info(f"Successfully connected to InfluxDB at {host}:{port}")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to connect to InfluxDB: {str(e)}")
-            return False
+    def open_session(session: Session, logger: VerboseLogger) -> None:
+        http = _TimeoutSession(session.deadline.connect_timeout())
+        session.handle = InfluxDBClient(
+            host=session.host,
+            port=session.port,
+            username=session.user,
+            password=session.password,
+            database=session.database,
+            session=http,
+            # Requests that time out are retried 3 times by default, each
+            # with the full timeout again (0 would retry forever)
+            retries=1,
+        )
+        session.handle.ping()
+        # Enumeration requests get the time left
+        http.timeout = session.deadline.timeout()
 
     @staticmethod
-    def enumerate(
-        host: str,
-        port: int,
-        user: str,
-        password: str,
-        database: str,
-        logger: VerboseLogger,
-    ) -> Dict[str, Any]:
-        client = InfluxDBClient(
-            host=host,
-            port=port,
-            username=user,
-            password=password,
-            database=database,
-        )
+    def close_session(session: Session) -> None:
+        session.handle.close()
 
-        result = {
-            "type": "InfluxDB",
-            "kind": "time-series",
-            "version": None,
-            "databases": [],
-            "measurements": [],
-        }
+    @staticmethod
+    def stream_session(
+        session: Session, logger: VerboseLogger
+    ) -> Iterator[Tuple[str, Any]]:
+        client = session.handle
 
         logger.info("Retrieving InfluxDB version...")
+        session.tracer.phase("version")
+        session.tracer.round_trip()
         version = client.request("ping", expected_response_code=204).headers.get(
             "X-Influxdb-Version"
         )
-        result["version"] = version
+        yield "version", version
 
         logger.info("Retrieving database list...")
-        result["databases"] = client.get_list_database()
-
-        logger.info("Retrieving measurements for each database...")
-        for db in result["databases"]:
-            client.switch_database(db["name"])
-            measurements = client.get_list_measurements()
-            for measurement in measurements:
-                result["measurements"].append(
-                    {"database": db["name"], "name": measurement["name"]}
+        session.tracer.phase("databases")
+        session.tracer.round_trip()
+        databases = client.get_list_database()
+        for db in databases:
+            yield "databases", db
+
+        logger.info("Retrieving measurements and cardinality for each database...")
+        session.tracer.phase("measurements")
+        db_filter = Filter.from_options(session.options)
+        names = [db["name"] for db in databases if db_filter.allows(db["name"])]
+        batch_size = session.options.get("batch_size", 10)
+        batches = [names[i : i + batch_size] for i in range(0, len(names), batch_size)]
+        inventories = map_window(
+            lambda batch: InfluxDBEnum._inventory(session, batch, logger),
+            batches,
+            session.options.get("concurrency", 4),
+        )
+        for records in inventories:
+            yield from records
+
+        logger.info("InfluxDB enumeration completed successfully")
+
+    @staticmethod
+    def _inventory(
+        session: Session, names: List[str], logger: VerboseLogger
+    ) -> List[Tuple[str, Any]]:
+        """One multi-statement query for a batch of databases.
+
+        Servers before 1.4 reject the cardinality statements, and with them
+        the whole query; the batch is then sent again with only the SHOW
+        MEASUREMENTS statements and the cardinalities are reported as null.
+        """
+        listing_statements, statements = _statements(names)
+        with session.tracer.span("database_batch", databases=len(names)):
+            session.tracer.round_trip()
+            try:
+                results = session.handle.query(
+                    "; ".join(statements), raise_errors=False
                 )
+            except InfluxDBClientError as e:
+                logger.info(f"Cardinality statements failed, listing only: {e}")
+                session.tracer.round_trip()
+                results = session.handle.query(
+                    "; ".join(listing_statements), raise_errors=False
+                )
+        # A single statement comes back as a bare ResultSet
+        if not isinstance(results, list):
+            results = [results]
+        return _inventory_records(names, results, logger)
+
+
+async def _ping(http, **kwargs) -> Optional[str]:
+    async with http.get("/ping", **kwargs) as response:
+        if response.status != 204:
+            raise ConnectionError(f"InfluxDB ping returned HTTP {response.status}")
+        return response.headers.get("X-Influxdb-Version")
+
+
+async def _query_async(
+    http, statements: List[str], raise_errors: bool = True
+) -> List[ResultSet]:
+    async with http.get("/query", params={"q": "; ".join(statements)}) as response:
+        response.raise_for_status()
+        data = await response.json(content_type=None)
+    return [
+        ResultSet(result, raise_errors=raise_errors)
+        for result in data.get("results", [])
+    ]
+
+
+class InfluxDBAsyncEnum(AsyncDBInterface):
+    get_info = staticmethod(InfluxDBEnum.get_info)
+
+    @staticmethod
+    async def open_session(session: Session, logger: VerboseLogger) -> None:
+        session.handle = aiohttp.ClientSession(
+            base_url=f"http://{session.host}:{session.port}",
+            auth=(
+                aiohttp.BasicAuth(session.user, session.password or "")
+                if session.user
+                else None
+            ),
+            # Enumeration requests get the time left
+            timeout=aiohttp.ClientTimeout(total=session.deadline.timeout()),
+        )
+        await _ping(
+            session.handle,
+            timeout=aiohttp.ClientTimeout(total=session.deadline.connect_timeout()),
+        )
+
+    @staticmethod
+    async def close_session(session: Session) -> None:
+        await session.handle.close()
+
+    @staticmethod
+    async def stream_session(
+        session: Session, logger: VerboseLogger
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        http = session.handle
+
+        logger.info("Retrieving InfluxDB version...")
+        session.tracer.phase("version")
+        session.tracer.round_trip()
+        yield "version", await _ping(http)
+
+        logger.info("Retrieving database list...")
+        session.tracer.phase("databases")
+        session.tracer.round_trip()
+        (listing,) = await _query_async(http, ["SHOW DATABASES"])
+        databases = list(listing.get_points())
+        for db in databases:
+            yield "databases", db
+
+        logger.info("Retrieving measurements and cardinality for each database...")
+        session.tracer.phase("measurements")
+        db_filter = Filter.from_options(session.options)
+        names = [db["name"] for db in databases if db_filter.allows(db["name"])]
+        batch_size = session.options.get("batch_size", 10)
+        batches = [names[i : i + batch_size] for i in range(0, len(names), batch_size)]
+        inventories = map_window_async(
+            lambda batch: InfluxDBAsyncEnum._inventory(session, batch, logger),
+            batches,
+            session.options.get("concurrency", 4),
+        )
+        async for records in inventories:
+            for record in records:
+                yield record
 
         logger.info("InfluxDB enumeration completed successfully")
-        return result
+
+    @staticmethod
+    async def _inventory(
+        session: Session, names: List[str], logger: VerboseLogger
+    ) -> List[Tuple[str, Any]]:
+        listing_statements, statements = _statements(names)
+        with session.tracer.span("database_batch", databases=len(names)):
+            session.tracer.round_trip()
+            try:
+                results = await _query_async(
+                    session.handle, statements, raise_errors=False
+                )
+            except aiohttp.ClientResponseError as e:
+                if not 400 <= e.status < 500:
+                    raise
+                logger.info(f"Cardinality statements failed, listing only: {e}")
+                session.tracer.round_trip()
+                results = await _query_async(
+                    session.handle, listing_statements, raise_errors=False
+                )
+        return _inventory_records(names, results, logger)
 
 
 check_connection = InfluxDBEnum.check_connection
-enumerate = InfluxDBEnum.enumerate
+enumerate_database = InfluxDBEnum.enumerate
 get_info = InfluxDBEnum.get_info
+connect = InfluxDBEnum.connect
+enumerate_session = InfluxDBEnum.enumerate_session
+stream_session = InfluxDBEnum.stream_session
+close = InfluxDBEnum.close
+async_adapter = InfluxDBAsyncEnum if aiohttp is not None else None
@@ -1,88 +1,267 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, monitoring
+from pymongo.errors import OperationFailure
+
+try:
+    from pymongo import AsyncMongoClient
+except ImportError:  # pymongo < 4.9 has no native async API
+    AsyncMongoClient = None
 
 # from pymongo.errors import ConnectionFailure
-from typing import Dict, Any
-from ..db_interface import DBInterface
+from typing import Dict, Any, AsyncIterator, Iterator, List, Tuple
+from ..aio import AsyncDBInterface, map_window_async
+from ..db_interface import DBInterface, Session, map_window
+from ..filters import Filter
 from ..logger import VerboseLogger
+from ..registry import adapter_info
+
+COLL_STATS_PIPELINE = [{"$collStats": {"storageStats": {}}}]
+
+
+def _database_record(db_name: str, stats: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "name": db_name,
+        "collection_count": stats.get("collections"),
+        "document_count": stats.get("objects"),
+        "size_bytes": stats.get("dataSize"),
+        "storage_bytes": stats.get("storageSize"),
+        "index_count": stats.get("indexes"),
+        "index_size_bytes": stats.get("indexSize"),
+    }
+
+
+def _collection_record(db_name: str, spec: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "database": db_name,
+        "name": spec["name"],
+        "type": spec.get("type", "collection"),
+    }
+
+
+def _add_storage_stats(collection: Dict[str, Any], docs) -> None:
+    # $collStats returns one document per shard on sharded clusters
+    storage = [doc.get("storageStats", {}) for doc in docs]
+    collection["document_count"] = sum(s.get("count", 0) for s in storage)
+    collection["size_bytes"] = sum(s.get("size", 0) for s in storage)
+    collection["index_count"] = max((s.get("nindexes", 0) for s in storage), default=0)
+    collection["index_size_bytes"] = sum(s.get("totalIndexSize", 0) for s in storage)
+
+
+def _timeouts(session: Session) -> Dict[str, Any]:
+    connect = session.deadline.connect_timeout()
+    remaining = session.deadline.timeout()
+    kwargs = {}
+    if connect is not None:
+        kwargs["serverSelectionTimeoutMS"] = max(1, int(connect * 1000))
+        kwargs["connectTimeoutMS"] = max(1, int(connect * 1000))
+    if remaining is not None:
+        kwargs["socketTimeoutMS"] = max(1, int(remaining * 1000))
+    return kwargs
+
+
+class _RoundTrips(monitoring.CommandListener):
+    """Counts every command sent against the caller's open span."""
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    def started(self, event):
+        self.tracer.round_trip()
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def _event_listeners(session: Session) -> List[monitoring.CommandListener]:
+    return [_RoundTrips(session.tracer)] if session.tracer.enabled else []
 
 
 class MongoDBEnum(DBInterface):
     @staticmethod
     def get_info() -> Dict[str, Any]:
-        return {
-            "name": "MongoDB",
-            "kind": "document",
-        }
+        return adapter_info("mongodb", ["databases", "database_stats", "collections"])
 
     @staticmethod
-    def check_connection(
-        host: str,
-        port: int,
-        user: str,
-        password: str,
-        database: str,
-        logger: VerboseLogger,
-    ) -> bool:
-        try:
-            client = MongoClient(
-                f"mongodb://{user}:{password}@{host}:{port}/{database or ''}"
-            )
-            client.admin.command("ismaster")
-            client.close()
-            logger.info(f"Successfully connected to MongoDB at {host}:{port}")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to connect to MongoDB: {str(e)}")
-            return False
+    def open_session(session: Session, logger: VerboseLogger) -> None:
+        session.handle = MongoClient(
+            f"mongodb://{session.user}:{session.password}@{session.host}:{session.port}/{session.database or ''}",
+            event_listeners=_event_listeners(session),
+            **_timeouts(session),
+        )
+        session.handle.admin.command("ismaster")
 
     @staticmethod
-    def enumerate(
-        host: str,
-        port: int,
-        user: str,
-        password: str,
-        database: str,
-        logger: VerboseLogger,
-    ) -> Dict[str, Any]:
-        client = MongoClient(
-            f"mongodb://{user}:{password}@{host}:{port}/{database or ''}"
-        )
+    def close_session(session: Session) -> None:
+        session.handle.close()
 
-        result = {
-            "type": "MongoDB",
-            "kind": "document",
-            "version": None,
-            "databases": [],
-            "collections": [],
-        }
+    @staticmethod
+    def stream_session(
+        session: Session, logger: VerboseLogger
+    ) -> Iterator[Tuple[str, Any]]:
+        client = session.handle
 
         logger.info("Retrieving MongoDB version...")
+        session.tracer.phase("version")
         server_info = client.server_info()
-        result["version"] = server_info.get("version")
+        yield "version", server_info.get("version")
 
         logger.info("Retrieving database list...")
-        result["databases"] = client.list_database_names()
-
-        logger.info("Retrieving collection information...")
-        for db_name in result["databases"]:
-            db = client[db_name]
-            for collection_name in db.list_collection_names():
-                # collection = db[collection_name]
-                stats = db.command("collstats", collection_name)
-                result["collections"].append(
-                    {
-                        "database": db_name,
-                        "name": collection_name,
-                        "document_count": stats.get("count"),
-                        "size_bytes": stats.get("size"),
-                    }
+        session.tracer.phase("databases")
+        databases = client.list_database_names()
+        for db_name in databases:
+            yield "databases", db_name
+
+        logger.info("Retrieving database and collection information...")
+        session.tracer.phase("collections")
+        collection_stats = session.options.get("collection_stats", False)
+        concurrency = session.options.get("concurrency", 4)
+        db_filter = Filter.from_options(session.options)
+        inventories = map_window(
+            lambda db_name: MongoDBEnum._inventory(client[db_name], session.tracer),
+            [db_name for db_name in databases if db_filter.allows(db_name)],
+            concurrency,
+        )
+        for database, collections in inventories:
+            if collection_stats:
+                # The next databases' inventories are fetched meanwhile
+                db = client[database["name"]]
+                for _ in map_window(
+                    lambda collection: MongoDBEnum._collection_stats(
+                        db, collection, session.tracer, logger
+                    ),
+                    [c for c in collections if c["type"] == "collection"],
+                    concurrency,
+                ):
+                    pass
+            yield "database_stats", database
+            for collection in collections:
+                yield "collections", collection
+
+        logger.info("MongoDB enumeration completed successfully")
+
+    @staticmethod
+    def _inventory(db, tracer):
+        """dbStats plus listCollections, two round trips however many collections.
+
+        Per-collection $collStats calls are only made with -o collection_stats=true.
+        """
+        with tracer.span("database", database=db.name):
+            database = _database_record(db.name, db.command("dbStats"))
+            collections = [
+                _collection_record(db.name, spec)
+                for spec in db.list_collections(nameOnly=True)
+            ]
+        return database, collections
+
+    @staticmethod
+    def _collection_stats(
+        db, collection: Dict[str, Any], tracer, logger: VerboseLogger
+    ) -> None:
+        with tracer.span("collection", database=db.name, collection=collection["name"]):
+            try:
+                docs = db[collection["name"]].aggregate(COLL_STATS_PIPELINE)
+                _add_storage_stats(collection, list(docs))
+            except OperationFailure as e:
+                logger.info(
+                    f"Skipping stats of {db.name}.{collection['name']}: {str(e)}"
                 )
 
-        client.close()
+
+class MongoDBAsyncEnum(AsyncDBInterface):
+    get_info = staticmethod(MongoDBEnum.get_info)
+
+    @staticmethod
+    async def open_session(session: Session, logger: VerboseLogger) -> None:
+        session.handle = AsyncMongoClient(
+            f"mongodb://{session.user}:{session.password}@{session.host}:{session.port}/{session.database or ''}",
+            event_listeners=_event_listeners(session),
+            **_timeouts(session),
+        )
+        await session.handle.admin.command("ismaster")
+
+    @staticmethod
+    async def close_session(session: Session) -> None:
+        await session.handle.close()
+
+    @staticmethod
+    async def stream_session(
+        session: Session, logger: VerboseLogger
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        client = session.handle
+
+        logger.info("Retrieving MongoDB version...")
+        session.tracer.phase("version")
+        server_info = await client.server_info()
+        yield "version", server_info.get("version")
+
+        logger.info("Retrieving database list...")
+        session.tracer.phase("databases")
+        databases = await client.list_database_names()
+        for db_name in databases:
+            yield "databases", db_name
+
+        logger.info("Retrieving database and collection information...")
+        session.tracer.phase("collections")
+        collection_stats = session.options.get("collection_stats", False)
+        concurrency = session.options.get("concurrency", 4)
+        db_filter = Filter.from_options(session.options)
+        inventories = map_window_async(
+            lambda db_name: MongoDBAsyncEnum._inventory(
+                client[db_name], session.tracer
+            ),
+            [db_name for db_name in databases if db_filter.allows(db_name)],
+            concurrency,
+        )
+        async for database, collections in inventories:
+            if collection_stats:
+                # The next databases' inventories are fetched meanwhile
+                db = client[database["name"]]
+                stats = map_window_async(
+                    lambda collection: MongoDBAsyncEnum._collection_stats(
+                        db, collection, session.tracer, logger
+                    ),
+                    [c for c in collections if c["type"] == "collection"],
+                    concurrency,
+                )
+                async for _ in stats:
+                    pass
+            yield "database_stats", database
+            for collection in collections:
+                yield "collections", collection
+
         logger.info("MongoDB enumeration completed successfully")
-        return result
+
+    @staticmethod
+    async def _inventory(db, tracer):
+        with tracer.span("database", database=db.name):
+            database = _database_record(db.name, await db.command("dbStats"))
+            collections = [
+                _collection_record(db.name, spec)
+                async for spec in await db.list_collections(nameOnly=True)
+            ]
+        return database, collections
+
+    @staticmethod
+    async def _collection_stats(
+        db, collection: Dict[str, Any], tracer, logger: VerboseLogger
+    ) -> None:
+        with tracer.span("collection", database=db.name, collection=collection["name"]):
+            try:
+                cursor = await db[collection["name"]].aggregate(COLL_STATS_PIPELINE)
+                _add_storage_stats(collection, await cursor.to_list())
+            except OperationFailure as e:
+                logger.info(
+                    f"Skipping stats of {db.name}.{collection['name']}: {str(e)}"
+                )
 
 
 check_connection = MongoDBEnum.check_connection
-enumerate = MongoDBEnum.enumerate
+enumerate_database = MongoDBEnum.enumerate
 get_info = MongoDBEnum.get_info
+connect = MongoDBEnum.connect
+enumerate_session = MongoDBEnum.enumerate_session
+stream_session = MongoDBEnum.stream_session
+close = MongoDBEnum.close
+async_adapter = MongoDBAsyncEnum if AsyncMongoClient is not None else None
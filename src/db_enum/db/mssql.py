@@ -1,102 +1,226 @@
 import pymssql
-from typing import Dict, Any
-from ..db_interface import DBInterface
+import threading
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from ..db_interface import DBInterface, Session, map_window
+from ..deadline import Deadline
+from ..filters import Filter
 from ..logger import VerboseLogger
+from ..registry import adapter_info
+
+# Row and page counts the engine already keeps per partition; rows are only
+# counted for the heap or clustered index so secondary indexes do not inflate
+# them
+PARTITION_STATS_QUERY = """
+    SELECT
+        s.name AS schema_name,
+        t.name AS table_name,
+        SUM(CASE WHEN ps.index_id IN (0, 1) THEN ps.row_count ELSE 0 END) AS row_count,
+        SUM(ps.reserved_page_count) * 8 * 1024 AS total_space_bytes
+    FROM
+        sys.dm_db_partition_stats ps
+        INNER JOIN sys.tables t ON ps.object_id = t.object_id
+        INNER JOIN sys.schemas s ON t.schema_id = s.schema_id
+    GROUP BY
+        s.name, t.name
+"""
+
+# Needs no VIEW DATABASE STATE permission, unlike the DMV above
+CATALOG_QUERY = """
+    SELECT
+        s.name AS schema_name,
+        t.name AS table_name,
+        p.rows AS row_count,
+        SUM(a.total_pages) * 8 * 1024 AS total_space_bytes
+    FROM
+        sys.tables t
+        INNER JOIN sys.indexes i ON t.object_id = i.object_id
+        INNER JOIN sys.partitions p ON i.object_id = p.object_id AND i.index_id = p.index_id
+        INNER JOIN sys.allocation_units a ON p.partition_id = a.container_id
+        LEFT JOIN sys.schemas s ON t.schema_id = s.schema_id
+    GROUP BY
+        t.name, s.name, p.rows
+"""
+
+
+def _quote(name: str) -> str:
+    return "[" + name.replace("]", "]]") + "]"
+
+
+def _table_record(db_name: str, row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "database": db_name,
+        "schema": row["schema_name"],
+        "name": row["table_name"],
+        "approx_rows": row["row_count"],
+        "size_bytes": row["total_space_bytes"],
+    }
+
+
+def _tables_query(
+    query: str, table_filter: Filter
+) -> Tuple[str, Optional[Tuple[Any, ...]]]:
+    """A catalog query with --include/--exclude, --min-size and --top applied."""
+    table_filter = table_filter.sql_pushdown(case_insensitive=True)
+    if not table_filter.active:
+        return query, None
+    conditions, params = table_filter.sql_conditions(
+        "schema_name", "total_space_bytes", escape=True
+    )
+    top = ""
+    if table_filter.top is not None:
+        top = "TOP (%s) "
+        params.insert(0, table_filter.top)
+    sql = f"SELECT {top}* FROM ({query}) AS catalog"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if table_filter.top is not None:
+        sql += " ORDER BY total_space_bytes DESC"
+    return sql, tuple(params)
+
+
+def _timeouts(session: Session) -> Dict[str, Any]:
+    # pymssql takes whole seconds and reads a query timeout of 0 as unlimited
+    return {
+        "login_timeout": Deadline.whole_seconds(session.deadline.connect_timeout(60)),
+        "timeout": Deadline.whole_seconds(session.deadline.timeout()) or 0,
+    }
 
 
 class MSSQLEnum(DBInterface):
     @staticmethod
     def get_info() -> Dict[str, Any]:
-        return {
-            "name": "Microsoft SQL Server",
-            "kind": "sql",
-        }
+        return adapter_info("mssql", ["databases", "tables"])
 
     @staticmethod
-    def check_connection(
-        host: str,
-        port: int,
-        user: str,
-        password: str,
-        database: str,
-        logger: VerboseLogger,
-    ) -> bool:
-        try:
-            conn = pymssql.connect(
-                server=host, port=port, user=user, password=password, database=database
-            )
-            conn.close()
-            logger.info(f"Successfully connected to MSSQL at {host}:{port}")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to connect to MSSQL: {str(e)}")
-            return False
+    def open_session(session: Session, logger: VerboseLogger) -> None:
+        session.handle = pymssql.connect(
+            server=session.host,
+            port=session.port,
+            user=session.user,
+            password=session.password,
+            database=session.database,
+            **_timeouts(session),
+        )
 
     @staticmethod
-    def enumerate(
-        host: str,
-        port: int,
-        user: str,
-        password: str,
-        database: str,
-        logger: VerboseLogger,
-    ) -> Dict[str, Any]:
-        conn = pymssql.connect(
-            server=host, port=port, user=user, password=password, database=database
-        )
-        cursor = conn.cursor(as_dict=True)
+    def close_session(session: Session) -> None:
+        session.handle.close()
 
-        result = {
-            "type": "Microsoft SQL Server",
-            "kind": "sql",
-            "version": None,
-            "databases": [],
-            "tables": [],
-        }
+    @staticmethod
+    def stream_session(
+        session: Session, logger: VerboseLogger
+    ) -> Iterator[Tuple[str, Any]]:
+        cursor = session.handle.cursor(as_dict=True)
 
         logger.info("Retrieving MSSQL version...")
-        cursor.execute("SELECT @@VERSION AS version")
-        result["version"] = cursor.fetchone()["version"]
+        session.tracer.phase("version")
+        cursor.execute("SELECT @@VERSION AS version, DB_NAME() AS current_db")
+        session.tracer.round_trip()
+        row = cursor.fetchone()
+        yield "version", row["version"]
+        current_db = row["current_db"]
 
         logger.info("Retrieving database list...")
-        cursor.execute("SELECT name FROM sys.databases")
-        result["databases"] = [row["name"] for row in cursor.fetchall()]
-
-        logger.info("Retrieving table information...")
+        session.tracer.phase("databases")
         cursor.execute(
             """
-            SELECT 
-                s.name AS schema_name,
-                t.name AS table_name,
-                p.rows AS row_count,
-                SUM(a.total_pages) * 8 * 1024 AS total_space_bytes
-            FROM 
-                sys.tables t
-                INNER JOIN sys.indexes i ON t.object_id = i.object_id
-                INNER JOIN sys.partitions p ON i.object_id = p.object_id AND i.index_id = p.index_id
-                INNER JOIN sys.allocation_units a ON p.partition_id = a.container_id
-                LEFT JOIN sys.schemas s ON t.schema_id = s.schema_id
-            GROUP BY 
-                t.name, s.name, p.rows
+            SELECT name, HAS_DBACCESS(name) AS has_access, state_desc
+            FROM sys.databases
         """
         )
+        session.tracer.round_trip()
+        accessible = []
         for row in cursor.fetchall():
-            result["tables"].append(
-                {
-                    "schema": row["schema_name"],
-                    "name": row["table_name"],
-                    "approx_rows": row["row_count"],
-                    "size_bytes": row["total_space_bytes"],
-                }
-            )
-
+            yield "databases", row["name"]
+            if row["has_access"] == 1 and row["state_desc"] == "ONLINE":
+                accessible.append(row["name"])
         cursor.close()
-        conn.close()
+
+        session.tracer.phase("tables")
+        if not session.options.get("all_databases", True):
+            logger.info("Retrieving table information...")
+            for table in MSSQLEnum._tables(session, session.handle, current_db, logger):
+                yield "tables", table
+        else:
+            logger.info(
+                f"Retrieving table information for {len(accessible)} accessible databases..."
+            )
+            yield from MSSQLEnum._stream_all_databases(session, accessible, logger)
 
         logger.info("MSSQL enumeration completed successfully")
-        return result
+
+    @staticmethod
+    def _tables(
+        session: Session, conn, db_name: str, logger: VerboseLogger
+    ) -> Iterator[Dict[str, Any]]:
+        table_filter = Filter.from_options(session.options)
+        cursor = conn.cursor(as_dict=True)
+        try:
+            try:
+                session.tracer.round_trip()
+                cursor.execute(*_tables_query(PARTITION_STATS_QUERY, table_filter))
+            except pymssql.DatabaseError as e:
+                logger.info(
+                    f"sys.dm_db_partition_stats unavailable in {db_name}: {str(e)}"
+                )
+                session.tracer.round_trip()
+                cursor.execute(*_tables_query(CATALOG_QUERY, table_filter))
+            # Iterating the cursor reads rows off the wire as they arrive
+            for row in cursor:
+                yield _table_record(db_name, row)
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _stream_all_databases(
+        session: Session, databases: List[str], logger: VerboseLogger
+    ) -> Iterator[Tuple[str, Any]]:
+        """Inventory each database on a small pool of connections.
+
+        Every worker thread opens one connection and switches it between
+        databases with USE. A database that still refuses access is skipped.
+        """
+        local = threading.local()
+        connections = []
+        lock = threading.Lock()
+
+        def database_tables(db_name: str) -> List[Dict[str, Any]]:
+            with session.tracer.span("database", database=db_name):
+                if not hasattr(local, "conn"):
+                    local.conn = pymssql.connect(
+                        server=session.host,
+                        port=session.port,
+                        user=session.user,
+                        password=session.password,
+                        **_timeouts(session),
+                    )
+                    with lock:
+                        connections.append(local.conn)
+                try:
+                    cursor = local.conn.cursor()
+                    session.tracer.round_trip()
+                    cursor.execute(f"USE {_quote(db_name)}")
+                    cursor.close()
+                    return list(MSSQLEnum._tables(session, local.conn, db_name, logger))
+                except pymssql.DatabaseError as e:
+                    logger.info(f"Skipping database {db_name}: {str(e)}")
+                    return []
+
+        try:
+            for tables in map_window(
+                database_tables, databases, session.options.get("concurrency", 4)
+            ):
+                for table in tables:
+                    yield "tables", table
+        finally:
+            for conn in connections:
+                conn.close()
 
 
 check_connection = MSSQLEnum.check_connection
-enumerate = MSSQLEnum.enumerate
+enumerate_database = MSSQLEnum.enumerate
 get_info = MSSQLEnum.get_info
+connect = MSSQLEnum.connect
+enumerate_session = MSSQLEnum.enumerate_session
+stream_session = MSSQLEnum.stream_session
+close = MSSQLEnum.close
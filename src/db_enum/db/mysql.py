@@ -1,92 +1,379 @@
 import pymysql
-from typing import Dict, Any
+import threading
 
-from ..db_interface import DBInterface
+try:
+    import aiomysql
+except ImportError:  # optional, only used by the asyncio engine
+    aiomysql = None
+
+from typing import Dict, Any, AsyncIterator, Iterator, List, Optional, Tuple
+
+from ..aio import AsyncDBInterface, map_window_async
+from ..db_interface import DBInterface, Session, map_window
+from ..filters import Filter
 from ..logger import VerboseLogger
+from ..registry import adapter_info
+
+TABLES_QUERY = """
+    SELECT TABLE_SCHEMA, TABLE_NAME, TABLE_ROWS, DATA_LENGTH
+    FROM INFORMATION_SCHEMA.TABLES
+"""
+
+# Persistent InnoDB statistics, a plain table read that never opens the tables
+# themselves. Sizes are in pages; non-InnoDB tables are not listed
+INNODB_STATS_QUERY = """
+    SELECT database_name, table_name, n_rows,
+        clustered_index_size * @@innodb_page_size
+    FROM mysql.innodb_table_stats
+"""
+
+# Access denied, unknown table
+FAST_PATH_ERRORS = (1142, 1146)
+
+
+def _table_record(row) -> Dict[str, Any]:
+    return {
+        "schema": row[0],
+        "name": row[1],
+        "approx_rows": row[2],
+        "size_bytes": row[3],
+    }
+
+
+def _filtered(
+    query: str,
+    table_filter: Filter,
+    schema_column: str,
+    size_column: str,
+    conditions: Tuple[str, ...] = (),
+    params: Tuple[Any, ...] = (),
+) -> Tuple[str, Optional[List[Any]]]:
+    """A catalog query with --include/--exclude, --min-size and --top applied."""
+    table_filter = table_filter.sql_pushdown(case_insensitive=True)
+    extra, extra_params = table_filter.sql_conditions(schema_column, size_column)
+    conditions += tuple(extra)
+    params_list = list(params) + extra_params
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    if table_filter.top is not None:
+        query += f" ORDER BY {size_column} DESC LIMIT %s"
+        params_list.append(table_filter.top)
+    return query, params_list or None
+
+
+def _timeouts(session: Session) -> Dict[str, Any]:
+    # read_timeout bounds each wait for the server, so a query that outlives
+    # the deadline fails client-side
+    remaining = session.deadline.timeout()
+    return {
+        "connect_timeout": session.deadline.connect_timeout(10),
+        "read_timeout": remaining,
+        "write_timeout": remaining,
+    }
 
 
 class MySQLEnum(DBInterface):
     @staticmethod
     def get_info() -> Dict[str, Any]:
-        return {
-            "name": "MySQL",
-            "kind": "sql",
-        }
+        return adapter_info("mysql", ["databases", "tables"])
 
     @staticmethod
-    def check_connection(
-        host: str,
-        port: int,
-        user: str,
-        password: str,
-        database: str,
-        logger: VerboseLogger,
-    ) -> bool:
-        try:
-            conn = pymysql.connect(
-                host=host, port=port, user=user, password=password, database=database
-            )
-            conn.close()
-            logger.info(f"Successfully connected to MySQL at {host}:{port}")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to connect to MySQL: {str(e)}")
-            return False
+    def open_session(session: Session, logger: VerboseLogger) -> None:
+        session.handle = pymysql.connect(
+            host=session.host,
+            port=session.port,
+            user=session.user,
+            password=session.password,
+            database=session.database,
+            **_timeouts(session),
+        )
 
     @staticmethod
-    def enumerate(
-        host: str,
-        port: int,
-        user: str,
-        password: str,
-        database: str,
-        logger: VerboseLogger,
-    ) -> Dict[str, Any]:
-        conn = pymysql.connect(
-            host=host, port=port, user=user, password=password, database=database
-        )
-        cursor = conn.cursor()
+    def close_session(session: Session) -> None:
+        session.handle.close()
 
-        result = {
-            "type": "MySQL",
-            "kind": "sql",
-            "version": None,
-            "databases": [],
-            "tables": [],
-        }
+    @staticmethod
+    def stream_session(
+        session: Session, logger: VerboseLogger
+    ) -> Iterator[Tuple[str, Any]]:
+        conn = session.handle
+        cursor = conn.cursor()
 
         logger.info("Retrieving MySQL version...")
+        session.tracer.phase("version")
         cursor.execute("SELECT VERSION()")
-        result["version"] = cursor.fetchone()[0]
+        session.tracer.round_trip()
+        yield "version", cursor.fetchone()[0]
 
         logger.info("Retrieving database list...")
+        session.tracer.phase("databases")
         cursor.execute("SHOW DATABASES")
-        result["databases"] = [row[0] for row in cursor.fetchall()]
+        session.tracer.round_trip()
+        databases = [row[0] for row in cursor.fetchall()]
+        for db_name in databases:
+            yield "databases", db_name
+        cursor.close()
 
-        logger.info("Retrieving table information...")
-        cursor.execute(
-            """
-            SELECT TABLE_SCHEMA, TABLE_NAME, TABLE_ROWS, DATA_LENGTH 
-            FROM INFORMATION_SCHEMA.TABLES
-        """
+        fast = session.options.get("fast")
+        table_filter = Filter.from_options(session.options)
+        session.tracer.phase("tables")
+        stats = (
+            MySQLEnum._innodb_table_stats(session, table_filter, logger)
+            if fast
+            else None
         )
-        for row in cursor.fetchall():
-            result["tables"].append(
-                {
-                    "schema": row[0],
-                    "name": row[1],
-                    "approx_rows": row[2],
-                    "size_bytes": row[3],
-                }
+        if stats is not None:
+            for row in stats:
+                yield "tables", _table_record(row)
+            stats.close()
+        elif fast or session.options.get("per_schema"):
+            # Schemas are databases here, skip the excluded ones entirely
+            databases = [name for name in databases if table_filter.allows(name)]
+            yield from MySQLEnum._stream_per_schema(
+                session, databases, table_filter, logger
+            )
+        else:
+            logger.info("Retrieving table information...")
+            # Unbuffered so rows are streamed from the server instead of loaded at once
+            cursor = conn.cursor(pymysql.cursors.SSCursor)
+            cursor.execute(
+                *_filtered(TABLES_QUERY, table_filter, "TABLE_SCHEMA", "DATA_LENGTH")
             )
+            session.tracer.round_trip()
+            for row in cursor:
+                yield "tables", _table_record(row)
+            cursor.close()
+
+        logger.info("MySQL enumeration completed successfully")
+
+    @staticmethod
+    def _innodb_table_stats(
+        session: Session, table_filter: Filter, logger: VerboseLogger
+    ):
+        """Unbuffered cursor over mysql.innodb_table_stats, None if not readable."""
+        logger.info("Retrieving table statistics from mysql.innodb_table_stats...")
+        cursor = session.handle.cursor(pymysql.cursors.SSCursor)
+        try:
+            session.tracer.round_trip()
+            cursor.execute(
+                *_filtered(
+                    INNODB_STATS_QUERY,
+                    table_filter,
+                    "database_name",
+                    "clustered_index_size * @@innodb_page_size",
+                )
+            )
+        except pymysql.MySQLError as e:
+            if e.args[0] not in FAST_PATH_ERRORS:
+                raise
+            logger.info(f"innodb_table_stats unavailable: {e.args[1]}")
+            cursor.close()
+            return None
+        return cursor
+
+    @staticmethod
+    def _stream_per_schema(
+        session: Session,
+        databases: List[str],
+        table_filter: Filter,
+        logger: VerboseLogger,
+    ) -> Iterator[Tuple[str, Any]]:
+        """INFORMATION_SCHEMA one schema at a time, on a few connections in parallel.
+
+        A schema filter lets the server open only that schema's tables, and no
+        single query holds locks or memory for the whole catalog.
+        """
+        logger.info("Retrieving table information per schema...")
+        local = threading.local()
+        connections = []
+        lock = threading.Lock()
+
+        def schema_tables(db_name: str) -> List[Dict[str, Any]]:
+            with session.tracer.span("database", database=db_name):
+                if not hasattr(local, "conn"):
+                    local.conn = pymysql.connect(
+                        host=session.host,
+                        port=session.port,
+                        user=session.user,
+                        password=session.password,
+                        **_timeouts(session),
+                    )
+                    with lock:
+                        connections.append(local.conn)
+                cursor = local.conn.cursor(pymysql.cursors.SSCursor)
+                try:
+                    cursor.execute(
+                        *_filtered(
+                            TABLES_QUERY,
+                            table_filter,
+                            "TABLE_SCHEMA",
+                            "DATA_LENGTH",
+                            ("TABLE_SCHEMA = %s",),
+                            (db_name,),
+                        )
+                    )
+                    session.tracer.round_trip()
+                    return [_table_record(row) for row in cursor]
+                finally:
+                    cursor.close()
+
+        try:
+            for tables in map_window(
+                schema_tables, databases, session.options.get("concurrency", 4)
+            ):
+                for table in tables:
+                    yield "tables", table
+        finally:
+            for conn in connections:
+                conn.close()
 
-        cursor.close()
-        conn.close()
+
+def _async_connect_args(session: Session) -> Dict[str, Any]:
+    # aiomysql has no read timeout, the asyncio engine cancels the target's
+    # task at its deadline instead
+    return {
+        "host": session.host,
+        "port": session.port,
+        "user": session.user,
+        "password": session.password or "",
+        "db": session.database,
+        "connect_timeout": session.deadline.connect_timeout(10),
+    }
+
+
+class MySQLAsyncEnum(AsyncDBInterface):
+    get_info = staticmethod(MySQLEnum.get_info)
+
+    @staticmethod
+    async def open_session(session: Session, logger: VerboseLogger) -> None:
+        session.handle = await aiomysql.connect(**_async_connect_args(session))
+
+    @staticmethod
+    async def close_session(session: Session) -> None:
+        session.handle.close()
+
+    @staticmethod
+    async def stream_session(
+        session: Session, logger: VerboseLogger
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        conn = session.handle
+        cursor = await conn.cursor()
+
+        logger.info("Retrieving MySQL version...")
+        session.tracer.phase("version")
+        await cursor.execute("SELECT VERSION()")
+        session.tracer.round_trip()
+        yield "version", (await cursor.fetchone())[0]
+
+        logger.info("Retrieving database list...")
+        session.tracer.phase("databases")
+        await cursor.execute("SHOW DATABASES")
+        session.tracer.round_trip()
+        databases = [row[0] for row in await cursor.fetchall()]
+        for db_name in databases:
+            yield "databases", db_name
+        await cursor.close()
+
+        fast = session.options.get("fast")
+        table_filter = Filter.from_options(session.options)
+        session.tracer.phase("tables")
+        stats = (
+            await MySQLAsyncEnum._innodb_table_stats(session, table_filter, logger)
+            if fast
+            else None
+        )
+        if stats is not None:
+            async for row in stats:
+                yield "tables", _table_record(row)
+            await stats.close()
+        elif fast or session.options.get("per_schema"):
+            databases = [name for name in databases if table_filter.allows(name)]
+            tables = MySQLAsyncEnum._stream_per_schema(
+                session, databases, table_filter, logger
+            )
+            async for record in tables:
+                yield record
+        else:
+            logger.info("Retrieving table information...")
+            cursor = await conn.cursor(aiomysql.SSCursor)
+            await cursor.execute(
+                *_filtered(TABLES_QUERY, table_filter, "TABLE_SCHEMA", "DATA_LENGTH")
+            )
+            session.tracer.round_trip()
+            async for row in cursor:
+                yield "tables", _table_record(row)
+            await cursor.close()
 
         logger.info("MySQL enumeration completed successfully")
-        return result
+
+    @staticmethod
+    async def _innodb_table_stats(
+        session: Session, table_filter: Filter, logger: VerboseLogger
+    ):
+        logger.info("Retrieving table statistics from mysql.innodb_table_stats...")
+        cursor = await session.handle.cursor(aiomysql.SSCursor)
+        try:
+            session.tracer.round_trip()
+            await cursor.execute(
+                *_filtered(
+                    INNODB_STATS_QUERY,
+                    table_filter,
+                    "database_name",
+                    "clustered_index_size * @@innodb_page_size",
+                )
+            )
+        except pymysql.MySQLError as e:
+            if e.args[0] not in FAST_PATH_ERRORS:
+                raise
+            logger.info(f"innodb_table_stats unavailable: {e.args[1]}")
+            await cursor.close()
+            return None
+        return cursor
+
+    @staticmethod
+    async def _stream_per_schema(
+        session: Session,
+        databases: List[str],
+        table_filter: Filter,
+        logger: VerboseLogger,
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        logger.info("Retrieving table information per schema...")
+        concurrency = session.options.get("concurrency", 4)
+        pool = await aiomysql.create_pool(
+            minsize=0, maxsize=concurrency, **_async_connect_args(session)
+        )
+
+        async def schema_tables(db_name: str) -> List[Dict[str, Any]]:
+            with session.tracer.span("database", database=db_name):
+                async with pool.acquire() as conn:
+                    async with conn.cursor(aiomysql.SSCursor) as cursor:
+                        await cursor.execute(
+                            *_filtered(
+                                TABLES_QUERY,
+                                table_filter,
+                                "TABLE_SCHEMA",
+                                "DATA_LENGTH",
+                                ("TABLE_SCHEMA = %s",),
+                                (db_name,),
+                            )
+                        )
+                        session.tracer.round_trip()
+                        return [_table_record(row) async for row in cursor]
+
+        try:
+            async for tables in map_window_async(schema_tables, databases, concurrency):
+                for table in tables:
+                    yield "tables", table
+        finally:
+            pool.close()
+            await pool.wait_closed()
 
 
 check_connection = MySQLEnum.check_connection
-enumerate = MySQLEnum.enumerate
+enumerate_database = MySQLEnum.enumerate
 get_info = MySQLEnum.get_info
+connect = MySQLEnum.connect
+enumerate_session = MySQLEnum.enumerate_session
+stream_session = MySQLEnum.stream_session
+close = MySQLEnum.close
+async_adapter = MySQLAsyncEnum if aiomysql is not None else None
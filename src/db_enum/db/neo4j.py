@@ -1,85 +1,309 @@
-from neo4j import GraphDatabase
-from typing import Dict, Any
-from ..db_interface import DBInterface
+from neo4j import AsyncGraphDatabase, GraphDatabase
+from typing import Dict, Any, AsyncIterator, Iterator, List, Optional, Tuple
+from ..aio import AsyncDBInterface, map_window_async
+from ..db_interface import DBInterface, Session, map_window
+from ..filters import Filter
 from ..logger import VerboseLogger
+from ..registry import adapter_info
+
+SCHEMA_QUERY = """
+    CALL db.labels() YIELD label RETURN 'label' AS kind, label AS name
+    UNION ALL
+    CALL db.relationshipTypes() YIELD relationshipType
+    RETURN 'type' AS kind, relationshipType AS name
+"""
+
+# Count subqueries per UNION ALL statement, so huge schemas do not produce a
+# single query the planner chokes on
+COUNT_BATCH = 250
+
+
+def _quote(name: str) -> str:
+    return "`" + name.replace("`", "``") + "`"
+
+
+def _count_query(items: List[Tuple[str, str]], totals: bool) -> str:
+    """UNION ALL of count() patterns, all answered from the count store in O(1).
+
+    The count is aggregated on its own before the constant columns are added,
+    otherwise the planner groups by them and scans instead.
+    """
+    parts = []
+    if totals:
+        parts.append(
+            "MATCH (n) WITH count(n) AS c RETURN 'nodes' AS kind, '' AS name, c AS count"
+        )
+        parts.append(
+            "MATCH ()-[n]->() WITH count(n) AS c"
+            " RETURN 'relationships' AS kind, '' AS name, c AS count"
+        )
+    for i, (kind, name) in enumerate(items):
+        if kind == "label":
+            pattern = f"(n:{_quote(name)})"
+        else:
+            pattern = f"()-[n:{_quote(name)}]->()"
+        parts.append(
+            f"MATCH {pattern} WITH count(n) AS c"
+            f" RETURN '{kind}' AS kind, $names[{i}] AS name, c AS count"
+        )
+    return " UNION ALL ".join(parts)
+
+
+def _driver_args(session: Session) -> Dict[str, Any]:
+    return {
+        "uri": f"neo4j://{session.host}:{session.port}",
+        "auth": (session.user, session.password),
+        "connection_timeout": session.deadline.connect_timeout(30),
+        "connection_acquisition_timeout": session.deadline.timeout(60),
+    }
+
+
+def _targets(
+    session: Session, databases: Dict[str, bool], default: Optional[str]
+) -> List[str]:
+    if session.options.get("all_databases", True):
+        # The system database holds no graph
+        targets = [
+            name for name, online in databases.items() if online and name != "system"
+        ]
+    else:
+        targets = [session.database or default]
+    db_filter = Filter.from_options(session.options)
+    return [name for name in targets if db_filter.allows(name)]
+
+
+def _inventory_records(db_name: str, counts: List[Dict]) -> List[Tuple[str, Any]]:
+    totals = {row["kind"]: row["count"] for row in counts}
+    records: List[Tuple[str, Any]] = [
+        (
+            "database_stats",
+            {
+                "name": db_name,
+                "node_count": totals.get("nodes"),
+                "relationship_count": totals.get("relationships"),
+            },
+        )
+    ]
+    for row in counts:
+        if row["kind"] == "label":
+            records.append(
+                (
+                    "node_labels",
+                    {
+                        "database": db_name,
+                        "name": row["name"],
+                        "node_count": row["count"],
+                    },
+                )
+            )
+        elif row["kind"] == "type":
+            records.append(
+                (
+                    "relationship_types",
+                    {
+                        "database": db_name,
+                        "name": row["name"],
+                        "relationship_count": row["count"],
+                    },
+                )
+            )
+    return records
 
 
 class Neo4jEnum(DBInterface):
     @staticmethod
     def get_info() -> Dict[str, Any]:
-        return {
-            "name": "Neo4j",
-            "kind": "graph",
-        }
+        return adapter_info(
+            "neo4j",
+            [
+                "databases",
+                "database_stats",
+                "node_labels",
+                "relationship_types",
+            ],
+        )
+
+    @staticmethod
+    def open_session(session: Session, logger: VerboseLogger) -> None:
+        session.handle = GraphDatabase.driver(**_driver_args(session))
+        with session.handle.session(database=session.database) as neo4j_session:
+            neo4j_session.run("RETURN 1")
+
+    @staticmethod
+    def close_session(session: Session) -> None:
+        session.handle.close()
+
+    @staticmethod
+    def stream_session(
+        session: Session, logger: VerboseLogger
+    ) -> Iterator[Tuple[str, Any]]:
+        driver = session.handle
+
+        with driver.session(database=session.database) as neo4j_session:
+            logger.info("Retrieving Neo4j version...")
+            session.tracer.phase("version")
+            session.tracer.round_trip()
+            version_query = neo4j_session.run(
+                "CALL dbms.components() YIELD versions RETURN versions[0] as version"
+            )
+            yield "version", version_query.single()["version"]
+
+            logger.info("Retrieving database list...")
+            session.tracer.phase("databases")
+            session.tracer.round_trip()
+            # Clusters list each database once per server hosting it
+            databases: Dict[str, bool] = {}
+            default = None
+            for record in neo4j_session.run("SHOW DATABASES"):
+                name = record["name"]
+                online = record["currentStatus"] == "online"
+                databases[name] = databases.get(name, False) or online
+                if record.get("default"):
+                    default = name
+            for name in databases:
+                yield "databases", name
+
+        targets = _targets(session, databases, default)
+
+        logger.info(
+            f"Retrieving label and relationship counts for {len(targets)} databases..."
+        )
+        session.tracer.phase("counts")
+        inventories = map_window(
+            lambda name: Neo4jEnum._inventory(session, name, logger),
+            targets,
+            session.options.get("concurrency", 4),
+        )
+        for records in inventories:
+            yield from records
+
+        logger.info("Neo4j enumeration completed successfully")
 
     @staticmethod
-    def check_connection(
-        host: str,
-        port: int,
-        user: str,
-        password: str,
-        database: str,
-        logger: VerboseLogger,
-    ) -> bool:
+    def _inventory(
+        session: Session, db_name: str, logger: VerboseLogger
+    ) -> List[Tuple[str, Any]]:
+        """Label/type names in one round trip, then their counts in one more.
+
+        Sessions are cheap and the driver is thread-safe, so each database
+        gets its own session on the shared driver.
+        """
         try:
-            uri = f"neo4j://{host}:{port}"
-            driver = GraphDatabase.driver(uri, auth=(user, password))
-            with driver.session(database=database) as session:
-                session.run("RETURN 1")
-            driver.close()
-            logger.info(f"Successfully connected to Neo4j at {host}:{port}")
-            return True
+            with (
+                session.tracer.span("database", database=db_name),
+                session.handle.session(database=db_name) as neo4j_session,
+            ):
+                session.tracer.round_trip()
+                items = [
+                    (row["kind"], row["name"])
+                    for row in neo4j_session.run(SCHEMA_QUERY)
+                ]
+                counts = []
+                for start in range(0, max(len(items), 1), COUNT_BATCH):
+                    batch = items[start : start + COUNT_BATCH]
+                    session.tracer.round_trip()
+                    counts += neo4j_session.run(
+                        _count_query(batch, totals=start == 0),
+                        names=[name for _, name in batch],
+                    ).data()
         except Exception as e:
-            logger.error(f"Failed to connect to Neo4j: {str(e)}")
-            return False
+            logger.info(f"Skipping database {db_name}: {str(e)}")
+            return []
+
+        return _inventory_records(db_name, counts)
+
+
+class Neo4jAsyncEnum(AsyncDBInterface):
+    get_info = staticmethod(Neo4jEnum.get_info)
+
+    @staticmethod
+    async def open_session(session: Session, logger: VerboseLogger) -> None:
+        session.handle = AsyncGraphDatabase.driver(**_driver_args(session))
+        async with session.handle.session(database=session.database) as neo4j_session:
+            await neo4j_session.run("RETURN 1")
+
+    @staticmethod
+    async def close_session(session: Session) -> None:
+        await session.handle.close()
 
     @staticmethod
-    def enumerate(
-        host: str,
-        port: int,
-        user: str,
-        password: str,
-        database: str,
-        logger: VerboseLogger,
-    ) -> Dict[str, Any]:
-        uri = f"neo4j://{host}:{port}"
-        driver = GraphDatabase.driver(uri, auth=(user, password))
-
-        result = {
-            "type": "Neo4j",
-            "kind": "graph",
-            "version": None,
-            "databases": [],
-            "node_labels": [],
-            "relationship_types": [],
-        }
-
-        with driver.session(database=database) as session:
+    async def stream_session(
+        session: Session, logger: VerboseLogger
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        driver = session.handle
+
+        async with driver.session(database=session.database) as neo4j_session:
             logger.info("Retrieving Neo4j version...")
-            version_query = session.run(
+            session.tracer.phase("version")
+            session.tracer.round_trip()
+            version_query = await neo4j_session.run(
                 "CALL dbms.components() YIELD versions RETURN versions[0] as version"
             )
-            result["version"] = version_query.single()["version"]
+            yield "version", (await version_query.single())["version"]
 
             logger.info("Retrieving database list...")
-            db_query = session.run("SHOW DATABASES")
-            result["databases"] = [record["name"] for record in db_query]
+            session.tracer.phase("databases")
+            session.tracer.round_trip()
+            databases: Dict[str, bool] = {}
+            default = None
+            async for record in await neo4j_session.run("SHOW DATABASES"):
+                name = record["name"]
+                online = record["currentStatus"] == "online"
+                databases[name] = databases.get(name, False) or online
+                if record.get("default"):
+                    default = name
+            for name in databases:
+                yield "databases", name
 
-            logger.info("Retrieving node labels...")
-            label_query = session.run("CALL db.labels()")
-            result["node_labels"] = [record["label"] for record in label_query]
+        targets = _targets(session, databases, default)
 
-            logger.info("Retrieving relationship types...")
-            rel_query = session.run("CALL db.relationshipTypes()")
-            result["relationship_types"] = [
-                record["relationshipType"] for record in rel_query
-            ]
+        logger.info(
+            f"Retrieving label and relationship counts for {len(targets)} databases..."
+        )
+        session.tracer.phase("counts")
+        inventories = map_window_async(
+            lambda name: Neo4jAsyncEnum._inventory(session, name, logger),
+            targets,
+            session.options.get("concurrency", 4),
+        )
+        async for records in inventories:
+            for record in records:
+                yield record
 
-        driver.close()
         logger.info("Neo4j enumeration completed successfully")
-        return result
+
+    @staticmethod
+    async def _inventory(
+        session: Session, db_name: str, logger: VerboseLogger
+    ) -> List[Tuple[str, Any]]:
+        try:
+            with session.tracer.span("database", database=db_name):
+                async with session.handle.session(database=db_name) as neo4j_session:
+                    session.tracer.round_trip()
+                    items = [
+                        (row["kind"], row["name"])
+                        async for row in await neo4j_session.run(SCHEMA_QUERY)
+                    ]
+                    counts = []
+                    for start in range(0, max(len(items), 1), COUNT_BATCH):
+                        batch = items[start : start + COUNT_BATCH]
+                        session.tracer.round_trip()
+                        result = await neo4j_session.run(
+                            _count_query(batch, totals=start == 0),
+                            names=[name for _, name in batch],
+                        )
+                        counts += await result.data()
+        except Exception as e:
+            logger.info(f"Skipping database {db_name}: {str(e)}")
+            return []
+        return _inventory_records(db_name, counts)
 
 
 check_connection = Neo4jEnum.check_connection
-enumerate = Neo4jEnum.enumerate
+enumerate_database = Neo4jEnum.enumerate
 get_info = Neo4jEnum.get_info
+connect = Neo4jEnum.connect
+enumerate_session = Neo4jEnum.enumerate_session
+stream_session = Neo4jEnum.stream_session
+close = Neo4jEnum.close
+async_adapter = Neo4jAsyncEnum
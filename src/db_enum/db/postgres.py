@@ -1,112 +1,350 @@
+import asyncio
+import itertools
 import psycopg2
+import re
 from psycopg2.extras import DictCursor
-from typing import Dict, Any
-from ..db_interface import DBInterface
+
+try:
+    import asyncpg
+except ImportError:  # optional, only used by the asyncio engine
+    asyncpg = None
+
+from typing import Dict, Any, AsyncIterator, Iterator, List, Tuple
+from ..aio import AsyncDBInterface, map_window_async
+from ..db_interface import DBInterface, Session, map_window
+from ..deadline import Deadline
+from ..filters import Filter
 from ..logger import VerboseLogger
+from ..registry import adapter_info
+
+# Sizes are looked up by OID, quoting names back into regclass is what makes
+# pg_total_relation_size slow on large catalogs
+TABLES_QUERY = """
+    SELECT
+        schemaname,
+        relname AS tablename,
+        n_live_tup::bigint AS approx_rows,
+        pg_total_relation_size(relid)::bigint AS size_bytes
+    FROM pg_stat_user_tables
+"""
+
+# Planner statistics only, no per-relation function calls. relpages counts the
+# heap alone (no indexes or TOAST) and both are as fresh as the last
+# VACUUM/ANALYZE; reltuples is -1 for tables never analyzed
+ESTIMATE_QUERY = """
+    SELECT
+        n.nspname AS schemaname,
+        c.relname AS tablename,
+        CASE WHEN c.reltuples < 0 THEN NULL ELSE c.reltuples::bigint END AS approx_rows,
+        c.relpages::bigint * current_setting('block_size')::bigint AS size_bytes
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.relkind IN ('r', 'p', 'm')
+        AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+        AND n.nspname NOT LIKE 'pg_toast%%'
+"""
+
+
+def _tables_query(query: str, table_filter: Filter) -> Tuple[str, List[Any]]:
+    """The catalog query with --include/--exclude, --min-size and --top applied.
+
+    Always run with parameters, so a literal % in the query is written %%.
+    """
+    table_filter = table_filter.sql_pushdown()
+    conditions, params = table_filter.sql_conditions("schemaname", "size_bytes")
+    sql = f"SELECT * FROM ({query}) AS t"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY size_bytes DESC"
+    if table_filter.top is not None:
+        sql += " LIMIT %s"
+        params.append(table_filter.top)
+    return sql, params
+
+
+def _numbered(query: Tuple[str, List[Any]]) -> Tuple[str, List[Any]]:
+    """A psycopg2 query with asyncpg's $1, $2, ... placeholders instead of %s."""
+    sql, params = query
+    numbers = itertools.count(1)
+    sql = re.sub(
+        r"%([s%])",
+        lambda m: f"${next(numbers)}" if m.group(1) == "s" else "%",
+        sql,
+    )
+    return sql, params
+
+
+def _table_record(database: str, row) -> Dict[str, Any]:
+    return {
+        "database": database,
+        "schema": row["schemaname"],
+        "name": row["tablename"],
+        "approx_rows": row["approx_rows"],
+        "size_bytes": row["size_bytes"],
+    }
+
+
+def _timeouts(session: Session) -> Dict[str, Any]:
+    # The server cancels any statement still running at the deadline
+    kwargs = {
+        "connect_timeout": Deadline.whole_seconds(session.deadline.connect_timeout(10))
+    }
+    remaining = session.deadline.timeout()
+    if remaining is not None:
+        kwargs["options"] = f"-c statement_timeout={max(1, int(remaining * 1000))}"
+    return kwargs
 
 
 class PostgresEnum(DBInterface):
     @staticmethod
     def get_info() -> Dict[str, Any]:
-        return {
-            "name": "PostgreSQL",
-            "kind": "sql",
-        }
+        return adapter_info("postgres", ["databases", "tables"])
 
     @staticmethod
-    def check_connection(
-        host: str,
-        port: int,
-        user: str,
-        password: str,
-        database: str,
-        logger: VerboseLogger,
-    ) -> bool:
-        try:
-            conn = psycopg2.connect(
-                host=host,
-                port=port,
-                user=user,
-                password=password,
-                dbname=database or "postgres",
-            )
-            conn.close()
-            logger.info(f"Successfully connected to PostgreSQL at {host}:{port}")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to connect to PostgreSQL: {str(e)}")
-            return False
+    def open_session(session: Session, logger: VerboseLogger) -> None:
+        session.handle = psycopg2.connect(
+            host=session.host,
+            port=session.port,
+            user=session.user,
+            password=session.password,
+            dbname=session.database or "postgres",
+            **_timeouts(session),
+        )
+
+    @staticmethod
+    def close_session(session: Session) -> None:
+        session.handle.close()
 
     @staticmethod
-    def enumerate(
-        host: str,
-        port: int,
-        user: str,
-        password: str,
-        database: str,
-        logger: VerboseLogger,
-    ) -> Dict[str, Any]:
+    def stream_session(
+        session: Session, logger: VerboseLogger
+    ) -> Iterator[Tuple[str, Any]]:
         try:
-            conn = psycopg2.connect(
-                host=host,
-                port=port,
-                user=user,
-                password=password,
-                dbname=database or "postgres",
-            )
+            conn = session.handle
             cursor = conn.cursor(cursor_factory=DictCursor)
 
-            result = {
-                "type": "PostgreSQL",
-                "kind": "sql",
-                "version": None,
-                "databases": [],
-                "tables": [],
-            }
-
             logger.info("Retrieving PostgreSQL version...")
+            session.tracer.phase("version")
             cursor.execute("SELECT version()")
-            result["version"] = cursor.fetchone()[0]
+            session.tracer.round_trip()
+            yield "version", cursor.fetchone()[0]
 
             logger.info("Retrieving database list...")
+            session.tracer.phase("databases")
             cursor.execute(
-                "SELECT datname FROM pg_database WHERE datistemplate = false"
+                "SELECT datname, datallowconn FROM pg_database WHERE datistemplate = false"
             )
-            result["databases"] = [row[0] for row in cursor.fetchall()]
+            session.tracer.round_trip()
+            databases = cursor.fetchall()
+            for row in databases:
+                yield "databases", row[0]
+            cursor.close()
 
-            logger.info("Retrieving table information...")
-            cursor.execute(
-                """
-                SELECT 
-                    schemaname, 
-                    relname AS tablename, 
-                    n_live_tup::bigint AS n_live_tup, 
-                    pg_total_relation_size(quote_ident(schemaname) || '.' || quote_ident(relname))::bigint AS total_bytes
-                FROM pg_stat_user_tables
-                ORDER BY total_bytes DESC
-            """
+            query = _tables_query(
+                ESTIMATE_QUERY if session.options.get("estimate") else TABLES_QUERY,
+                Filter.from_options(session.options),
             )
-            for row in cursor.fetchall():
-                result["tables"].append(
-                    {
-                        "schema": row["schemaname"],
-                        "name": row["tablename"],
-                        "approx_rows": row["n_live_tup"],
-                        "size_bytes": row["total_bytes"],
-                    }
+            if not session.options.get("all_databases"):
+                logger.info("Retrieving table information...")
+                session.tracer.phase("tables")
+                for table in PostgresEnum._tables(conn, query, session.tracer):
+                    yield "tables", table
+            else:
+                logger.info("Retrieving table information for every database...")
+                session.tracer.phase("tables")
+                names = [row[0] for row in databases if row[1]]
+                inventories = map_window(
+                    lambda name: PostgresEnum._inventory(session, name, query, logger),
+                    names,
+                    session.options.get("concurrency", 4),
                 )
+                for tables in inventories:
+                    for table in tables:
+                        yield "tables", table
 
+            logger.info("PostgreSQL enumeration completed successfully")
+
+        except Exception as e:
+            logger.error(f"Error enumerating PostgreSQL: {str(e)}")
+            yield "error", str(e)
+
+    @staticmethod
+    def _tables(conn, query: Tuple[str, List[Any]], tracer) -> Iterator[Dict[str, Any]]:
+        # Named (server-side) cursor, rows are fetched in batches of itersize
+        cursor = conn.cursor(name="db_enum_tables", cursor_factory=DictCursor)
+        try:
+            cursor.execute(*query)
+            tracer.round_trip()
+            database = conn.info.dbname
+            for i, row in zip(itertools.count(), cursor):
+                if i % cursor.itersize == 0:
+                    tracer.round_trip()
+                yield _table_record(database, row)
+        finally:
             cursor.close()
-            conn.close()
+            conn.rollback()
+
+    @staticmethod
+    def _inventory(
+        session: Session, name: str, query: Tuple[str, List[Any]], logger: VerboseLogger
+    ) -> List[Dict[str, Any]]:
+        """Tables of one database, over a connection of its own.
+
+        Postgres connections are bound to a database, so apart from the one the
+        session is already connected to every database needs a new connection.
+        """
+        with session.tracer.span("database", database=name):
+            if name == session.handle.info.dbname:
+                return list(PostgresEnum._tables(session.handle, query, session.tracer))
+            try:
+                conn = psycopg2.connect(
+                    host=session.host,
+                    port=session.port,
+                    user=session.user,
+                    password=session.password,
+                    dbname=name,
+                    **_timeouts(session),
+                )
+            except psycopg2.Error as e:
+                logger.info(f"Skipping database {name}: {str(e).strip()}")
+                return []
+            try:
+                return list(PostgresEnum._tables(conn, query, session.tracer))
+            finally:
+                conn.close()
+
+
+def _async_connect_args(session: Session, database: str) -> Dict[str, Any]:
+    kwargs = {
+        "host": session.host,
+        "port": session.port,
+        "user": session.user,
+        "password": session.password,
+        "database": database,
+        "timeout": session.deadline.connect_timeout(10),
+    }
+    remaining = session.deadline.timeout()
+    if remaining is not None:
+        kwargs["server_settings"] = {
+            "statement_timeout": str(max(1, int(remaining * 1000)))
+        }
+    return kwargs
+
+
+class PostgresAsyncEnum(AsyncDBInterface):
+    get_info = staticmethod(PostgresEnum.get_info)
+
+    @staticmethod
+    async def open_session(session: Session, logger: VerboseLogger) -> None:
+        session.handle = await asyncpg.connect(
+            **_async_connect_args(session, session.database or "postgres")
+        )
+
+    @staticmethod
+    async def close_session(session: Session) -> None:
+        await session.handle.close()
+
+    @staticmethod
+    async def stream_session(
+        session: Session, logger: VerboseLogger
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        try:
+            conn = session.handle
+
+            logger.info("Retrieving PostgreSQL version...")
+            session.tracer.phase("version")
+            session.tracer.round_trip()
+            yield "version", await conn.fetchval("SELECT version()")
+
+            logger.info("Retrieving database list...")
+            session.tracer.phase("databases")
+            session.tracer.round_trip()
+            databases = await conn.fetch(
+                "SELECT datname, datallowconn FROM pg_database WHERE datistemplate = false"
+            )
+            for row in databases:
+                yield "databases", row[0]
+
+            query = _numbered(
+                _tables_query(
+                    ESTIMATE_QUERY if session.options.get("estimate") else TABLES_QUERY,
+                    Filter.from_options(session.options),
+                )
+            )
+            session.tracer.phase("tables")
+            if not session.options.get("all_databases"):
+                logger.info("Retrieving table information...")
+                tables = PostgresAsyncEnum._tables(
+                    conn, query, session.database or "postgres", session.tracer
+                )
+                async for table in tables:
+                    yield "tables", table
+            else:
+                logger.info("Retrieving table information for every database...")
+                inventories = map_window_async(
+                    lambda name: PostgresAsyncEnum._inventory(
+                        session, name, query, logger
+                    ),
+                    [row[0] for row in databases if row[1]],
+                    session.options.get("concurrency", 4),
+                )
+                async for tables in inventories:
+                    for table in tables:
+                        yield "tables", table
 
             logger.info("PostgreSQL enumeration completed successfully")
-            return result
 
         except Exception as e:
             logger.error(f"Error enumerating PostgreSQL: {str(e)}")
-            return {"error": str(e)}
+            yield "error", str(e)
+
+    @staticmethod
+    async def _tables(
+        conn, query: Tuple[str, List[Any]], database: str, tracer
+    ) -> AsyncIterator[Dict[str, Any]]:
+        # Cursors need a transaction, rows are fetched in batches of prefetch
+        sql, params = query
+        prefetch = 2000
+        async with conn.transaction(readonly=True):
+            tracer.round_trip()
+            i = 0
+            async for row in conn.cursor(sql, *params, prefetch=prefetch):
+                if i % prefetch == 0:
+                    tracer.round_trip()
+                i += 1
+                yield _table_record(database, row)
+
+    @staticmethod
+    async def _inventory(
+        session: Session, name: str, query: Tuple[str, List[Any]], logger: VerboseLogger
+    ) -> List[Dict[str, Any]]:
+        with session.tracer.span("database", database=name):
+            if name == (session.database or "postgres"):
+                conn, own = session.handle, False
+            else:
+                try:
+                    conn = await asyncpg.connect(**_async_connect_args(session, name))
+                except (asyncpg.PostgresError, OSError, asyncio.TimeoutError) as e:
+                    logger.info(f"Skipping database {name}: {str(e).strip()}")
+                    return []
+                own = True
+            try:
+                return [
+                    table
+                    async for table in PostgresAsyncEnum._tables(
+                        conn, query, name, session.tracer
+                    )
+                ]
+            finally:
+                if own:
+                    await conn.close()
 
 
 check_connection = PostgresEnum.check_connection
-enumerate = PostgresEnum.enumerate
+enumerate_database = PostgresEnum.enumerate
 get_info = PostgresEnum.get_info
+connect = PostgresEnum.connect
+enumerate_session = PostgresEnum.enumerate_session
+stream_session = PostgresEnum.stream_session
+close = PostgresEnum.close
+async_adapter = PostgresAsyncEnum if asyncpg is not None else None
@@ -1,90 +1,182 @@
 import redis
-from typing import Dict, Any
-from ..db_interface import DBInterface
+import redis.asyncio
+from redis.asyncio.retry import Retry as AsyncRetry
+from redis.backoff import NoBackoff
+from redis.retry import Retry
+from typing import Dict, Any, AsyncIterator, Iterator, Tuple
+from ..aio import AsyncDBInterface
+from ..db_interface import DBInterface, Session
 from ..logger import VerboseLogger
+from ..registry import adapter_info
+
+DEFAULT_DATABASES = 16
+
+# redis-py 7 can change the timeout of an open connection, and no longer
+# wants a command name for get_connection (deprecated since 5.3)
+RETIMEABLE = hasattr(
+    redis.connection.AbstractConnection, "update_current_socket_timeout"
+)
+CONNECTION_ARGS = () if RETIMEABLE else ("PING",)
+
+
+def _server_queries(pipe) -> None:
+    # One round trip: the configured db count plus the default INFO sections,
+    # which already include server version, memory and keyspace
+    pipe.config_get("databases")
+    pipe.info()
+
+
+def _parse_server_queries(results, logger: VerboseLogger) -> Iterator[Tuple[str, Any]]:
+    config, info = results
+    if isinstance(info, Exception):
+        raise info
+    yield "version", info.get("redis_version")
+
+    # INFO only lists databases that hold keys
+    indexes = sorted(
+        int(key[2:]) for key in info if key.startswith("db") and key[2:].isdigit()
+    )
+    if isinstance(config, Exception) or "databases" not in config:
+        # CONFIG is often renamed or denied by ACLs
+        logger.info(f"CONFIG GET databases unavailable, assuming {DEFAULT_DATABASES}")
+        databases = max([DEFAULT_DATABASES] + [i + 1 for i in indexes])
+    else:
+        databases = int(config["databases"])
+    yield "database_count", databases
+    yield "memory", {
+        "used_memory": info.get("used_memory"),
+        "used_memory_human": info.get("used_memory_human"),
+    }
+
+    for i in indexes:
+        keyspace = info[f"db{i}"]
+        yield "databases", f"db{i}"
+        yield "key_stats", {
+            "database": f"db{i}",
+            "key_count": keyspace.get("keys"),
+            "expires": keyspace.get("expires"),
+            "avg_ttl": keyspace.get("avg_ttl"),
+        }
+
+
+def _client(cls, session: Session, socket_timeout, retry=Retry):
+    kwargs = {
+        "socket_connect_timeout": session.deadline.connect_timeout(),
+        "socket_timeout": socket_timeout,
+    }
+    if socket_timeout is not None:
+        # The client retries timed out commands by default, each retry would
+        # get the full timeout again
+        kwargs["retry"] = retry(NoBackoff(), 0)
+    return cls(
+        host=session.host,
+        port=session.port,
+        username=session.user,
+        password=session.password,
+        db=int(session.database or 0),
+        **kwargs,
+    )
+
+
+def _retime(client: redis.Redis, socket_timeout) -> None:
+    """Give the connection PING was verified over the enumeration timeout."""
+    pool = client.connection_pool
+    # For connections the pool opens later, e.g. after this one drops
+    pool.connection_kwargs["socket_timeout"] = socket_timeout
+    if not RETIMEABLE:
+        # Older parsers restore the socket timeout they were created with,
+        # so the connection is reopened instead
+        pool.disconnect()
+        pool.reset()
+        return
+    conn = pool.get_connection()
+    try:
+        conn.socket_timeout = socket_timeout
+        conn.update_current_socket_timeout(socket_timeout)
+    finally:
+        pool.release(conn)
+
+
+async def _retime_async(client: redis.asyncio.Redis, socket_timeout) -> None:
+    # Async connections apply socket_timeout to every read
+    pool = client.connection_pool
+    pool.connection_kwargs["socket_timeout"] = socket_timeout
+    conn = await pool.get_connection(*CONNECTION_ARGS)
+    conn.socket_timeout = socket_timeout
+    await pool.release(conn)
 
 
 class RedisEnum(DBInterface):
     @staticmethod
     def get_info() -> Dict[str, Any]:
-        return {
-            "name": "Redis",
-            "kind": "key-value",
-        }
+        return adapter_info("redis", ["databases", "key_stats"])
 
     @staticmethod
-    def check_connection(
-        host: str,
-        port: int,
-        user: str,
-        password: str,
-        database: str,
-        logger: VerboseLogger,
-    ) -> bool:
-        try:
-            r = redis.Redis(
-                host=host,
-                port=port,
-                username=user,
-                password=password,
-                db=int(database or 0),
-            )
-            r.ping()
-            logger.info(f"Successfully connected to Redis at {host}:{port}")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to connect to Redis: {str(e)}")
-            return False
+    def open_session(session: Session, logger: VerboseLogger) -> None:
+        # PING is bounded by the connect limit and enumeration, over the same
+        # connection, by the time left
+        connect = session.deadline.connect_timeout()
+        session.handle = _client(redis.Redis, session, connect)
+        session.handle.ping()
+        remaining = session.deadline.timeout()
+        if remaining != connect:
+            _retime(session.handle, remaining)
 
     @staticmethod
-    def enumerate(
-        host: str,
-        port: int,
-        user: str,
-        password: str,
-        database: str,
-        logger: VerboseLogger,
-    ) -> Dict[str, Any]:
-        r = redis.Redis(
-            host=host,
-            port=port,
-            username=user,
-            password=password,
-            db=int(database or 0),
-        )
-
-        result = {
-            "type": "Redis",
-            "kind": "key-value",
-            "version": None,
-            "databases": [],
-            "key_stats": [],
-        }
+    def close_session(session: Session) -> None:
+        session.handle.close()
+
+    @staticmethod
+    def stream_session(
+        session: Session, logger: VerboseLogger
+    ) -> Iterator[Tuple[str, Any]]:
+        logger.info("Retrieving server and keyspace information...")
+        session.tracer.phase("server")
+        pipe = session.handle.pipeline(transaction=False)
+        _server_queries(pipe)
+        session.tracer.round_trip()
+        yield from _parse_server_queries(pipe.execute(raise_on_error=False), logger)
+
+        logger.info("Redis enumeration completed successfully")
 
-        logger.info("Retrieving Redis version...")
-        info = r.info()
-        result["version"] = info.get("redis_version")
-
-        logger.info("Retrieving database information...")
-        for i in range(16):  # Redis typically has 16 databases by default
-            r.select(i)
-            db_size = r.dbsize()
-            if db_size > 0:
-                result["databases"].append(f"db{i}")
-                result["key_stats"].append(
-                    {
-                        "database": f"db{i}",
-                        "key_count": db_size,
-                        "memory_used": r.info(section="memory").get(
-                            "used_memory_human"
-                        ),
-                    }
-                )
+
+class RedisAsyncEnum(AsyncDBInterface):
+    get_info = staticmethod(RedisEnum.get_info)
+
+    @staticmethod
+    async def open_session(session: Session, logger: VerboseLogger) -> None:
+        connect = session.deadline.connect_timeout()
+        session.handle = _client(redis.asyncio.Redis, session, connect, AsyncRetry)
+        await session.handle.ping()
+        remaining = session.deadline.timeout()
+        if remaining != connect:
+            await _retime_async(session.handle, remaining)
+
+    @staticmethod
+    async def close_session(session: Session) -> None:
+        await session.handle.aclose()
+
+    @staticmethod
+    async def stream_session(
+        session: Session, logger: VerboseLogger
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        logger.info("Retrieving server and keyspace information...")
+        session.tracer.phase("server")
+        pipe = session.handle.pipeline(transaction=False)
+        _server_queries(pipe)
+        session.tracer.round_trip()
+        results = await pipe.execute(raise_on_error=False)
+        for record in _parse_server_queries(results, logger):
+            yield record
 
         logger.info("Redis enumeration completed successfully")
-        return result
 
 
 check_connection = RedisEnum.check_connection
-enumerate = RedisEnum.enumerate
+enumerate_database = RedisEnum.enumerate
 get_info = RedisEnum.get_info
+connect = RedisEnum.connect
+enumerate_session = RedisEnum.enumerate_session
+stream_session = RedisEnum.stream_session
+close = RedisEnum.close
+async_adapter = RedisAsyncEnum
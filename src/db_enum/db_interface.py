@@ -1,7 +1,59 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Any, Callable, Iterable, Iterator, Optional, Tuple, TypeVar
 
+from .deadline import Deadline, within
+from .filters import apply as apply_filter
 from .logger import VerboseLogger
+from .trace import current as current_tracer
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+@dataclass
+class Session:
+    host: str
+    port: int
+    user: str
+    password: str
+    database: str
+    # Driver connection/client, set by open_session
+    handle: Any = None
+    # Adapter-specific enumeration settings, from --option KEY=VALUE
+    options: Dict[str, Any] = field(default_factory=dict)
+    # Turned into driver timeouts by open_session, unlimited by default
+    deadline: Deadline = field(default_factory=Deadline)
+    # Spans and round trips go here, a no-op unless tracing is enabled
+    tracer: Any = field(default_factory=current_tracer)
+
+
+def map_window(
+    func: Callable[[T], R], items: Iterable[T], concurrency: int
+) -> Iterator[R]:
+    """Like ThreadPoolExecutor.map, with a bounded number of calls queued.
+
+    executor.map submits every item up front and leaving the pool waits for
+    all of them, so at most 2 * concurrency calls are submitted at a time
+    here (the running ones plus finished results waiting to be yielded), and
+    those not started yet are cancelled when the generator is closed.
+    """
+    limit = 2 * concurrency
+    window = deque()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        for item in items:
+            if len(window) == limit:
+                yield window.popleft().result()
+            window.append(executor.submit(func, item))
+        while window:
+            yield window.popleft().result()
+    finally:
+        # Running calls are waited for, they may use connections the caller
+        # closes next
+        executor.shutdown(wait=True, cancel_futures=True)
 
 
 class DBInterface(ABC):
@@ -12,24 +64,127 @@ class DBInterface(ABC):
 
     @staticmethod
     @abstractmethod
+    def open_session(session: Session, logger: VerboseLogger) -> None:
+        """Connect, store the driver handle on session.handle and verify it works.
+
+        Must raise if the server cannot be reached or does not speak this protocol.
+        Connect, socket and query timeouts are taken from session.deadline.
+        """
+        pass
+
+    @staticmethod
+    @abstractmethod
+    def stream_session(
+        session: Session, logger: VerboseLogger
+    ) -> Iterator[Tuple[str, Any]]:
+        """Yield (section, value) records as the server produces them.
+
+        Sections listed in get_info()["sections"] are lists that the value is
+        appended to, any other section (like "version") is a single value.
+        """
+        pass
+
+    @staticmethod
+    @abstractmethod
+    def close_session(session: Session) -> None:
+        pass
+
+    @classmethod
+    def enumerate_session(
+        cls, session: Session, logger: VerboseLogger
+    ) -> Dict[str, Any]:
+        info = cls.get_info()
+        result = {"type": info["name"], "kind": info["kind"], "version": None}
+        for section in info["sections"]:
+            result[section] = []
+        records = apply_filter(
+            session.options, info["sections"], cls.stream_session(session, logger)
+        )
+        with session.tracer.span("enumerate", adapter=info["name"]):
+            for section, value in within(session.deadline, records):
+                if section in info["sections"]:
+                    result[section].append(value)
+                else:
+                    result[section] = value
+        return result
+
+    @classmethod
+    def _open(cls, session: Session, logger: VerboseLogger) -> None:
+        with session.tracer.span(
+            "connect",
+            adapter=cls.get_info()["name"],
+            host=session.host,
+            port=session.port,
+        ):
+            cls.open_session(session, logger)
+
+    @classmethod
+    def connect(
+        cls,
+        host: str,
+        port: int,
+        user: str,
+        password: str,
+        database: str,
+        logger: VerboseLogger,
+        deadline: Optional[Deadline] = None,
+    ) -> Optional[Session]:
+        name = cls.get_info()["name"]
+        session = Session(
+            host, port, user, password, database, deadline=deadline or Deadline()
+        )
+        try:
+            cls._open(session, logger)
+        except Exception as e:
+            logger.error(f"Failed to connect to {name}: {str(e)}")
+            cls.close(session)
+            return None
+        logger.info(f"Successfully connected to {name} at {host}:{port}")
+        return session
+
+    @classmethod
+    def close(cls, session: Session) -> None:
+        if session.handle is None:
+            return
+        try:
+            cls.close_session(session)
+        except Exception:
+            pass
+        session.handle = None
+
+    @classmethod
     def check_connection(
+        cls,
         host: str,
         port: int,
         user: str,
         password: str,
         database: str,
         logger: VerboseLogger,
+        deadline: Optional[Deadline] = None,
     ) -> bool:
-        pass
+        session = cls.connect(host, port, user, password, database, logger, deadline)
+        if session is None:
+            return False
+        cls.close(session)
+        return True
 
-    @staticmethod
-    @abstractmethod
+    @classmethod
     def enumerate(
+        cls,
         host: str,
         port: int,
         user: str,
         password: str,
         database: str,
         logger: VerboseLogger,
+        deadline: Optional[Deadline] = None,
     ) -> Dict[str, Any]:
-        pass
+        session = Session(
+            host, port, user, password, database, deadline=deadline or Deadline()
+        )
+        try:
+            cls._open(session, logger)
+            return cls.enumerate_session(session, logger)
+        finally:
+            cls.close(session)
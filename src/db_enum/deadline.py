@@ -0,0 +1,114 @@
+import contextvars
+import math
+import threading
+import time
+
+from typing import Any, Callable, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class Deadline:
+    """A point in time an operation has to be done by.
+
+    Adapters turn it into their driver's own connect, socket and query
+    timeouts, so nothing relies on signals and a blown deadline surfaces as a
+    driver error in whichever thread or event loop made the call. An optional
+    connect limit bounds just the connection attempt, e.g. a single probe,
+    while the overall deadline keeps applying to enumeration.
+    """
+
+    def __init__(
+        self, seconds: Optional[float] = None, connect_seconds: Optional[float] = None
+    ):
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+        self.connect_seconds = connect_seconds
+
+    def for_connect(self, seconds: Optional[float]) -> "Deadline":
+        """Same deadline, with connection attempts limited to `seconds`."""
+        deadline = Deadline(connect_seconds=seconds)
+        deadline.expires_at = self.expires_at
+        return deadline
+
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def check(self):
+        if self.expired():
+            raise DeadlineExceeded("Deadline exceeded")
+
+    def timeout(self, default: Optional[float] = None) -> Optional[float]:
+        """Seconds left for a driver call, `default` when there is no deadline."""
+        self.check()
+        remaining = self.remaining()
+        return default if remaining is None else remaining
+
+    def connect_timeout(self, default: Optional[float] = None) -> Optional[float]:
+        limits = [t for t in (self.timeout(), self.connect_seconds) if t is not None]
+        return min(limits) if limits else default
+
+    @staticmethod
+    def whole_seconds(seconds: Optional[float]) -> Optional[int]:
+        # For drivers that only take integer seconds, never round down to 0
+        # which most of them read as "no timeout"
+        return None if seconds is None else max(1, math.ceil(seconds))
+
+
+def within(deadline: Deadline, records: Iterable[T]) -> Iterator[T]:
+    """Pass records through, raising DeadlineExceeded once the deadline passes."""
+    for record in records:
+        deadline.check()
+        yield record
+
+
+def run_until(
+    deadline: Deadline,
+    func: Callable[..., Any],
+    *args,
+    abandoned: Optional[Callable[[Any], None]] = None,
+) -> Any:
+    """Run func on a daemon thread and give up on it once the deadline passes.
+
+    Drivers enforce the deadline through their own timeouts, this is only the
+    backstop for a call that ignores them. The abandoned thread does not keep
+    the process alive, and if it still returns a result (e.g. an open session)
+    that result is handed to `abandoned` so it can be released.
+    """
+    outcome = {}
+    lock = threading.Lock()
+
+    def target():
+        try:
+            result = func(*args)
+        except BaseException as e:
+            with lock:
+                outcome["error"] = e
+            return
+        with lock:
+            late = "gave_up" in outcome
+            outcome["result"] = result
+        if late and abandoned is not None:
+            abandoned(result)
+
+    # In the caller's context, so spans opened by func nest under its own
+    thread = threading.Thread(
+        target=contextvars.copy_context().run, args=(target,), daemon=True
+    )
+    thread.start()
+    thread.join(deadline.remaining())
+    with lock:
+        if "result" not in outcome and "error" not in outcome:
+            outcome["gave_up"] = True
+            raise DeadlineExceeded("Deadline exceeded")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
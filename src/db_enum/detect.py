@@ -0,0 +1,181 @@
+import queue
+import threading
+import time
+
+from types import ModuleType
+from typing import Dict, List, Optional, Tuple
+
+from .db_interface import Session
+from .deadline import Deadline
+from .fingerprint import fingerprint
+from .history import PortHistory
+from .logger import VerboseLogger
+from .registry import DB_TYPES, load
+from .trace import current as current_tracer
+
+
+def _probe(
+    db_type: str,
+    module: ModuleType,
+    host: str,
+    port: int,
+    user: str,
+    password: str,
+    database: str,
+    logger: VerboseLogger,
+    deadline: Deadline,
+    results: queue.Queue,
+    finished: threading.Event,
+    lock: threading.Lock,
+):
+    try:
+        with current_tracer().span("probe", adapter=db_type):
+            session = module.connect(
+                host, port, user, password, database, logger, deadline
+            )
+    except Exception as e:
+        logger.error(
+            f"Error connecting to {module.get_info()['name']} at {host}:{port}: {str(e)}"
+        )
+        session = None
+    with lock:
+        if not finished.is_set():
+            results.put((db_type, session))
+            return
+    # Lost the race, nobody is going to use this connection
+    if session is not None:
+        module.close(session)
+
+
+def probe_concurrently(
+    modules: Dict[str, ModuleType],
+    host: str,
+    port: int,
+    user: str,
+    password: str,
+    database: str,
+    logger: VerboseLogger,
+    timeout_seconds: float = 5,
+    deadline: Optional[Deadline] = None,
+) -> Optional[Tuple[str, Session]]:
+    """Race connect() for every module and return the first db type that answers.
+
+    The winner's session is returned open so it can be enumerated directly,
+    sessions opened by the other probes are closed as they come in. Probes run
+    on daemon threads, so any that are still running once a winner is found (or
+    the timeout expires) are abandoned rather than joined. Each probe passes
+    `timeout_seconds` on as its driver's connect timeout, so abandoned probes
+    give up on their own soon after.
+    """
+    deadline = (deadline or Deadline()).for_connect(timeout_seconds)
+    results: queue.Queue = queue.Queue()
+    finished = threading.Event()
+    lock = threading.Lock()
+    for db_type, module in modules.items():
+        threading.Thread(
+            target=_probe,
+            args=(db_type, module, host, port, user, password, database, logger),
+            kwargs={
+                "deadline": deadline,
+                "results": results,
+                "finished": finished,
+                "lock": lock,
+            },
+            name=f"probe-{db_type}",
+            daemon=True,
+        ).start()
+
+    winner = None
+    expires_at = time.monotonic() + deadline.connect_timeout()
+    for _ in modules:
+        remaining = expires_at - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            db_type, session = results.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if session is not None:
+            winner = (db_type, session)
+            break
+
+    with lock:
+        finished.set()
+    while not results.empty():
+        db_type, session = results.get()
+        if session is not None:
+            modules[db_type].close(session)
+
+    if winner is None:
+        logger.error(
+            f"No probe succeeded against {host}:{port} within {timeout_seconds:.3g} seconds"
+        )
+    return winner
+
+
+def candidate_groups(
+    host: str,
+    port: int,
+    logger: VerboseLogger,
+    timeout: float,
+    use_fingerprint: bool = True,
+    history: Optional[PortHistory] = None,
+) -> List[List[str]]:
+    """Split the db types into groups to probe in order, most likely first.
+
+    Fingerprint matches come first, then types seen on this port before or that
+    listen on it by default, then everything else. Each group is ranked by past
+    hit rate so sequential probing also tries the best candidate first.
+    """
+    matches = []
+    if use_fingerprint:
+        with current_tracer().span("fingerprint"):
+            matches = fingerprint(host, port, logger, timeout)
+    history = history or PortHistory(persist=False)
+    others = [db_type for db_type in DB_TYPES if db_type not in matches]
+    likely = [db_type for db_type in others if history.is_likely(port, db_type)]
+    rest = [db_type for db_type in others if db_type not in likely]
+    groups = [history.rank(port, group) for group in (matches, likely, rest)]
+    return [group for group in groups if group]
+
+
+def detect(
+    host: str,
+    port: int,
+    user: str,
+    password: str,
+    database: str,
+    logger: VerboseLogger,
+    timeout_seconds: int = 5,
+    use_fingerprint: bool = True,
+    history: Optional[PortHistory] = None,
+    deadline: Optional[Deadline] = None,
+) -> Optional[Tuple[str, Session]]:
+    """Race each candidate group in turn and return the first open session."""
+    groups = candidate_groups(
+        host, port, logger, min(timeout_seconds, 2), use_fingerprint, history
+    )
+    # One connect window for all groups: a probe that only answers after
+    # --timeout is a timeout, whichever group it is in
+    window_ends = time.monotonic() + timeout_seconds
+    for candidates in groups:
+        remaining = window_ends - time.monotonic()
+        if remaining <= 0:
+            break
+        modules = {db_type: load(db_type) for db_type in candidates}
+        winner = probe_concurrently(
+            modules,
+            host,
+            port,
+            user,
+            password,
+            database,
+            logger,
+            remaining,
+            deadline,
+        )
+        if winner is not None:
+            if history is not None:
+                history.record(port, winner[0])
+            return winner
+    return None
@@ -0,0 +1,219 @@
+import gzip
+import json
+import sys
+
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, BinaryIO, Dict, Optional
+from uuid import UUID
+
+try:
+    import orjson
+except ImportError:  # optional, much faster JSON encoding when installed
+    orjson = None
+
+
+def custom_json_serializer(obj: Any) -> Any:
+    """Driver types the encoders do not know, as plain values."""
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        if not obj.is_finite():
+            return str(obj)
+        # Sizes and counts come back as DECIMAL from SUM() in some servers
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    if isinstance(obj, timedelta):
+        return obj.total_seconds()
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return bytes(obj).hex()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, UUID):
+        return str(obj)
+    return str(obj)
+
+
+def _json(obj: Any, indent: bool) -> bytes:
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        try:
+            return orjson.dumps(obj, default=custom_json_serializer, option=option)
+        except orjson.JSONEncodeError:
+            # Integers past 64 bits and the like, which json handles
+            pass
+    text = json.dumps(
+        obj,
+        indent=2 if indent else None,
+        separators=None if indent else (",", ":"),
+        default=custom_json_serializer,
+        # orjson writes UTF-8, the output must not depend on which is installed
+        ensure_ascii=False,
+    )
+    return text.encode()
+
+
+def columnar(obj: Any) -> Any:
+    """Every list of records as {"columns": [...], "rows": [[...], ...]}.
+
+    Field names are written once per list instead of once per record, which
+    is most of the size of a large table inventory.
+    """
+    if isinstance(obj, dict):
+        return {key: columnar(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        if obj and all(isinstance(value, dict) for value in obj):
+            columns = list(dict.fromkeys(key for value in obj for key in value))
+            return {
+                "columns": columns,
+                "rows": [[value.get(key) for key in columns] for value in obj],
+            }
+        return [columnar(value) for value in obj]
+    return obj
+
+
+class Encoder:
+    """One --output format.
+
+    `document` encodes a whole result, `record` one self-delimiting entry of
+    a stream (ndjson records, batch results). Streaming encoders get records
+    as the adapter yields them instead of one document at the end.
+    """
+
+    streaming = False
+
+    def document(self, obj: Any) -> bytes:
+        return _json(obj, indent=True) + b"\n"
+
+    def record(self, obj: Any) -> bytes:
+        return _json(obj, indent=False) + b"\n"
+
+
+class CompactEncoder(Encoder):
+    def document(self, obj: Any) -> bytes:
+        return self.record(obj)
+
+
+class NDJSONEncoder(CompactEncoder):
+    streaming = True
+
+
+class ColumnarEncoder(Encoder):
+    def document(self, obj: Any) -> bytes:
+        return self.record(obj)
+
+    def record(self, obj: Any) -> bytes:
+        return _json(columnar(obj), indent=False) + b"\n"
+
+
+class MessagePackEncoder(Encoder):
+    def __init__(self):
+        try:
+            import msgpack
+        except ImportError:
+            raise RuntimeError(
+                "MessagePack output needs the msgpack package (pip install 'db-enum[msgpack]')"
+            )
+        self.packer = msgpack.Packer(default=custom_json_serializer)
+
+    def document(self, obj: Any) -> bytes:
+        return self.packer.pack(obj)
+
+    def record(self, obj: Any) -> bytes:
+        # Consecutive objects, read back with msgpack.Unpacker
+        return self.packer.pack(obj)
+
+
+ENCODERS: Dict[str, type] = {
+    "json": Encoder,
+    "ndjson": NDJSONEncoder,
+    "compact": CompactEncoder,
+    "columnar": ColumnarEncoder,
+    "msgpack": MessagePackEncoder,
+}
+
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".zst": "zstd", ".zstd": "zstd"}
+
+
+def compression_for(path: str) -> Optional[str]:
+    for suffix, compression in COMPRESSION_SUFFIXES.items():
+        if path.endswith(suffix):
+            return compression
+    return None
+
+
+def _zstd_module():
+    try:
+        from compression import zstd  # Python 3.14+
+
+        return zstd
+    except ImportError:
+        pass
+    try:
+        import zstandard
+
+        return zstandard
+    except ImportError:
+        raise RuntimeError(
+            "zstd compression needs the zstandard package (pip install 'db-enum[zstd]')"
+        )
+
+
+def _open_zstd(path: str) -> BinaryIO:
+    zstd = _zstd_module()
+    if zstd.__name__ == "zstandard":
+        return zstd.ZstdCompressor().stream_writer(open(path, "wb"), closefd=True)
+    return zstd.open(path, "wb")
+
+
+class Output:
+    """Where results go: an encoder writing to stdout or a (compressed) file.
+
+    Output to a file is compressed on the fly with `compression` ("gzip" or
+    "zstd"), so a large inventory is never held in memory compressed or
+    uncompressed. The file is only created on the first write. Stdout is
+    flushed after every record for live streaming, a file only when closed.
+    """
+
+    def __init__(
+        self,
+        format: str = "json",
+        path: Optional[str] = None,
+        compression: Optional[str] = None,
+    ):
+        self.encoder = ENCODERS[format]()
+        self.path = path
+        self.compression = compression
+        self.stream: Optional[BinaryIO] = None
+        if compression == "zstd":
+            # Fail before enumerating, not at the first write
+            _zstd_module()
+
+    @property
+    def streaming(self) -> bool:
+        return self.encoder.streaming
+
+    def _open(self) -> BinaryIO:
+        if self.path is None:
+            return sys.stdout.buffer
+        if self.compression == "gzip":
+            return gzip.open(self.path, "wb")
+        if self.compression == "zstd":
+            return _open_zstd(self.path)
+        return open(self.path, "wb")
+
+    def _write(self, data: bytes):
+        if self.stream is None:
+            self.stream = self._open()
+        self.stream.write(data)
+        if self.path is None:
+            self.stream.flush()
+
+    def document(self, obj: Any):
+        self._write(self.encoder.document(obj))
+
+    def record(self, obj: Any):
+        self._write(self.encoder.record(obj))
+
+    def close(self):
+        if self.stream is not None and self.path is not None:
+            self.stream.close()
@@ -0,0 +1,252 @@
+import fnmatch
+import heapq
+import itertools
+import numbers
+import re
+
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Record fields compared against --min-size and used to rank --top, in order
+# of preference. Backends that report no byte sizes are ranked by a count
+SIZE_FIELDS = ("size_bytes", "disk_size", "estimated_size_bytes")
+COUNT_FIELDS = (
+    "document_count",
+    "doc_count",
+    "node_count",
+    "relationship_count",
+    "key_count",
+    "series_cardinality",
+)
+
+# The field --include/--exclude patterns are matched against: the schema (or
+# keyspace, or database) holding the object, the object's own name for
+# top-level objects like Elasticsearch indices
+NAMESPACE_FIELDS = ("schema", "keyspace", "database", "name")
+
+SIZE_UNITS = {"": 1, "K": 2**10, "M": 2**20, "G": 2**30, "T": 2**40}
+
+
+def parse_size(value: Any) -> int:
+    """Bytes from a size like 1048576, 512K, 10M or 2GiB (binary units)."""
+    if isinstance(value, int):
+        return value
+    match = re.fullmatch(r"\s*(\d+)\s*([KMGT]?)(?:I?B)?\s*", str(value).upper())
+    if match is None:
+        raise ValueError(f"invalid size {value!r}, expected e.g. 500M or 10G")
+    return int(match.group(1)) * SIZE_UNITS[match.group(2)]
+
+
+def _patterns(value: Any) -> List[str]:
+    # A list from the command line, or a comma-separated string from -o
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [p for p in value.split(",") if p]
+    return list(value)
+
+
+def _like(pattern: str, brackets: bool = False) -> str:
+    # SQL Server's LIKE also reads [...] as a character class
+    special = r"([%_\\\[])" if brackets else r"([%_\\])"
+    escaped = re.sub(special, r"\\\1", pattern)
+    return escaped.replace("*", "%").replace("?", "_")
+
+
+@dataclass
+class Filter:
+    """--top, --min-size and --include/--exclude, read from session options.
+
+    Adapters push as much of it into their catalog queries as the backend
+    allows; whatever they return is filtered again by `apply`, so a partial
+    (or no) pushdown still gives the same result.
+    """
+
+    top: Optional[int] = None
+    min_size: Optional[int] = None
+    include: List[str] = field(default_factory=list)
+    exclude: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_options(cls, options: Dict[str, Any]) -> "Filter":
+        top = options.get("top")
+        min_size = options.get("min_size")
+        return cls(
+            top=int(top) if top is not None else None,
+            min_size=parse_size(min_size) if min_size is not None else None,
+            include=_patterns(options.get("include")),
+            exclude=_patterns(options.get("exclude")),
+        )
+
+    @property
+    def active(self) -> bool:
+        return bool(
+            self.top is not None
+            or self.min_size is not None
+            or self.include
+            or self.exclude
+        )
+
+    @property
+    def globs_only(self) -> bool:
+        """True if every pattern only uses `*`, the one wildcard most servers know."""
+        return not any(
+            "?" in p or "[" in p for p in itertools.chain(self.include, self.exclude)
+        )
+
+    def allows(self, name: Any) -> bool:
+        name = "" if name is None else str(name)
+        if self.include and not any(fnmatch.fnmatchcase(name, p) for p in self.include):
+            return False
+        return not any(fnmatch.fnmatchcase(name, p) for p in self.exclude)
+
+    def sql_pushdown(self, case_insensitive: bool = False) -> "Filter":
+        """The part of the filter a catalog query can apply with LIKE.
+
+        Character classes have no LIKE equivalent, so patterns that are not
+        `*` globs are left to `apply`, and with them --top: a LIMIT taken
+        before the patterns are applied would return too few objects.
+
+        Where LIKE ignores case (the default collations of MySQL and SQL
+        Server) it matches more names than `allows`. Include patterns are
+        still pushed, `apply` drops the extra rows, but NOT LIKE would drop
+        rows `apply` keeps, and the extra rows could fill the LIMIT, so
+        exclude patterns and --top are left to `apply` too.
+        """
+        if not self.globs_only:
+            return Filter(min_size=self.min_size)
+        if case_insensitive and (self.include or self.exclude):
+            return Filter(min_size=self.min_size, include=self.include)
+        return self
+
+    def sql_conditions(
+        self, name_column: str, size_column: str, escape: bool = False
+    ) -> Tuple[List[str], List[Any]]:
+        """WHERE conditions for a catalog query and their %s parameters.
+
+        Patterns become LIKE with backslash escapes, the default escape
+        character in MySQL and Postgres; `escape` spells it out for servers
+        without one (SQL Server) and escapes `[` as well.
+        """
+        suffix = " ESCAPE '\\'" if escape else ""
+        conditions, params = [], []
+        if self.include:
+            conditions.append(
+                "("
+                + " OR ".join(f"{name_column} LIKE %s{suffix}" for _ in self.include)
+                + ")"
+            )
+            params += [_like(p, escape) for p in self.include]
+        for pattern in self.exclude:
+            conditions.append(f"{name_column} NOT LIKE %s{suffix}")
+            params.append(_like(pattern, escape))
+        if self.min_size is not None:
+            conditions.append(f"{size_column} >= %s")
+            params.append(self.min_size)
+        return conditions, params
+
+
+def _namespace(value: Dict[str, Any]) -> Any:
+    for key in NAMESPACE_FIELDS:
+        if key in value:
+            return value[key]
+    return None
+
+
+def _rank(value: Dict[str, Any]) -> Tuple[Optional[str], int]:
+    """The size (or count) field of a record and its value, None if it has none."""
+    for key in SIZE_FIELDS + COUNT_FIELDS:
+        if key in value:
+            size = value[key]
+            if isinstance(size, numbers.Number) and not isinstance(size, bool):
+                return key, size
+            # Unknown, e.g. a closed index, ranks below everything
+            return key, -1
+    return None, -1
+
+
+class _Selection:
+    """Applies a Filter record by record.
+
+    Records without a size or count pass straight through, only patterns
+    apply to them. With --top the others are held in one bounded min-heap
+    per section, so memory stays at N records per section however large the
+    catalog, and are released in descending order once the stream ends.
+    """
+
+    def __init__(self, spec: Filter, sections: Iterable[str]):
+        self.filter = spec
+        self.sections = set(sections)
+        self.heaps: Dict[str, List[Tuple[int, int, Any]]] = {}
+        self.order = itertools.count()
+
+    def offer(self, section: str, value: Any) -> bool:
+        """True if the record is to be emitted now, False if dropped or held."""
+        if section not in self.sections or not isinstance(value, dict):
+            return True
+        if not self.filter.allows(_namespace(value)):
+            return False
+        key, size = _rank(value)
+        if key is None:
+            return True
+        # Counts are no sizes, --min-size leaves those records alone
+        if (
+            self.filter.min_size is not None
+            and key in SIZE_FIELDS
+            and size < self.filter.min_size
+        ):
+            return False
+        if self.filter.top is None:
+            return True
+        heap = self.heaps.setdefault(section, [])
+        # Ties keep the record seen first
+        entry = (size, -next(self.order), value)
+        if len(heap) < self.filter.top:
+            heapq.heappush(heap, entry)
+        elif heap and entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+        return False
+
+    def drain(self) -> Iterator[Tuple[str, Any]]:
+        for section, heap in self.heaps.items():
+            for _, _, value in sorted(heap, key=lambda e: e[:2], reverse=True):
+                yield section, value
+
+
+def apply(
+    options: Dict[str, Any],
+    sections: Iterable[str],
+    records: Iterable[Tuple[str, Any]],
+) -> Iterable[Tuple[str, Any]]:
+    """Filter an adapter's record stream by the options' Filter, if any."""
+    spec = Filter.from_options(options)
+    if not spec.active:
+        return records
+    return _apply(_Selection(spec, sections), records)
+
+
+def _apply(
+    selection: _Selection, records: Iterable[Tuple[str, Any]]
+) -> Iterator[Tuple[str, Any]]:
+    for section, value in records:
+        if selection.offer(section, value):
+            yield section, value
+    yield from selection.drain()
+
+
+async def apply_async(
+    options: Dict[str, Any],
+    sections: Iterable[str],
+    records: AsyncIterator[Tuple[str, Any]],
+) -> AsyncIterator[Tuple[str, Any]]:
+    spec = Filter.from_options(options)
+    if not spec.active:
+        async for record in records:
+            yield record
+        return
+    selection = _Selection(spec, sections)
+    async for section, value in records:
+        if selection.offer(section, value):
+            yield section, value
+    for record in selection.drain():
+        yield record
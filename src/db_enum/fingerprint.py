@@ -0,0 +1,166 @@
+import os
+import socket
+import struct
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional
+
+from .logger import VerboseLogger
+from .registry import ADAPTERS
+
+
+def _exchange(host: str, port: int, payload: Optional[bytes], timeout: float) -> bytes:
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        if payload:
+            sock.sendall(payload)
+        try:
+            return sock.recv(4096)
+        except socket.timeout:
+            return b""
+
+
+def _probe_banner(host: str, port: int, timeout: float) -> List[str]:
+    # MySQL/MariaDB speak first: a handshake v10 packet, or an error packet when
+    # the client host is not allowed to connect.
+    data = _exchange(host, port, None, timeout)
+    if len(data) >= 5 and data[3] == 0 and data[4] in (0x0A, 0xFF):
+        return ["mysql"]
+    return []
+
+
+def _probe_postgres(host: str, port: int, timeout: float) -> List[str]:
+    data = _exchange(host, port, struct.pack("!II", 8, 80877103), timeout)
+    if data in (b"S", b"N"):
+        return ["postgres"]
+    return []
+
+
+def _probe_redis(host: str, port: int, timeout: float) -> List[str]:
+    data = _exchange(host, port, b"*1\r\n$4\r\nPING\r\n", timeout)
+    if data[:1] in (b"+", b"-") and data.endswith(b"\r\n"):
+        return ["redis"]
+    return []
+
+
+def _probe_mssql(host: str, port: int, timeout: float) -> List[str]:
+    # TDS PRELOGIN with VERSION and ENCRYPTION options, the server answers with
+    # a tabular result (0x04) packet.
+    options = struct.pack("!BHH", 0x00, 11, 6) + struct.pack("!BHH", 0x01, 17, 1)
+    payload = options + b"\xff" + b"\x00" * 6 + b"\x02"
+    header = struct.pack("!BBHHBB", 0x12, 0x01, 8 + len(payload), 0, 1, 0)
+    data = _exchange(host, port, header + payload, timeout)
+    if len(data) >= 8 and data[0] == 0x04 and data[1] == 0x01:
+        return ["mssql"]
+    return []
+
+
+def _probe_mongodb(host: str, port: int, timeout: float) -> List[str]:
+    body = (
+        b"\x10hello\x00"
+        + struct.pack("<i", 1)
+        + b"\x02$db\x00"
+        + struct.pack("<i", 6)
+        + b"admin\x00"
+    )
+    document = struct.pack("<i", len(body) + 5) + body + b"\x00"
+    request_id = int.from_bytes(os.urandom(3), "little")
+    message = struct.pack("<I", 0) + b"\x00" + document
+    header = struct.pack("<iiii", 16 + len(message), request_id, 0, 2013)
+    data = _exchange(host, port, header + message, timeout)
+    if len(data) >= 16:
+        _, _, response_to, opcode = struct.unpack("<iiii", data[:16])
+        if response_to == request_id and opcode in (1, 2013):
+            return ["mongodb"]
+    return []
+
+
+def _probe_cassandra(host: str, port: int, timeout: float) -> List[str]:
+    # Native protocol v4 OPTIONS frame. Servers that do not speak v4 still
+    # reply with an ERROR frame carrying their own version in the header.
+    data = _exchange(host, port, struct.pack("!BBhBi", 0x04, 0, 0, 0x05, 0), timeout)
+    if len(data) >= 9 and 0x81 <= data[0] <= 0x86 and data[4] in (0x00, 0x06):
+        return ["cassandra"]
+    return []
+
+
+def _probe_bolt(host: str, port: int, timeout: float) -> List[str]:
+    handshake = (
+        b"\x60\x60\xb0\x17"
+        + b"\x00\x04\x04\x05"
+        + b"\x00\x00\x04\x04"
+        + b"\x00\x00\x00\x03"
+        + b"\x00\x00\x00\x00"
+    )
+    data = _exchange(host, port, handshake, timeout)
+    if len(data) == 4:
+        return ["neo4j"]
+    return []
+
+
+def _probe_http(host: str, port: int, timeout: float) -> List[str]:
+    request = f"GET / HTTP/1.0\r\nHost: {host}\r\nUser-Agent: db-enum\r\n\r\n"
+    data = _exchange(host, port, request.encode(), timeout)
+    if not data.startswith(b"HTTP/"):
+        return []
+    head, _, body = data.partition(b"\r\n\r\n")
+    headers = head.lower()
+    matches = []
+    if b"x-influxdb-version" in headers:
+        matches.append("influxdb")
+    if b"server: couchdb" in headers or b'"couchdb"' in body:
+        matches.append("couchdb")
+    if (
+        b"x-elastic-product" in headers
+        or b"You Know, for Search" in body
+        or b'realm="security"' in headers
+    ):
+        matches.append("elasticsearch")
+    return matches
+
+
+PROBES = {
+    "banner": _probe_banner,
+    "postgres": _probe_postgres,
+    "redis": _probe_redis,
+    "tds": _probe_mssql,
+    "mongodb": _probe_mongodb,
+    "cassandra": _probe_cassandra,
+    "bolt": _probe_bolt,
+    "http": _probe_http,
+}
+
+
+def fingerprint(
+    host: str, port: int, logger: VerboseLogger, timeout: float = 2.0
+) -> List[str]:
+    """Guess the database type from one raw protocol exchange per probe.
+
+    Every probe opens its own plain socket and all of them run in parallel, so
+    this costs roughly one round trip: the first probe to recognize the server
+    wins and the rest are left to time out on their own. Returns the matching
+    db types, which is usually a single entry and empty when nothing matched.
+    """
+
+    def run(probe):
+        try:
+            return probe(host, port, timeout)
+        except OSError as e:
+            logger.info(f"Fingerprint {probe.__name__} failed: {str(e)}")
+            return []
+
+    probes = {PROBES[a.probe] for a in ADAPTERS.values() if a.probe in PROBES}
+    executor = ThreadPoolExecutor(max_workers=len(probes))
+    matches: List[str] = []
+    try:
+        for future in as_completed([executor.submit(run, p) for p in probes]):
+            matches = future.result()
+            if matches:
+                break
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if matches:
+        logger.info(f"Fingerprinted {host}:{port} as {', '.join(matches)}")
+    else:
+        logger.info(f"Could not fingerprint {host}:{port}")
+    return matches
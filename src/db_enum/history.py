@@ -0,0 +1,69 @@
+import json
+import os
+import threading
+
+from typing import Dict, List, Optional
+
+from .registry import ADAPTERS
+
+
+def cache_dir() -> str:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "db-enum")
+
+
+class PortHistory:
+    """Persisted count of which db types were detected on which ports."""
+
+    def __init__(self, path: Optional[str] = None, persist: bool = True):
+        self.path = path or os.path.join(cache_dir(), "port_history.json")
+        self.persist = persist
+        self.lock = threading.Lock()
+        self.hits: Dict[str, Dict[str, int]] = self._load() if persist else {}
+
+    def _load(self) -> Dict[str, Dict[str, int]]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.hits, f)
+        os.replace(tmp_path, self.path)
+
+    def record(self, port: int, db_type: str):
+        with self.lock:
+            port_hits = self.hits.setdefault(str(port), {})
+            port_hits[db_type] = port_hits.get(db_type, 0) + 1
+            if not self.persist:
+                return
+            try:
+                self._save()
+            except OSError:
+                pass
+
+    def hit_rate(self, port: int, db_type: str) -> float:
+        port_hits = self.hits.get(str(port), {})
+        total = sum(port_hits.values())
+        return port_hits.get(db_type, 0) / total if total else 0.0
+
+    def is_likely(self, port: int, db_type: str) -> bool:
+        return (
+            self.hit_rate(port, db_type) > 0 or port in ADAPTERS[db_type].default_ports
+        )
+
+    def rank(self, port: int, db_types: List[str]) -> List[str]:
+        """Order db types by past hit rate on this port, then by default port."""
+        return sorted(
+            db_types,
+            key=lambda db_type: (
+                -self.hit_rate(port, db_type),
+                port not in ADAPTERS[db_type].default_ports,
+            ),
+        )
@@ -0,0 +1,43 @@
+import importlib
+
+from dataclasses import dataclass
+from types import ModuleType
+from typing import Any, Dict, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Adapter:
+    """Static description of an adapter, available without importing its driver."""
+
+    name: str
+    kind: str
+    default_ports: Tuple[int, ...]
+    # Name of the raw-socket probe in fingerprint.PROBES that recognizes it
+    probe: Optional[str] = None
+
+
+ADAPTERS: Dict[str, Adapter] = {
+    "cassandra": Adapter("Cassandra", "wide-column", (9042,), probe="cassandra"),
+    "couchdb": Adapter("CouchDB", "document", (5984, 6984), probe="http"),
+    "elasticsearch": Adapter("Elasticsearch", "document", (9200,), probe="http"),
+    "influxdb": Adapter("InfluxDB", "time-series", (8086,), probe="http"),
+    "mongodb": Adapter("MongoDB", "document", (27017, 27018, 27019), probe="mongodb"),
+    "mssql": Adapter("Microsoft SQL Server", "sql", (1433,), probe="tds"),
+    "mysql": Adapter("MySQL", "sql", (3306,), probe="banner"),
+    "neo4j": Adapter("Neo4j", "graph", (7687,), probe="bolt"),
+    "postgres": Adapter("PostgreSQL", "sql", (5432,), probe="postgres"),
+    "redis": Adapter("Redis", "key-value", (6379,), probe="redis"),
+}
+
+DB_TYPES = list(ADAPTERS)
+
+
+def adapter_info(db_type: str, sections: List[str]) -> Dict[str, Any]:
+    """get_info() of an adapter: its registry entry plus the list-valued sections."""
+    adapter = ADAPTERS[db_type]
+    return {"name": adapter.name, "kind": adapter.kind, "sections": sections}
+
+
+def load(db_type: str) -> ModuleType:
+    """Import an adapter module, and with it its database driver."""
+    return importlib.import_module(f"db_enum.db.{db_type}")
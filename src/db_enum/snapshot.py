@@ -0,0 +1,228 @@
+import hashlib
+import json
+import numbers
+import os
+import struct
+import time
+
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from .encoders import custom_json_serializer
+from .history import cache_dir
+
+# Fields that identify an entry within its section, in the order they appear
+KEY_FIELDS = ("database", "keyspace", "schema", "name")
+
+# Options that change which records an enumeration returns; a snapshot taken
+# with other values is no baseline
+SCOPE_OPTIONS = ("top", "min_size", "include", "exclude")
+
+
+def record_key(section: str, value: Any) -> Tuple:
+    if isinstance(value, dict):
+        ident = [value.get(field) for field in KEY_FIELDS if field in value]
+    else:
+        ident = [value]
+    return (section, *(v if isinstance(v, (str, int)) else str(v) for v in ident))
+
+
+def encode_record(section: str, value: Any) -> str:
+    record = {"section": section, "data": value}
+    return json.dumps(record, default=custom_json_serializer) + "\n"
+
+
+_DIGEST_SIZE = 16
+_OFFSET = struct.Struct("<Q")
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=_DIGEST_SIZE).digest()
+
+
+def _key_digest(key: Tuple) -> bytes:
+    return _digest(repr(key).encode())
+
+
+def _line_digest(line: bytes) -> bytes:
+    return _digest(line.rstrip(b"\r\n"))
+
+
+def _metrics(value: Any) -> Dict[str, float]:
+    if not isinstance(value, dict):
+        return {}
+    return {
+        k: v
+        for k, v in value.items()
+        if isinstance(v, numbers.Number) and not isinstance(v, bool)
+    }
+
+
+def deltas(before: Any, after: Any, threshold: float) -> Dict[str, Dict[str, Any]]:
+    """Numeric fields that changed, or nothing if none moved by `threshold`.
+
+    `threshold` is relative (0.1 is 10%); a field going from zero or missing
+    to a value always counts as significant.
+    """
+    old, new = _metrics(before), _metrics(after)
+    changed = {}
+    significant = False
+    for field in old.keys() | new.keys():
+        a, b = old.get(field), new.get(field)
+        if a == b:
+            continue
+        delta = b - a if a is not None and b is not None else None
+        changed[field] = {"before": a, "after": b, "delta": delta}
+        if not a or delta is None or abs(delta) / abs(a) >= threshold:
+            significant = True
+    return changed if significant else {}
+
+
+class SnapshotIndex:
+    """Digests of a previous snapshot's records, by record key.
+
+    Only a hash of each record's key and line and the line's offset in the
+    file are kept, a fixed few dozen bytes per entry however large the
+    records. Lines are read back from the file for records that changed or
+    were removed.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        # Key digest to line digest followed by the line's offset
+        self.entries: Dict[bytes, bytes] = {}
+        self.file: Optional[BinaryIO] = None
+
+    def load(self) -> Optional[float]:
+        """Index the snapshot file, returning when it was taken."""
+        with open(self.path, "rb") as f:
+            header = f.readline()
+            offset = len(header)
+            for line in f:
+                record = json.loads(line)
+                key = record_key(record["section"], record["data"])
+                entry = _line_digest(line) + _OFFSET.pack(offset)
+                self.entries[_key_digest(key)] = entry
+                offset += len(line)
+        return json.loads(header).get("taken_at")
+
+    def pop(self, key: Tuple) -> Optional[Tuple[bytes, int]]:
+        """The line digest and offset of a record, removed from the index."""
+        entry = self.entries.pop(_key_digest(key), None)
+        if entry is None:
+            return None
+        return entry[:_DIGEST_SIZE], _OFFSET.unpack(entry[_DIGEST_SIZE:])[0]
+
+    def read(self, offset: int) -> Dict[str, Any]:
+        if self.file is None:
+            self.file = open(self.path, "rb")
+        self.file.seek(offset)
+        return json.loads(self.file.readline())
+
+    def remaining(self) -> Iterator[Dict[str, Any]]:
+        """Records never popped, in file order."""
+        offsets = sorted(
+            _OFFSET.unpack(e[_DIGEST_SIZE:])[0] for e in self.entries.values()
+        )
+        for offset in offsets:
+            yield self.read(offset)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class SnapshotStore:
+    """Latest enumeration per target, one NDJSON record per line.
+
+    Snapshots are named after the same host/port/credentials hash as the
+    result cache plus the db type and a hash of the scope options.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(cache_dir(), "snapshots")
+
+    @staticmethod
+    def key(db_type: str, target: str, options: Dict[str, Any]) -> str:
+        scope = {name: options[name] for name in SCOPE_OPTIONS if name in options}
+        if not scope:
+            return f"{db_type}-{target}"
+        encoded = json.dumps(scope, sort_keys=True, default=list).encode()
+        return f"{db_type}-{target}-{hashlib.sha256(encoded).hexdigest()[:16]}"
+
+    def _snapshot_path(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.ndjson")
+
+    def load_index(self, key: str) -> Tuple[Optional[float], SnapshotIndex]:
+        index = SnapshotIndex(self._snapshot_path(key))
+        try:
+            taken_at = index.load()
+        except (OSError, ValueError, KeyError):
+            return None, SnapshotIndex()
+        return taken_at, index
+
+    def writer(self, key: str):
+        return _SnapshotWriter(self._snapshot_path(key))
+
+
+class _SnapshotWriter:
+    """Writes a snapshot to a temporary file and only replaces the previous one
+    once the enumeration finished."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.file = None
+
+    def __enter__(self) -> Callable[[str], None]:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.file = open(self.tmp_path, "w")
+        self.file.write(json.dumps({"taken_at": time.time()}) + "\n")
+        return self.file.write
+
+    def __exit__(self, exc_type, exc, tb):
+        self.file.close()
+        if exc_type is None:
+            os.replace(self.tmp_path, self.path)
+        else:
+            os.remove(self.tmp_path)
+
+
+def diff(
+    records: Iterable[Tuple[str, Any]],
+    previous: SnapshotIndex,
+    threshold: float,
+    save: Callable[[str], None],
+) -> Iterator[Dict[str, Any]]:
+    """Compare streamed records against a previous snapshot index.
+
+    Each record is looked up (and dropped) by key, so the whole diff is one
+    pass over the current records plus one over what is left of `previous`,
+    which are the removed entries. Every record is also encoded and passed to
+    `save`; an unchanged record encodes to the same line, so only records
+    whose digest differs get read back and compared field by field.
+    """
+    for section, value in records:
+        line = encode_record(section, value)
+        save(line)
+        entry = previous.pop(record_key(section, value))
+        if entry is None:
+            yield {"change": "added", "section": section, "data": value}
+            continue
+        digest, offset = entry
+        if digest == _line_digest(line.encode()):
+            continue
+        changed = deltas(previous.read(offset)["data"], value, threshold)
+        if changed:
+            yield {
+                "change": "changed",
+                "section": section,
+                "data": value,
+                "deltas": changed,
+            }
+    for record in previous.remaining():
+        yield {
+            "change": "removed",
+            "section": record["section"],
+            "data": record["data"],
+        }
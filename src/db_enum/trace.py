@@ -0,0 +1,254 @@
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+
+from typing import Any, Dict, List, Optional
+
+
+class Span:
+    """One timed operation, with the number of server round trips it made."""
+
+    __slots__ = (
+        "tracer",
+        "name",
+        "attrs",
+        "parent",
+        "is_phase",
+        "span_id",
+        "thread",
+        "start_ns",
+        "end_ns",
+        "round_trips",
+    )
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.parent: Optional[Span] = None
+        self.is_phase = False
+        self.span_id = 0
+        self.thread = 0
+        self.start_ns = 0
+        self.end_ns: Optional[int] = None
+        self.round_trips = 0
+
+    def start(self, parent: Optional["Span"]):
+        self.parent = parent
+        self.span_id = next(self.tracer._ids)
+        self.thread = threading.get_ident()
+        self.start_ns = time.perf_counter_ns()
+        _current.set(self)
+
+    def __enter__(self) -> "Span":
+        self.start(_current.get())
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Phases started inside this span end with it
+        node = _current.get()
+        while node is not None and node is not self:
+            if node.is_phase:
+                self.tracer._finish(node)
+            node = node.parent
+        _current.set(self.parent)
+        self.tracer._finish(self)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or self.start_ns) - self.start_ns) / 1e6
+
+
+# The innermost open span of the running thread or asyncio task
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "db_enum_span", default=None
+)
+
+
+class Tracer:
+    """Collects spans for a trace file and the --timings summary.
+
+    `span()` times a block, `phase()` marks the start of the next step of an
+    enumeration (it runs until the following phase or the end of the
+    enclosing span, so generators can mark phases without nesting blocks
+    around their yields) and `round_trip()` counts a request against the
+    innermost open span.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self.trace_id = os.urandom(16).hex()
+        # perf_counter for durations, anchored to the wall clock for export
+        self.origin_ns = time.time_ns() - time.perf_counter_ns()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **attrs) -> Span:
+        return Span(self, name, attrs)
+
+    def phase(self, name: str, **attrs):
+        current = _current.get()
+        if current is not None and current.is_phase:
+            self._finish(current)
+            current = current.parent
+        span = Span(self, name, attrs)
+        span.is_phase = True
+        span.start(current)
+
+    def round_trip(self, count: int = 1):
+        current = _current.get()
+        if current is not None:
+            current.round_trips += count
+
+    def _finish(self, span: Span):
+        if span.end_ns is not None:
+            return
+        span.end_ns = time.perf_counter_ns()
+        with self._lock:
+            self.spans.append(span)
+
+    def _finished(self) -> List[Span]:
+        with self._lock:
+            return sorted(self.spans, key=lambda span: span.start_ns)
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Trace Event Format, for chrome://tracing or Perfetto."""
+        pid = os.getpid()
+        threads: Dict[int, int] = {}
+        events = []
+        for span in self._finished():
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": "phase" if span.is_phase else "span",
+                    "ph": "X",
+                    "ts": (self.origin_ns + span.start_ns) / 1000,
+                    "dur": (span.end_ns - span.start_ns) / 1000,
+                    "pid": pid,
+                    "tid": threads.setdefault(span.thread, len(threads) + 1),
+                    "args": {**span.attrs, "round_trips": span.round_trips},
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def otlp_trace(self) -> Dict[str, Any]:
+        """OTLP/JSON export request, as accepted by an OpenTelemetry collector."""
+        spans = []
+        for span in self._finished():
+            attrs = {**span.attrs, "db_enum.round_trips": span.round_trips}
+            record = {
+                "traceId": self.trace_id,
+                "spanId": f"{span.span_id:016x}",
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(self.origin_ns + span.start_ns),
+                "endTimeUnixNano": str(self.origin_ns + span.end_ns),
+                "attributes": [
+                    {"key": key, "value": _otlp_value(value)}
+                    for key, value in attrs.items()
+                ],
+            }
+            if span.parent is not None:
+                record["parentSpanId"] = f"{span.parent.span_id:016x}"
+            spans.append(record)
+        service = {"key": "service.name", "value": {"stringValue": "db-enum"}}
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [service]},
+                    "scopeSpans": [{"scope": {"name": "db_enum"}, "spans": spans}],
+                }
+            ]
+        }
+
+    def write(self, path: str, format: str = "chrome"):
+        trace = self.otlp_trace() if format == "otlp" else self.chrome_trace()
+        with open(path, "w") as f:
+            json.dump(trace, f, default=str)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Spans aggregated by name (and adapter), in order of first appearance."""
+        rows: Dict[str, Dict[str, Any]] = {}
+        for span in self._finished():
+            label = span.name
+            if "adapter" in span.attrs:
+                label = f"{label} {span.attrs['adapter']}"
+            row = rows.setdefault(
+                label,
+                {
+                    "name": label,
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "round_trips": 0,
+                },
+            )
+            row["count"] += 1
+            row["total_ms"] += span.duration_ms
+            row["max_ms"] = max(row["max_ms"], span.duration_ms)
+            row["round_trips"] += span.round_trips
+        return list(rows.values())
+
+    def format_summary(self) -> str:
+        lines = [
+            f"{'span':<32} {'count':>6} {'total ms':>10} {'max ms':>10} {'trips':>7}"
+        ]
+        for row in self.summary():
+            lines.append(
+                f"{row['name'][:32]:<32} {row['count']:>6} {row['total_ms']:>10.1f}"
+                f" {row['max_ms']:>10.1f} {row['round_trips']:>7}"
+            )
+        return "\n".join(lines)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class _NullSpan:
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+class NullTracer:
+    """Tracer used unless tracing was asked for, every call is a no-op."""
+
+    enabled = False
+    _span = _NullSpan()
+
+    def span(self, name: str, **attrs) -> _NullSpan:
+        return self._span
+
+    def phase(self, name: str, **attrs):
+        pass
+
+    def round_trip(self, count: int = 1):
+        pass
+
+
+NULL_TRACER = NullTracer()
+_tracer: Any = NULL_TRACER
+
+
+def install(tracer: Any):
+    """Make `tracer` the one new sessions record into."""
+    global _tracer
+    _tracer = tracer
+
+
+def current() -> Any:
+    return _tracer
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from unittest import mock
+
+from db_enum import registry
+from db_enum.aio import ThreadedAdapter, load_async, map_window_async, to_daemon_thread
+
+
+class MapWindowAsyncTest(unittest.IsolatedAsyncioTestCase):
+    async def test_in_order(self):
+        async def double(x):
+            # Later items finish first
+            await asyncio.sleep((20 - x) / 1000)
+            return x * 2
+
+        results = [x async for x in map_window_async(double, range(20), 3)]
+        self.assertEqual(results, list(range(0, 40, 2)))
+        self.assertEqual([x async for x in map_window_async(double, [], 3)], [])
+
+    async def test_errors_propagate(self):
+        async def invert(x):
+            return 1 / x
+
+        with self.assertRaises(ZeroDivisionError):
+            [x async for x in map_window_async(invert, [1, 0, 2], 2)]
+
+    async def test_concurrency_limit(self):
+        running = peak = 0
+
+        async def call(item):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.001)
+            running -= 1
+            return item
+
+        self.assertEqual(
+            [x async for x in map_window_async(call, range(30), 4)], list(range(30))
+        )
+        self.assertEqual(peak, 4)
+
+    async def test_bounded_and_cancelled_on_close(self):
+        cancelled = []
+        consumed = []
+
+        async def call(item):
+            if item == 0:
+                return item
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(item)
+                raise
+
+        def items():
+            for item in range(100):
+                consumed.append(item)
+                yield item
+
+        results = map_window_async(call, items(), 2)
+        self.assertEqual(await anext(results), 0)
+        # The window is 4 calls, one more is started per result taken
+        self.assertEqual(len(consumed), 5)
+        await results.aclose()
+        await asyncio.sleep(0)
+        # 3 and 4 were still waiting for a slot and never started
+        self.assertEqual(sorted(cancelled), [1, 2])
+        self.assertEqual(len(consumed), 5)
+
+
+class ToDaemonThreadTest(unittest.IsolatedAsyncioTestCase):
+    async def test_result_and_error(self):
+        self.assertEqual(await to_daemon_thread(max, 1, 2), 2)
+        with self.assertRaises(ZeroDivisionError):
+            await to_daemon_thread(lambda: 1 / 0)
+
+    async def test_abandoned_result_is_released(self):
+        released = threading.Event()
+
+        def connect():
+            time.sleep(0.1)
+            return "session"
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(
+                to_daemon_thread(
+                    connect,
+                    abandoned=lambda session: session == "session" and released.set(),
+                ),
+                0.01,
+            )
+        self.assertTrue(await asyncio.to_thread(released.wait, 2))
+
+
+class LoadAsyncTest(unittest.TestCase):
+    def test_native_adapters(self):
+        for db_type in ("redis", "mongodb", "neo4j"):
+            self.assertIs(load_async(db_type), registry.load(db_type).async_adapter)
+
+    def test_sync_only_drivers_run_on_threads(self):
+        for db_type in ("mssql", "cassandra"):
+            adapter = load_async(db_type)
+            self.assertIsInstance(adapter, ThreadedAdapter)
+            self.assertEqual(adapter.get_info(), registry.load(db_type).get_info())
+
+    def test_missing_async_driver_runs_on_threads(self):
+        module = registry.load("couchdb")
+        with mock.patch.object(module, "async_adapter", None):
+            self.assertIsInstance(load_async("couchdb"), ThreadedAdapter)
+
+
+if __name__ == "__main__":
+    unittest.main()
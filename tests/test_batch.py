@@ -0,0 +1,129 @@
+import threading
+import time
+import unittest
+
+from db_enum.batch import Target, parse_scope, run_batch
+
+
+class ParseScopeTest(unittest.TestCase):
+    def test_fields(self):
+        targets = parse_scope(
+            [
+                "# scope",
+                "",
+                "10.0.0.1:5432 postgres admin 'pass word' app  # comment",
+                "db.local:6379",
+                "10.0.0.2:3306 auto root",
+                "10.0.0.3:27017 - - - admin",
+            ]
+        )
+        self.assertEqual(
+            targets,
+            [
+                Target("10.0.0.1", 5432, "postgres", "admin", "pass word", "app"),
+                Target("db.local", 6379),
+                Target("10.0.0.2", 3306, None, "root"),
+                Target("10.0.0.3", 27017, database="admin"),
+            ],
+        )
+
+    def test_ipv6(self):
+        (target,) = parse_scope(["[::1]:9200 elasticsearch"])
+        self.assertEqual(target.host, "::1")
+        self.assertEqual(str(target), "[::1]:9200")
+
+    def test_errors_name_the_line(self):
+        with self.assertRaisesRegex(ValueError, "line 2: expected host:port"):
+            parse_scope(["a:1", "b"])
+        with self.assertRaisesRegex(ValueError, "line 1: expected host:port"):
+            parse_scope(["a:port"])
+        with self.assertRaisesRegex(ValueError, "line 1: unknown database type"):
+            parse_scope(["a:1 oracle"])
+
+
+class RunBatchTest(unittest.TestCase):
+    targets = [Target("10.0.0.1", 1), Target("10.0.0.2", 2), Target("10.0.0.3", 3)]
+
+    def run_batch(self, run, **kwargs):
+        records = []
+        run_batch(self.targets, run, records.append, **kwargs)
+        return records
+
+    def test_records_and_errors(self):
+        def run(target):
+            if target.port == 2:
+                raise RuntimeError("connection refused")
+            return {"status": "ok", "port": target.port}
+
+        records = sorted(self.run_batch(run), key=lambda r: r["target"])
+        self.assertEqual(
+            records,
+            [
+                {"target": "10.0.0.1:1", "status": "ok", "port": 1},
+                {
+                    "target": "10.0.0.2:2",
+                    "status": "error",
+                    "error": "connection refused",
+                },
+                {"target": "10.0.0.3:3", "status": "ok", "port": 3},
+            ],
+        )
+
+    def test_concurrency(self):
+        lock = threading.Lock()
+        running = peak = 0
+
+        def run(target):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+            return {"status": "ok"}
+
+        self.assertEqual(len(self.run_batch(run, concurrency=2)), 3)
+        self.assertEqual(peak, 2)
+
+    def test_stuck_target_times_out_and_frees_its_slot(self):
+        released = threading.Event()
+        self.addCleanup(released.set)
+
+        def run(target):
+            if target.port == 1:
+                released.wait(10)
+            return {"status": "ok"}
+
+        start = time.monotonic()
+        records = self.run_batch(run, concurrency=1, target_timeout=0.1)
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(
+            [(r["target"], r["status"]) for r in records],
+            [("10.0.0.1:1", "timeout"), ("10.0.0.2:2", "ok"), ("10.0.0.3:3", "ok")],
+        )
+        self.assertEqual(records[0]["error"], "Timed out after 0.1 seconds")
+
+    def test_late_result_is_dropped(self):
+        late = threading.Event()
+
+        def run(target):
+            if target.port == 1:
+                time.sleep(0.6)
+                late.set()
+            elif target.port == 2:
+                time.sleep(0.3)
+            else:
+                # Started at 0.3 and still running when the first target returns
+                late.wait(2)
+            return {"status": "ok"}
+
+        records = self.run_batch(run, concurrency=2, target_timeout=0.4)
+        self.assertEqual(
+            sorted((r["target"], r["status"]) for r in records),
+            [("10.0.0.1:1", "timeout"), ("10.0.0.2:2", "ok"), ("10.0.0.3:3", "ok")],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
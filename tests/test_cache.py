@@ -0,0 +1,93 @@
+import os
+import stat
+import tempfile
+import time
+import unittest
+
+from unittest import mock
+
+from db_enum import cache
+from db_enum.cache import ResultCache
+
+
+class CacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(
+            cache, "cache_dir", return_value=self.directory.name
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache._secret.cache_clear()
+        self.addCleanup(cache._secret.cache_clear)
+        self.cache = ResultCache(os.path.join(self.directory.name, "targets"))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+class KeyTest(CacheTestCase):
+    def test_stable_and_distinct(self):
+        key = ResultCache.key("DB.local", 5432, "u", "p", None)
+        self.assertEqual(key, ResultCache.key("db.local", 5432, "u", "p", None))
+        self.assertNotEqual(key, ResultCache.key("db.local", 5432, "u", "q", None))
+
+    def test_secret_file(self):
+        key = ResultCache.key("db", 1, "u", "p", None)
+        path = os.path.join(self.directory.name, "secret")
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+        # Kept across runs
+        cache._secret.cache_clear()
+        self.assertEqual(ResultCache.key("db", 1, "u", "p", None), key)
+        # Another install hashes differently
+        os.remove(path)
+        cache._secret.cache_clear()
+        self.assertNotEqual(ResultCache.key("db", 1, "u", "p", None), key)
+
+    def test_unwritable_cache_dir(self):
+        with mock.patch.object(cache.os, "makedirs", side_effect=PermissionError):
+            key = ResultCache.key("db", 1, "u", "p", None)
+        self.assertEqual(len(key), 64)
+        self.assertFalse(os.listdir(self.directory.name))
+
+
+class EntryTest(CacheTestCase):
+    def test_roundtrip(self):
+        self.cache.put("k", "mysql", "8.0", {"tables": []}, {"top": 5})
+        entry = self.cache.get("k")
+        self.assertEqual(entry["db_type"], "mysql")
+        self.assertEqual(entry["result"], {"tables": []})
+        self.assertEqual(entry["options"], {"top": 5})
+        self.cache.invalidate("k")
+        self.assertIsNone(self.cache.get("k"))
+
+    def test_expired(self):
+        self.cache.put("k", "redis", "7.2")
+        self.cache.ttl = 10
+        with mock.patch.object(cache.time, "time", return_value=time.time() + 11):
+            self.assertIsNone(self.cache.get("k"))
+        self.assertFalse(os.path.exists(self.cache._entry_path("k")))
+
+    def test_evicts_least_recently_used(self):
+        self.cache.put("old", "redis", "7.2")
+        self.cache.put("used", "redis", "7.2")
+        past = time.time() - 100
+        os.utime(self.cache._entry_path("old"), (past, past))
+        os.utime(self.cache._entry_path("used"), (past - 1, past - 1))
+        self.cache.get("used")
+        # Room for two entries, sizes vary with the timestamp
+        self.cache.max_bytes = os.path.getsize(self.cache._entry_path("used")) * 5 // 2
+        self.cache.put("new", "redis", "7.2")
+        self.assertIsNone(self.cache.get("old"))
+        self.assertIsNotNone(self.cache.get("used"))
+        self.assertIsNotNone(self.cache.get("new"))
+
+    def test_no_persist(self):
+        self.cache.persist = False
+        self.cache.put("k", "redis", "7.2")
+        self.assertIsNone(self.cache.get("k"))
+        self.assertFalse(os.path.exists(self.cache.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import threading
+import unittest
+
+from db_enum.db_interface import map_window
+
+
+class MapWindowTest(unittest.TestCase):
+    def test_in_order(self):
+        self.assertEqual(
+            list(map_window(lambda x: x * 2, range(20), 3)), list(range(0, 40, 2))
+        )
+        self.assertEqual(list(map_window(str, [], 3)), [])
+
+    def test_errors_propagate(self):
+        with self.assertRaises(ZeroDivisionError):
+            list(map_window(lambda x: 1 / x, [1, 0, 2], 2))
+
+    def test_bounded_and_cancelled_on_close(self):
+        started = []
+        lock = threading.Lock()
+
+        def call(item):
+            with lock:
+                started.append(item)
+            return item
+
+        consumed = []
+
+        def items():
+            for item in range(100):
+                consumed.append(item)
+                yield item
+
+        results = map_window(call, items(), 2)
+        self.assertEqual(next(results), 0)
+        # The window is 4 calls, one more is submitted per result taken
+        self.assertEqual(len(consumed), 5)
+        results.close()
+        self.assertLessEqual(len(started), 5)
+        self.assertEqual(len(consumed), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
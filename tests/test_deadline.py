@@ -0,0 +1,90 @@
+import threading
+import time
+import unittest
+
+from db_enum.deadline import Deadline, DeadlineExceeded, run_until, within
+
+
+class DeadlineTest(unittest.TestCase):
+    def test_no_deadline(self):
+        deadline = Deadline()
+        self.assertIsNone(deadline.remaining())
+        self.assertFalse(deadline.expired())
+        self.assertIsNone(deadline.timeout())
+        self.assertEqual(deadline.timeout(10), 10)
+        self.assertEqual(deadline.connect_timeout(5), 5)
+
+    def test_timeout_is_time_left(self):
+        timeout = Deadline(30).timeout(10)
+        self.assertGreater(timeout, 29)
+        self.assertLessEqual(timeout, 30)
+
+    def test_connect_timeout(self):
+        self.assertEqual(Deadline(30).for_connect(2).connect_timeout(), 2)
+        self.assertEqual(Deadline().for_connect(2).connect_timeout(10), 2)
+        # Never past the overall deadline
+        self.assertLessEqual(Deadline(1).for_connect(5).connect_timeout(), 1)
+
+    def test_for_connect_keeps_deadline(self):
+        deadline = Deadline(30)
+        self.assertEqual(deadline.for_connect(2).expires_at, deadline.expires_at)
+        self.assertIsNone(deadline.connect_seconds)
+
+    def test_expired(self):
+        deadline = Deadline(0)
+        self.assertTrue(deadline.expired())
+        self.assertEqual(deadline.remaining(), 0)
+        with self.assertRaises(DeadlineExceeded):
+            deadline.timeout()
+        with self.assertRaises(DeadlineExceeded):
+            deadline.connect_timeout()
+
+    def test_whole_seconds(self):
+        self.assertIsNone(Deadline.whole_seconds(None))
+        self.assertEqual(Deadline.whole_seconds(0.01), 1)
+        self.assertEqual(Deadline.whole_seconds(2.1), 3)
+        self.assertEqual(Deadline.whole_seconds(0), 1)
+
+
+class HelpersTest(unittest.TestCase):
+    def test_within(self):
+        self.assertEqual(list(within(Deadline(30), [1, 2])), [1, 2])
+        with self.assertRaises(DeadlineExceeded):
+            list(within(Deadline(0), [1]))
+
+    def test_run_until(self):
+        self.assertEqual(run_until(Deadline(30), max, 1, 2), 2)
+        with self.assertRaises(ZeroDivisionError):
+            run_until(Deadline(30), lambda: 1 / 0)
+
+    def test_run_until_gives_up(self):
+        start = time.monotonic()
+        with self.assertRaises(DeadlineExceeded):
+            run_until(Deadline(0.05), time.sleep, 5)
+        self.assertLess(time.monotonic() - start, 2)
+
+    def test_run_until_releases_late_results(self):
+        released = threading.Event()
+
+        def connect():
+            time.sleep(0.1)
+            return "session"
+
+        with self.assertRaises(DeadlineExceeded):
+            run_until(
+                Deadline(0.01),
+                connect,
+                abandoned=lambda session: session == "session" and released.set(),
+            )
+        self.assertTrue(released.wait(2))
+
+    def test_run_until_keeps_timely_results(self):
+        abandoned = []
+        self.assertEqual(
+            run_until(Deadline(5), str, 1, abandoned=abandoned.append), "1"
+        )
+        self.assertEqual(abandoned, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
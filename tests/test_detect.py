@@ -0,0 +1,117 @@
+import threading
+import time
+import unittest
+
+from types import SimpleNamespace
+from unittest import mock
+
+from db_enum.detect import candidate_groups, detect, probe_concurrently
+from db_enum.history import PortHistory
+from db_enum.logger import VerboseLogger
+from db_enum.registry import DB_TYPES
+
+
+def fake_module(name, delay=0.0, succeeds=True):
+    """Adapter module look-alike whose connect() answers after `delay`."""
+    module = SimpleNamespace(closed=threading.Event())
+
+    def connect(host, port, user, password, database, logger, deadline):
+        time.sleep(delay)
+        return f"{name}-session" if succeeds else None
+
+    module.connect = connect
+    module.close = lambda session: module.closed.set()
+    module.get_info = lambda: {"name": name}
+    return module
+
+
+class ProbeConcurrentlyTest(unittest.TestCase):
+    logger = VerboseLogger(False)
+
+    def probe(self, modules, timeout=5):
+        return probe_concurrently(
+            modules, "localhost", 1, "u", "p", None, self.logger, timeout
+        )
+
+    def test_first_answer_wins(self):
+        modules = {
+            "slow": fake_module("slow", delay=0.3),
+            "failing": fake_module("failing", succeeds=False),
+            "fast": fake_module("fast", delay=0.05),
+        }
+        start = time.monotonic()
+        self.assertEqual(self.probe(modules), ("fast", "fast-session"))
+        # Probes run in parallel and the slower one is not waited for
+        self.assertLess(time.monotonic() - start, 0.25)
+        self.assertFalse(modules["fast"].closed.is_set())
+
+    def test_late_sessions_are_closed(self):
+        modules = {
+            "fast": fake_module("fast"),
+            "slow": fake_module("slow", delay=0.1),
+        }
+        self.assertEqual(self.probe(modules)[0], "fast")
+        self.assertTrue(modules["slow"].closed.wait(2))
+
+    def test_nothing_answers(self):
+        modules = {"failing": fake_module("failing", succeeds=False)}
+        self.assertIsNone(self.probe(modules))
+
+    def test_timeout(self):
+        start = time.monotonic()
+        self.assertIsNone(self.probe({"hung": fake_module("hung", delay=5)}, 0.1))
+        self.assertLess(time.monotonic() - start, 1)
+
+
+class CandidateGroupsTest(unittest.TestCase):
+    logger = VerboseLogger(False)
+
+    def groups(self, port, history=None, matches=None):
+        with mock.patch("db_enum.detect.fingerprint", return_value=matches or []):
+            return candidate_groups(
+                "localhost", port, self.logger, 1, matches is not None, history
+            )
+
+    def test_default_port_first(self):
+        groups = self.groups(5432)
+        self.assertEqual(groups[0], ["postgres"])
+        self.assertEqual(sorted(groups[0] + groups[1]), sorted(DB_TYPES))
+
+    def test_history_ranks_likely_group(self):
+        history = PortHistory(persist=False)
+        history.record(5432, "redis")
+        self.assertEqual(self.groups(5432, history)[0], ["redis", "postgres"])
+
+    def test_fingerprint_matches_first(self):
+        groups = self.groups(5432, matches=["couchdb", "influxdb"])
+        self.assertEqual(groups[:2], [["couchdb", "influxdb"], ["postgres"]])
+        self.assertNotIn("couchdb", groups[2])
+
+    def test_unknown_port_is_one_group(self):
+        self.assertEqual(self.groups(5000), [DB_TYPES])
+
+
+class DetectTest(unittest.TestCase):
+    def test_later_group_wins_and_is_recorded(self):
+        modules = {
+            db_type: fake_module(db_type, succeeds=db_type == "mysql")
+            for db_type in DB_TYPES
+        }
+        history = PortHistory(persist=False)
+        with mock.patch("db_enum.detect.load", side_effect=modules.__getitem__):
+            winner = detect(
+                "localhost",
+                5432,
+                "u",
+                "p",
+                None,
+                VerboseLogger(False),
+                use_fingerprint=False,
+                history=history,
+            )
+        self.assertEqual(winner, ("mysql", "mysql-session"))
+        self.assertEqual(history.hits, {"5432": {"mysql": 1}})
+
+
+if __name__ == "__main__":
+    unittest.main()
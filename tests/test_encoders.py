@@ -0,0 +1,103 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+from datetime import datetime
+from decimal import Decimal
+from unittest import mock
+
+from db_enum import encoders
+from db_enum.encoders import Output, columnar, custom_json_serializer
+
+
+class ColumnarTest(unittest.TestCase):
+    def test_records(self):
+        result = columnar(
+            {
+                "type": "MySQL",
+                "databases": ["a", "b"],
+                "tables": [
+                    {"schema": "a", "name": "t1", "rows": 1},
+                    {"schema": "b", "name": "t2", "engine": "InnoDB"},
+                ],
+            }
+        )
+        self.assertEqual(
+            result,
+            {
+                "type": "MySQL",
+                "databases": ["a", "b"],
+                "tables": {
+                    "columns": ["schema", "name", "rows", "engine"],
+                    "rows": [["a", "t1", 1, None], ["b", "t2", None, "InnoDB"]],
+                },
+            },
+        )
+
+    def test_nested_and_mixed(self):
+        self.assertEqual(
+            columnar({"x": [[{"a": 1}]]}), {"x": [{"columns": ["a"], "rows": [[1]]}]}
+        )
+        # Only lists made entirely of records are turned into columns
+        self.assertEqual(columnar([{"a": 1}, 2]), [{"a": 1}, 2])
+        self.assertEqual(columnar([]), [])
+
+
+class SerializerTest(unittest.TestCase):
+    def test_driver_types(self):
+        self.assertEqual(custom_json_serializer(Decimal("1024")), 1024)
+        self.assertEqual(custom_json_serializer(Decimal("1.5")), 1.5)
+        self.assertEqual(custom_json_serializer(Decimal("NaN")), "NaN")
+        self.assertEqual(
+            custom_json_serializer(datetime(2024, 1, 2, 3, 4)), "2024-01-02T03:04:00"
+        )
+        self.assertEqual(custom_json_serializer(b"\x00\xff"), "00ff")
+        self.assertEqual(custom_json_serializer({1, 2}), [1, 2])
+
+
+class JSONTest(unittest.TestCase):
+    value = {"name": "tàble ✓", "size": Decimal("12"), "rows": [1, 2]}
+
+    @unittest.skipIf(encoders.orjson is None, "orjson is not installed")
+    def test_fallback_matches_orjson(self):
+        for indent in (True, False):
+            fast = encoders._json(self.value, indent)
+            with mock.patch.object(encoders, "orjson", None):
+                self.assertEqual(encoders._json(self.value, indent), fast)
+
+    def test_utf8(self):
+        with mock.patch.object(encoders, "orjson", None):
+            self.assertEqual(
+                encoders._json(self.value, indent=False),
+                '{"name":"tàble ✓","size":12,"rows":[1,2]}'.encode(),
+            )
+
+
+class OutputTest(unittest.TestCase):
+    def test_gzip_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "result.ndjson.gz")
+            output = Output("ndjson", path, "gzip")
+            self.assertTrue(output.streaming)
+            self.assertFalse(os.path.exists(path))
+            output.record({"section": "tables", "size": Decimal("10")})
+            output.record({"section": "version", "data": "8.0"})
+            output.close()
+            with gzip.open(path, "rt") as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual(
+            lines,
+            [{"section": "tables", "size": 10}, {"section": "version", "data": "8.0"}],
+        )
+
+    def test_nothing_written_creates_no_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "result.json")
+            Output("json", path).close()
+            self.assertFalse(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import asyncio
+import unittest
+
+from db_enum.filters import Filter, apply, apply_async, parse_size
+
+SECTIONS = ["tables"]
+
+
+def table(schema, name, size):
+    return {"schema": schema, "name": name, "size_bytes": size}
+
+
+async def collect(records):
+    return [record async for record in records]
+
+
+async def stream(records):
+    for record in records:
+        yield record
+
+
+class ParseSizeTest(unittest.TestCase):
+    def test_units(self):
+        self.assertEqual(parse_size(1048576), 1048576)
+        self.assertEqual(parse_size("512"), 512)
+        self.assertEqual(parse_size("512K"), 512 * 2**10)
+        self.assertEqual(parse_size("10m"), 10 * 2**20)
+        self.assertEqual(parse_size("2GiB"), 2 * 2**30)
+        self.assertEqual(parse_size(" 1 TB "), 2**40)
+
+    def test_invalid(self):
+        for value in ("", "ten", "1.5G", "10X"):
+            with self.assertRaises(ValueError):
+                parse_size(value)
+
+
+class FilterTest(unittest.TestCase):
+    def test_from_options(self):
+        spec = Filter.from_options(
+            {"top": "5", "min_size": "1K", "include": "a*,b*", "exclude": ("c",)}
+        )
+        self.assertEqual(spec, Filter(5, 1024, ["a*", "b*"], ["c"]))
+        self.assertTrue(spec.active)
+        self.assertFalse(Filter.from_options({}).active)
+
+    def test_allows(self):
+        spec = Filter(include=["app_*", "web"], exclude=["app_test*"])
+        self.assertTrue(spec.allows("app_prod"))
+        self.assertTrue(spec.allows("web"))
+        self.assertFalse(spec.allows("app_test1"))
+        self.assertFalse(spec.allows("website"))
+        self.assertFalse(spec.allows(None))
+        self.assertTrue(Filter(exclude=["tmp*"]).allows(None))
+
+    def test_globs_only(self):
+        self.assertTrue(Filter(include=["a*"], exclude=["*_old"]).globs_only)
+        self.assertFalse(Filter(include=["a?"]).globs_only)
+        self.assertFalse(Filter(exclude=["db[12]"]).globs_only)
+
+    def test_sql_pushdown(self):
+        spec = Filter(top=3, min_size=10, include=["a*"])
+        self.assertIs(spec.sql_pushdown(), spec)
+        # Character classes have no LIKE equivalent, and a LIMIT taken
+        # before they are applied would cut the result short
+        spec = Filter(top=3, min_size=10, include=["db[12]"])
+        self.assertEqual(spec.sql_pushdown(), Filter(min_size=10))
+
+    def test_sql_pushdown_case_insensitive(self):
+        # LIKE matching "APP" for "app*" only adds rows apply() drops again,
+        # but NOT LIKE and LIMIT would lose rows it keeps
+        spec = Filter(top=3, min_size=10, include=["app*"], exclude=["app_old*"])
+        self.assertEqual(
+            spec.sql_pushdown(case_insensitive=True),
+            Filter(min_size=10, include=["app*"]),
+        )
+        spec = Filter(top=3, min_size=10)
+        self.assertIs(spec.sql_pushdown(case_insensitive=True), spec)
+        spec = Filter(top=3, include=["db[12]"])
+        self.assertEqual(spec.sql_pushdown(case_insensitive=True), Filter())
+
+    def test_sql_conditions(self):
+        spec = Filter(min_size=100, include=["app_*", "50%"], exclude=["a?c"])
+        conditions, params = spec.sql_conditions("schema", "size")
+        self.assertEqual(
+            conditions,
+            [
+                "(schema LIKE %s OR schema LIKE %s)",
+                "schema NOT LIKE %s",
+                "size >= %s",
+            ],
+        )
+        self.assertEqual(params, ["app\\_%", "50\\%", "a_c", 100])
+
+    def test_sql_conditions_escape(self):
+        spec = Filter(include=["a_[b]*"])
+        conditions, params = spec.sql_conditions("s", "n", escape=True)
+        self.assertEqual(conditions, ["(s LIKE %s ESCAPE '\\')"])
+        self.assertEqual(params, ["a\\_\\[b]%"])
+        _, params = spec.sql_conditions("s", "n")
+        self.assertEqual(params, ["a\\_[b]%"])
+
+
+class ApplyTest(unittest.TestCase):
+    records = [
+        ("version", "8.0"),
+        ("databases", "app"),
+        ("tables", table("app", "small", 10)),
+        ("tables", table("app", "large", 300)),
+        ("tables", table("test", "huge", 900)),
+        ("tables", table("app", "medium", 200)),
+        ("tables", table("app", "unsized", None)),
+        ("tables", {"schema": "app", "name": "view"}),
+    ]
+
+    def test_inactive_passes_through(self):
+        self.assertIs(apply({}, SECTIONS, self.records), self.records)
+
+    def test_top(self):
+        result = list(apply({"top": 2}, SECTIONS, self.records))
+        self.assertEqual(
+            [value["name"] for section, value in result if section == "tables"],
+            ["view", "huge", "large"],
+        )
+        self.assertEqual(result[:2], self.records[:2])
+
+    def test_top_ties_keep_first(self):
+        records = [("tables", table("s", name, 5)) for name in "abc"]
+        result = list(apply({"top": 2}, SECTIONS, records))
+        self.assertEqual([value["name"] for _, value in result], ["a", "b"])
+
+    def test_min_size_and_patterns(self):
+        options = {"min_size": 100, "exclude": ["test"]}
+        result = list(apply(options, SECTIONS, self.records))
+        self.assertEqual(
+            [value["name"] for section, value in result if section == "tables"],
+            ["large", "medium", "view"],
+        )
+
+    def test_min_size_ignores_counts(self):
+        records = [("keys", {"database": "db0", "key_count": 3})]
+        self.assertEqual(list(apply({"min_size": 100}, ["keys"], records)), records)
+
+    def test_async_matches_sync(self):
+        options = {"top": 2, "include": ["app"]}
+        expected = list(apply(options, SECTIONS, self.records))
+        result = asyncio.run(
+            collect(apply_async(options, SECTIONS, stream(self.records)))
+        )
+        self.assertEqual(result, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
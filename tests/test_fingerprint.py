@@ -0,0 +1,99 @@
+import socket
+import threading
+import unittest
+
+from db_enum.fingerprint import fingerprint
+from db_enum.logger import VerboseLogger
+
+
+class ReplyServer:
+    """Local TCP server answering every connection with a fixed reply.
+
+    Servers that speak first send it on accept, the others after the client's
+    first packet.
+    """
+
+    def __init__(self, reply: bytes, speaks_first: bool = False):
+        self.reply = reply
+        self.speaks_first = speaks_first
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.answer, args=(conn,), daemon=True).start()
+
+    def answer(self, conn):
+        with conn:
+            conn.settimeout(1)
+            try:
+                if not self.speaks_first:
+                    conn.recv(4096)
+                conn.sendall(self.reply)
+                conn.recv(1)
+            except OSError:
+                pass
+
+    def close(self):
+        self.sock.close()
+
+
+class FingerprintTest(unittest.TestCase):
+    logger = VerboseLogger(False)
+
+    def fingerprint(self, reply, speaks_first=False):
+        server = ReplyServer(reply, speaks_first)
+        self.addCleanup(server.close)
+        return fingerprint("127.0.0.1", server.port, self.logger, 0.5)
+
+    def test_mysql_handshake(self):
+        handshake = b"\x0a8.0.36\x00"
+        packet = len(handshake).to_bytes(3, "little") + b"\x00" + handshake
+        self.assertEqual(self.fingerprint(packet, speaks_first=True), ["mysql"])
+
+    def test_postgres_ssl_answer(self):
+        self.assertEqual(self.fingerprint(b"N"), ["postgres"])
+
+    def test_redis(self):
+        self.assertEqual(self.fingerprint(b"+PONG\r\n"), ["redis"])
+        self.assertEqual(
+            self.fingerprint(b"-NOAUTH Authentication required.\r\n"), ["redis"]
+        )
+
+    def test_http_servers(self):
+        self.assertEqual(
+            self.fingerprint(
+                b"HTTP/1.0 204 No Content\r\nX-Influxdb-Version: 1.8.10\r\n\r\n"
+            ),
+            ["influxdb"],
+        )
+        self.assertEqual(
+            self.fingerprint(
+                b'HTTP/1.0 200 OK\r\nServer: CouchDB/3.3.3\r\n\r\n{"couchdb":"Welcome"}'
+            ),
+            ["couchdb"],
+        )
+        self.assertEqual(
+            self.fingerprint(
+                b"HTTP/1.0 401 Unauthorized\r\n"
+                b'WWW-Authenticate: Basic realm="security"\r\n\r\n'
+            ),
+            ["elasticsearch"],
+        )
+
+    def test_unknown_server(self):
+        self.assertEqual(self.fingerprint(b"SSH-2.0-OpenSSH_9.6\r\n"), [])
+
+    def test_closed_port(self):
+        server = ReplyServer(b"")
+        server.close()
+        self.assertEqual(fingerprint("127.0.0.1", server.port, self.logger, 0.5), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
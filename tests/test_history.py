@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+import unittest
+
+from db_enum.history import PortHistory
+
+
+class PortHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "db-enum", "history.json")
+
+    def test_hit_rate(self):
+        history = PortHistory(persist=False)
+        self.assertEqual(history.hit_rate(5000, "redis"), 0)
+        for db_type in ("redis", "redis", "redis", "mysql"):
+            history.record(5000, db_type)
+        self.assertEqual(history.hit_rate(5000, "redis"), 0.75)
+        self.assertEqual(history.hit_rate(5000, "mysql"), 0.25)
+        self.assertEqual(history.hit_rate(5001, "redis"), 0)
+
+    def test_is_likely(self):
+        history = PortHistory(persist=False)
+        self.assertTrue(history.is_likely(5432, "postgres"))
+        self.assertFalse(history.is_likely(5000, "postgres"))
+        history.record(5000, "postgres")
+        self.assertTrue(history.is_likely(5000, "postgres"))
+
+    def test_rank(self):
+        history = PortHistory(persist=False)
+        # Default port first when there is no history
+        self.assertEqual(
+            history.rank(6379, ["mysql", "redis", "postgres"]),
+            ["redis", "mysql", "postgres"],
+        )
+        history.record(6379, "postgres")
+        history.record(6379, "postgres")
+        history.record(6379, "redis")
+        self.assertEqual(
+            history.rank(6379, ["mysql", "redis", "postgres"]),
+            ["postgres", "redis", "mysql"],
+        )
+
+    def test_persisted(self):
+        history = PortHistory(self.path)
+        history.record(5000, "redis")
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {"5000": {"redis": 1}})
+        self.assertEqual(PortHistory(self.path).hit_rate(5000, "redis"), 1)
+
+    def test_not_persisted(self):
+        PortHistory(self.path, persist=False).record(5000, "redis")
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_unreadable_file(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "w") as f:
+            f.write("{not json")
+        history = PortHistory(self.path)
+        self.assertEqual(history.hits, {})
+        history.record(5000, "redis")
+        self.assertEqual(PortHistory(self.path).hits, {"5000": {"redis": 1}})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from db_enum.registry import ADAPTERS, DB_TYPES, adapter_info
+
+
+class RegistryTest(unittest.TestCase):
+    def test_adapter_info(self):
+        self.assertEqual(
+            adapter_info("postgres", ["tables"]),
+            {"name": "PostgreSQL", "kind": "sql", "sections": ["tables"]},
+        )
+
+    def test_every_adapter_has_ports(self):
+        self.assertEqual(DB_TYPES, list(ADAPTERS))
+        for db_type, adapter in ADAPTERS.items():
+            self.assertTrue(adapter.default_ports, db_type)
+
+    def test_cli_imports_no_driver(self):
+        # A fresh interpreter, this one may have imported drivers already
+        code = (
+            "import sys, db_enum.cli; "
+            "drivers = {'pymysql', 'psycopg2', 'pymssql', 'pymongo', 'redis', "
+            "'elasticsearch', 'cassandra', 'neo4j', 'couchdb', 'influxdb'}; "
+            "print(sorted(drivers & set(sys.modules)))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+            env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        )
+        self.assertEqual(result.stdout.strip(), "[]")
+
+
+if __name__ == "__main__":
+    unittest.main()
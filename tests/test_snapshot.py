@@ -0,0 +1,132 @@
+import tempfile
+import unittest
+
+from contextlib import closing
+from decimal import Decimal
+
+from db_enum.snapshot import SnapshotStore, deltas, diff, record_key
+
+
+class DeltasTest(unittest.TestCase):
+    def test_threshold(self):
+        self.assertEqual(deltas({"rows": 100}, {"rows": 105}, 0.1), {})
+        self.assertEqual(
+            deltas({"rows": 100}, {"rows": 120}, 0.1),
+            {"rows": {"before": 100, "after": 120, "delta": 20}},
+        )
+
+    def test_all_changed_fields_once_one_is_significant(self):
+        changed = deltas({"rows": 100, "size": 10}, {"rows": 101, "size": 20}, 0.5)
+        self.assertEqual(set(changed), {"rows", "size"})
+
+    def test_from_zero_or_missing(self):
+        self.assertEqual(
+            deltas({"rows": 0}, {"rows": 1}, 0.5),
+            {"rows": {"before": 0, "after": 1, "delta": 1}},
+        )
+        self.assertEqual(
+            deltas({}, {"rows": 1}, 0.5),
+            {"rows": {"before": None, "after": 1, "delta": None}},
+        )
+
+    def test_non_numeric_fields(self):
+        self.assertEqual(deltas({"ok": True, "n": "a"}, {"ok": False, "n": "b"}, 0), {})
+        self.assertEqual(deltas("8.0", "8.4", 0), {})
+
+
+class RecordKeyTest(unittest.TestCase):
+    def test_key_fields(self):
+        value = {"name": "t", "schema": "s", "size_bytes": 1, "database": "db"}
+        self.assertEqual(record_key("tables", value), ("tables", "db", "s", "t"))
+        self.assertEqual(record_key("databases", "db"), ("databases", "db"))
+
+
+class DiffTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = SnapshotStore(self.directory.name)
+        self.key = SnapshotStore.key("mysql", "target", {})
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_diff(self, records, threshold=0.1):
+        taken_at, previous = self.store.load_index(self.key)
+        with closing(previous), self.store.writer(self.key) as save:
+            return taken_at, list(diff(records, previous, threshold, save))
+
+    def test_first_run_is_all_added(self):
+        taken_at, changes = self.run_diff([("version", "8.0"), ("databases", "a")])
+        self.assertIsNone(taken_at)
+        self.assertEqual([c["change"] for c in changes], ["added", "added"])
+
+    def test_changes(self):
+        self.run_diff(
+            [
+                ("version", "8.0"),
+                ("tables", {"schema": "s", "name": "kept", "rows": 100}),
+                ("tables", {"schema": "s", "name": "grown", "rows": 100}),
+                ("tables", {"schema": "s", "name": "dropped", "rows": 1}),
+            ]
+        )
+        taken_at, changes = self.run_diff(
+            [
+                ("version", "8.0"),
+                ("tables", {"schema": "s", "name": "kept", "rows": 101}),
+                ("tables", {"schema": "s", "name": "grown", "rows": 200}),
+                ("tables", {"schema": "s", "name": "new", "rows": 5}),
+            ]
+        )
+        self.assertIsNotNone(taken_at)
+        self.assertEqual(
+            [(c["change"], c["data"]["name"]) for c in changes],
+            [("changed", "grown"), ("added", "new"), ("removed", "dropped")],
+        )
+        self.assertEqual(
+            changes[0]["deltas"], {"rows": {"before": 100, "after": 200, "delta": 100}}
+        )
+
+    def test_decimal_sizes(self):
+        # DECIMAL sums from SQL servers are compared as numbers
+        self.run_diff([("tables", {"name": "t", "size_bytes": Decimal("100")})])
+        changes = self.run_diff(
+            [("tables", {"name": "t", "size_bytes": Decimal("300")})]
+        )[1]
+        self.assertEqual(
+            changes[0]["deltas"],
+            {"size_bytes": {"before": 100, "after": 300, "delta": 200}},
+        )
+
+    def test_unchanged(self):
+        records = [("tables", {"schema": "s", "name": "t", "rows": 1})]
+        self.run_diff(records)
+        self.assertEqual(self.run_diff(records)[1], [])
+
+    def test_failed_run_keeps_previous_snapshot(self):
+        self.run_diff([("databases", "a")])
+
+        def failing():
+            yield "databases", "b"
+            raise RuntimeError("connection lost")
+
+        with self.assertRaises(RuntimeError):
+            self.run_diff(failing())
+        changes = self.run_diff([("databases", "a")])[1]
+        self.assertEqual(changes, [])
+
+
+class SnapshotKeyTest(unittest.TestCase):
+    def test_scope_options(self):
+        plain = SnapshotStore.key("mysql", "target", {"concurrency": 8})
+        self.assertEqual(plain, "mysql-target")
+        top = SnapshotStore.key("mysql", "target", {"top": 10})
+        self.assertNotEqual(top, plain)
+        self.assertEqual(top, SnapshotStore.key("mysql", "target", {"top": 10}))
+        self.assertNotEqual(
+            SnapshotStore.key("mysql", "target", {"include": ("a*",)}),
+            SnapshotStore.key("mysql", "target", {"exclude": ("a*",)}),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
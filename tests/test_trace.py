@@ -0,0 +1,144 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from db_enum import trace
+from db_enum.db_interface import Session
+from db_enum.trace import NULL_TRACER, Tracer
+
+
+class TracerTest(unittest.TestCase):
+    def setUp(self):
+        self.tracer = Tracer()
+
+    def spans(self):
+        return {span.name: span for span in self.tracer._finished()}
+
+    def test_nesting_and_round_trips(self):
+        with self.tracer.span("connect", adapter="redis") as outer:
+            self.tracer.round_trip()
+            with self.tracer.span("query"):
+                self.tracer.round_trip(3)
+        self.tracer.round_trip()  # No open span, not counted
+        spans = self.spans()
+        self.assertIs(spans["query"].parent, outer)
+        self.assertIsNone(outer.parent)
+        self.assertEqual(outer.round_trips, 1)
+        self.assertEqual(spans["query"].round_trips, 3)
+        self.assertGreaterEqual(outer.duration_ms, spans["query"].duration_ms)
+
+    def test_phases_end_at_next_phase_or_enclosing_span(self):
+        def stream():
+            self.tracer.phase("version")
+            self.tracer.round_trip()
+            yield "version"
+            self.tracer.phase("tables")
+            self.tracer.round_trip(2)
+            yield "tables"
+
+        with self.tracer.span("enumerate") as enumerate_span:
+            self.assertEqual(list(stream()), ["version", "tables"])
+            self.tracer.round_trip()
+        spans = self.spans()
+        self.assertEqual(list(spans), ["enumerate", "version", "tables"])
+        for name in ("version", "tables"):
+            self.assertTrue(spans[name].is_phase)
+            self.assertIs(spans[name].parent, enumerate_span)
+            self.assertIsNotNone(spans[name].end_ns)
+        self.assertLessEqual(spans["version"].end_ns, spans["tables"].start_ns)
+        self.assertEqual(spans["version"].round_trips, 1)
+        # The last phase stays open until the span ends
+        self.assertEqual(spans["tables"].round_trips, 3)
+        self.assertEqual(enumerate_span.round_trips, 0)
+
+    def test_threads_start_their_own_tree(self):
+        def target():
+            with self.tracer.span("target"):
+                pass
+
+        with self.tracer.span("batch"):
+            thread = threading.Thread(target=target)
+            thread.start()
+            thread.join()
+        spans = self.spans()
+        self.assertIsNone(spans["target"].parent)
+        self.assertNotEqual(spans["target"].thread, spans["batch"].thread)
+
+    def test_summary(self):
+        for adapter in ("redis", "redis", "mysql"):
+            with self.tracer.span("probe", adapter=adapter):
+                self.tracer.round_trip()
+        with self.tracer.span("fingerprint"):
+            pass
+        summary = self.tracer.summary()
+        self.assertEqual(
+            [(row["name"], row["count"], row["round_trips"]) for row in summary],
+            [("probe redis", 2, 2), ("probe mysql", 1, 1), ("fingerprint", 1, 0)],
+        )
+        lines = self.tracer.format_summary().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[1].startswith("probe redis"))
+
+    def test_chrome_trace(self):
+        with self.tracer.span("connect", adapter="redis", port=6379):
+            self.tracer.round_trip()
+        (event,) = self.tracer.chrome_trace()["traceEvents"]
+        self.assertEqual(event["name"], "connect")
+        self.assertEqual(event["cat"], "span")
+        self.assertEqual(event["ph"], "X")
+        self.assertEqual(event["tid"], 1)
+        self.assertEqual(
+            event["args"], {"adapter": "redis", "port": 6379, "round_trips": 1}
+        )
+
+    def test_otlp_trace(self):
+        with self.tracer.span("enumerate", adapter="redis"):
+            with self.tracer.span("scan", cursor=1.5, full=True):
+                pass
+        (resource,) = self.tracer.otlp_trace()["resourceSpans"]
+        spans = {s["name"]: s for s in resource["scopeSpans"][0]["spans"]}
+        self.assertEqual(spans["scan"]["parentSpanId"], spans["enumerate"]["spanId"])
+        self.assertNotIn("parentSpanId", spans["enumerate"])
+        self.assertEqual(spans["scan"]["traceId"], self.tracer.trace_id)
+        self.assertEqual(
+            spans["scan"]["attributes"],
+            [
+                {"key": "cursor", "value": {"doubleValue": 1.5}},
+                {"key": "full", "value": {"boolValue": True}},
+                {"key": "db_enum.round_trips", "value": {"intValue": "0"}},
+            ],
+        )
+
+    def test_write(self):
+        with self.tracer.span("connect"):
+            pass
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.json")
+            self.tracer.write(path, "otlp")
+            with open(path) as f:
+                self.assertIn("resourceSpans", json.load(f))
+            self.tracer.write(path)
+            with open(path) as f:
+                self.assertIn("traceEvents", json.load(f))
+
+
+class NullTracerTest(unittest.TestCase):
+    def test_no_op(self):
+        self.assertFalse(NULL_TRACER.enabled)
+        with NULL_TRACER.span("connect", adapter="redis") as span:
+            NULL_TRACER.phase("version")
+            NULL_TRACER.round_trip(3)
+        self.assertIs(span, NULL_TRACER.span("other"))
+
+    def test_sessions_use_installed_tracer(self):
+        self.assertIs(Session("h", 1, None, None, None).tracer, NULL_TRACER)
+        tracer = Tracer()
+        trace.install(tracer)
+        self.addCleanup(trace.install, NULL_TRACER)
+        self.assertIs(Session("h", 1, None, None, None).tracer, tracer)
+
+
+if __name__ == "__main__":
+    unittest.main()